@@ -0,0 +1,118 @@
+"""Benchmark the one-pass game aggregates against the notebook's sequence.
+
+Usage:
+    python -m benchmarks.game_aggregates data/interim/17lands/game_data/premier_draft/game_data_public.BLB.PremierDraft.parquet
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import polars as pl
+
+from src.data.game_aggregates import aggregate_game_data, draft_aggs, draft_partials
+from src.data.game_data_wrangler import parse_columns
+
+
+class ScanCounter:
+    """Collects lazy frames, counting the file scans in their plans."""
+
+    def __init__(self):
+        self.n_scans = 0
+
+    def collect(self, df_lazy: pl.LazyFrame, **kwargs) -> pl.DataFrame:
+        self.n_scans += df_lazy.explain(**kwargs).count("SCAN [")
+        return df_lazy.collect(**kwargs)
+
+
+def notebook_sequence(df_lazy: pl.LazyFrame, counter: ScanCounter) -> dict:
+    """The drafts and summary as computed in 20-draft-data-wrangle.ipynb."""
+    cols = parse_columns(df_lazy.collect_schema().names())
+    df_games = df_lazy.select(cols["index_cols"])
+    counter.collect(df_games)
+
+    df_draft = (
+        df_games.group_by("draft_id")
+        .agg(draft_aggs())
+        .with_columns((pl.col("n_games") - pl.col("n_wins")).alias("n_losses"))
+    )
+    drafts = counter.collect(df_draft)
+
+    df_select = df_lazy.select(
+        pl.first("expansion").alias("expansion"),
+        pl.min("game_time").alias("first_game"),
+        pl.max("game_time").alias("last_game"),
+        pl.max("game_number").alias("max_games"),
+        pl.mean("won").alias("win_rate"),
+        pl.mean("on_play").alias("start_rate"),
+        pl.count("draft_id").alias("n_games"),
+        pl.sum("num_mulligans").alias("n_mul"),
+        pl.sum("opp_num_mulligans").alias("n_opp_mul"),
+        pl.mean("num_turns").alias("mean_turns"),
+        pl.sum("num_turns").alias("total_turns"),
+        pl.max("num_turns").alias("max_turns"),
+        pl.min("num_turns").alias("min_turns"),
+    )
+    df_draft_ct = df_draft.select(
+        pl.count("draft_id").alias("n_drafts"),
+        pl.sum("n_matches").alias("n_matches"),
+        pl.mean("n_matches").alias("mean_matches"),
+    )
+    df_max_card = counter.collect(df_lazy.select(cols["non_land_card_cols"]).max())
+    df_sum_land = counter.collect(df_lazy.select(cols["land_card_cols"])).sum_horizontal()
+
+    df_summary = pl.concat([df_select, df_draft_ct], how="horizontal").with_columns(
+        (pl.col("n_games") / pl.col("n_drafts")).alias("n_games_per_draft"),
+        pl.lit(len(cols["card_names"])).alias("n_cards"),
+        df_max_card.max_horizontal().alias("max_card"),
+        pl.lit(df_sum_land.mean()).alias("mean_land"),
+        pl.lit(df_sum_land.max()).alias("max_land"),
+        pl.lit(df_sum_land.min()).alias("min_land"),
+    )
+    return {"drafts": drafts, "summary": counter.collect(df_summary)}
+
+
+def run(game_file: Path, repeats: int = 3):
+    """Times both paths, and checks they agree."""
+    df_lazy = pl.scan_parquet(game_file)
+    results = {}
+    outputs = {}
+
+    counter = ScanCounter()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        counter.n_scans = 0
+        outputs["notebook"] = notebook_sequence(df_lazy, counter)
+    results["notebook"] = {
+        "wall_s": (time.perf_counter() - start) / repeats,
+        "n_scans": counter.n_scans,
+    }
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        outputs["one_pass"] = aggregate_game_data(df_lazy)
+    results["one_pass"] = {
+        "wall_s": (time.perf_counter() - start) / repeats,
+        "n_scans": draft_partials(df_lazy).explain(streaming=True).count("SCAN ["),
+    }
+
+    expected, actual = outputs["notebook"], outputs["one_pass"]
+    assert actual["drafts"].sort("draft_id").equals(expected["drafts"].sort("draft_id"))
+    for col in expected["summary"].columns:
+        left, right = expected["summary"][col][0], actual["summary"][col][0]
+        assert left == right or abs(left - right) < 1e-9, col
+
+    print(f"{'path':<10}{'scans':>8}{'wall s':>10}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['n_scans']:>8}{result['wall_s']:>10.2f}")
+    speedup = results["notebook"]["wall_s"] / results["one_pass"]["wall_s"]
+    print(f"Speedup: {speedup:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("game_file", type=Path, help="A set's interim game data parquet.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.game_file, args.repeats)
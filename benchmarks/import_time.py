@@ -0,0 +1,75 @@
+"""Check the import time of the plotting modules against a budget.
+
+Each module is imported in a fresh interpreter with -X importtime, and the
+best cumulative time of a few runs is compared to its budget.  Exits with
+status 1 if any module is over budget.  tests/test_import_time.py runs the
+same check, and checks that no heavy library is imported.
+
+Usage:
+    python -m benchmarks.import_time
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parents[1]
+
+# Cumulative import time budgets, in milliseconds
+BUDGETS_MS = {
+    "src.plots": 20,
+    "src.plots.annotate": 50,
+    "src.plots.symbols": 50,
+}
+# Libraries the plotting modules only import when a plot is drawn
+HEAVY_MODULES = ["matplotlib", "PIL", "numpy", "pandas", "polars", "scipy", "seaborn"]
+
+
+def import_time_ms(module: str) -> float:
+    """The cumulative import time of the module in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [field.strip() for field in line.removeprefix("import time:").split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise ValueError(f"No import time reported for {module}")
+
+
+def imported_packages(module: str) -> list:
+    """The top-level packages loaded by importing the module in a fresh interpreter."""
+    code = (
+        f"import json, sys, {module}; "
+        "print(json.dumps(sorted({name.split('.')[0] for name in sys.modules})))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=REPO_ROOT
+    )
+    return json.loads(result.stdout)
+
+
+def run(budgets: dict, repeats: int = 3) -> bool:
+    """Prints each module's import time, and returns whether all are in budget."""
+    passed = True
+    print(f"{'module':<24}{'ms':>8}{'budget':>8}")
+    for module, budget in budgets.items():
+        elapsed = min(import_time_ms(module) for _ in range(repeats))
+        status = "ok" if elapsed <= budget else "OVER"
+        passed &= elapsed <= budget
+        print(f"{module:<24}{elapsed:>8.1f}{budget:>8}  {status}")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(0 if run(BUDGETS_MS, args.repeats) else 1)
@@ -0,0 +1,76 @@
+"""Benchmark batched icon rendering against an image per point.
+
+Run from the repository root, so the icons in images/mana_symbols are found.
+
+Usage:
+    python -m benchmarks.plot_symbols --n-points 10000
+"""
+
+import argparse
+import io
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+
+from src.plots import symbols
+
+
+def _time_plot(data: pl.DataFrame, batched: bool) -> dict:
+    """Times adding the icons to a scatter plot, and saving the figure."""
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.scatter(data["x"], data["y"], s=1)
+
+    start = time.perf_counter()
+    symbols.add_plot_symbols(data, "x", "y", "label", batched=batched)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fig.savefig(io.BytesIO(), format="png", dpi=100)
+    save_s = time.perf_counter() - start
+
+    n_artists = len(ax.get_children())
+    plt.close(fig)
+    return {"build_s": build_s, "save_s": save_s, "n_artists": n_artists}
+
+
+def run(n_points: int, seed: int = 0):
+    """Times both rendering modes on the same random points."""
+    rng = np.random.default_rng(seed)
+    labels = sorted(symbols.icon_cache.index)
+    data = pl.DataFrame(
+        {
+            "x": rng.random(n_points),
+            "y": rng.random(n_points),
+            "label": rng.choice(labels, n_points),
+        }
+    )
+    symbols.warm_up(labels, scales=(0.5, 1))
+
+    results = {
+        "per_point": _time_plot(data, batched=False),
+        "batched": _time_plot(data, batched=True),
+    }
+
+    print(f"{n_points:,} points")
+    print(f"{'mode':<12}{'artists':>10}{'build s':>10}{'save s':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<12}{result['n_artists']:>10}"
+            f"{result['build_s']:>10.2f}{result['save_s']:>10.2f}"
+        )
+    total = {name: result["build_s"] + result["save_s"] for name, result in results.items()}
+    print(f"Speedup: {total['per_point'] / total['batched']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n-points", type=int, default=10_000)
+    args = parser.parse_args()
+    run(args.n_points)
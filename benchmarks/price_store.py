@@ -0,0 +1,71 @@
+"""Benchmark PriceStore lookups against a full scan of the flat prices.
+
+Usage:
+    python -m benchmarks.price_store data/interim/mtgjson/AllPrices/flat_prices_<dates>.parquet
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from src.data.price_store import PriceStore
+
+
+def _time_ms(func, repeats: int) -> float:
+    """Mean wall time of the function in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run(prices_path: Path, store_dir: Path, n_cards: int, batch_size: int, seed: int = 0):
+    """Times single-card and batched lookups for the store and a full scan."""
+    start = time.perf_counter()
+    store = PriceStore.build(prices_path, store_dir)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    uuids = rng.sample(store.uuids, min(n_cards, len(store.uuids)))
+    batch = uuids[:batch_size]
+    scan = pl.scan_parquet(prices_path)
+
+    # Check both paths agree before timing them
+    expected = scan.filter(pl.col("uuid").is_in(batch)).collect().sort(pl.all())
+    assert store.lookup(batch).sort(pl.all()).equals(expected)
+
+    cards = iter(uuids * 2)
+    results = {
+        "store_series_ms": _time_ms(lambda: store.series(next(cards)), len(uuids)),
+        "scan_series_ms": _time_ms(
+            lambda: scan.filter(pl.col("uuid") == next(cards)).collect(), len(uuids)
+        ),
+        "store_batch_ms": _time_ms(lambda: store.lookup(batch), 5),
+        "scan_batch_ms": _time_ms(
+            lambda: scan.filter(pl.col("uuid").is_in(batch)).collect(), 5
+        ),
+    }
+
+    print(f"Store build: {build_s:.1f} s")
+    print(f"{'lookup':<10}{'store ms':>12}{'scan ms':>12}{'speedup':>10}")
+    for name in ["series", "batch"]:
+        store_ms = results[f"store_{name}_ms"]
+        scan_ms = results[f"scan_{name}_ms"]
+        print(f"{name:<10}{store_ms:>12.2f}{scan_ms:>12.2f}{scan_ms / store_ms:>9.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prices_path", type=Path, help="Flat prices parquet file.")
+    parser.add_argument("--store-dir", type=Path, default=None)
+    parser.add_argument("--n-cards", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run(args.prices_path, args.store_dir or Path(tmp_dir), args.n_cards, args.batch_size)
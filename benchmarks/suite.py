@@ -0,0 +1,223 @@
+"""Benchmark the price and game data wrangles on synthetic data.
+
+Each case runs in a fresh process, so its peak RSS is its own, and the
+results are appended to benchmarks/results.jsonl with the git commit, for
+tracking across commits.  The synthetic inputs are cached in the data
+directory by scale.
+
+Usage:
+    python -m benchmarks.suite --scale small
+    python -m benchmarks.suite --scale medium --cases prices_flatten games_aggregate
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from benchmarks import synthetic
+from src.data.card_cube import CardCube
+from src.data.game_aggregates import aggregate_game_data
+from src.data.game_data_wrangler import GameDataWrangler
+from src.data.mtgjson_wrangler import MtgPricesJsonWrangler
+
+RESULTS_PATH = Path(__file__).parent / "results.jsonl"  # gitignored, as is DATA_DIR
+DATA_DIR = Path("data/bench")
+SET_CODE = "BLB"
+SCALES = {
+    "small": {"n_uuids": 1_000, "n_days": 90, "n_games": 20_000, "n_cards": 250},
+    "medium": {"n_uuids": 10_000, "n_days": 90, "n_games": 200_000, "n_cards": 250},
+    "large": {"n_uuids": 50_000, "n_days": 90, "n_games": 1_000_000, "n_cards": 300},
+}
+
+
+def _price_paths(work_dir: Path) -> dict:
+    return {
+        "raw_file": work_dir / "AllPrices.json",
+        "interim": work_dir / "prices" / "interim",
+        "processed": work_dir / "prices" / "processed",
+    }
+
+
+def _game_paths(work_dir: Path) -> dict:
+    return {
+        "raw": work_dir,
+        "interim": work_dir / "games" / "interim",
+        "processed": work_dir / "games" / "processed",
+    }
+
+
+# Each case returns its row count, or the parquet file it wrote, whose row
+# count is read from the footer after the case is timed
+
+
+def prices_ingest(work_dir: Path) -> Path:
+    """Streams the raw JSON to the nested interim parquet."""
+    wrangler = MtgPricesJsonWrangler(_price_paths(work_dir))
+    wrangler.raw_json_to_parquet(streaming=True)
+    return wrangler.paths["interim"] / wrangler.interim_filename
+
+
+def prices_unstack(work_dir: Path) -> Path:
+    """Unstacks the nested interim parquet to the flat prices."""
+    wrangler = MtgPricesJsonWrangler(_price_paths(work_dir), filename="flat_prices.parquet")
+    wrangler.unstack_data()
+    return wrangler.final_filename
+
+
+def prices_flatten(work_dir: Path) -> Path:
+    """Flattens the raw JSON to the flat prices in one pass."""
+    wrangler = MtgPricesJsonWrangler(_price_paths(work_dir), filename="flat_prices.parquet")
+    wrangler.flatten_json_to_parquet()
+    return wrangler.final_filename
+
+
+def games_ingest(work_dir: Path) -> Path:
+    """Converts the game data CSV to parquet."""
+    wrangler = GameDataWrangler(SET_CODE, _game_paths(work_dir))
+    wrangler.csv_to_parquet(overwrite=True)
+    return wrangler.parquet_file
+
+
+def games_aggregate(work_dir: Path) -> int:
+    """Aggregates the drafts and the summary of the converted game data."""
+    wrangler = GameDataWrangler(SET_CODE, _game_paths(work_dir))
+    return aggregate_game_data(wrangler.scan())["drafts"]["n_games"].sum()
+
+
+def games_card_cube(work_dir: Path) -> int:
+    """Rebuilds the card cube of the converted game data."""
+    wrangler = GameDataWrangler(SET_CODE, _game_paths(work_dir))
+    cube = CardCube(wrangler.paths["processed"] / f"{SET_CODE}_CardCube.parquet")
+    return cube.update(wrangler.parquet_file, rebuild=True).height
+
+
+# Each case's function and input file, in run order, as some use earlier outputs
+CASES = {
+    "prices_ingest": (prices_ingest, "AllPrices.json"),
+    "prices_unstack": (prices_unstack, "prices/interim/nested_prices.parquet"),
+    "prices_flatten": (prices_flatten, "AllPrices.json"),
+    "games_ingest": (games_ingest, f"game_data_public.{SET_CODE}.PremierDraft.csv"),
+    "games_aggregate": (
+        games_aggregate,
+        f"games/interim/game_data_public.{SET_CODE}.PremierDraft.parquet",
+    ),
+    "games_card_cube": (
+        games_card_cube,
+        f"games/interim/game_data_public.{SET_CODE}.PremierDraft.parquet",
+    ),
+}
+
+
+def prepare_data(work_dir: Path, scale: dict, seed: int = 0):
+    """Writes the synthetic inputs, unless they exist from an earlier run."""
+    prices_file = work_dir / "AllPrices.json"
+    if not prices_file.exists():
+        print(f"Generating {scale['n_uuids']:,} uuids of prices...")
+        synthetic.write_all_prices(prices_file, scale["n_uuids"], scale["n_days"], seed=seed)
+    games_file = work_dir / CASES["games_ingest"][1]
+    if not games_file.exists():
+        print(f"Generating {scale['n_games']:,} games...")
+        synthetic.write_game_csv(games_file, SET_CODE, scale["n_games"], scale["n_cards"], seed)
+
+
+def _run_case(name: str, work_dir: Path) -> dict:
+    """Runs the case in this process, measuring wall, CPU, and peak RSS."""
+    func, input_file = CASES[name]
+    if not (work_dir / input_file).exists():
+        raise FileNotFoundError(f"{name} needs {input_file}, from an earlier case")
+    input_bytes = (work_dir / input_file).stat().st_size
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    output = func(work_dir)
+    wall_s = time.perf_counter() - start
+    cpu_s = time.process_time() - cpu_start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    n_rows = pq.ParquetFile(output).metadata.num_rows if isinstance(output, Path) else int(output)
+    return {
+        "case": name,
+        "rows": n_rows,
+        "wall_s": wall_s,
+        "cpu_s": cpu_s,
+        "rows_per_s": n_rows / wall_s,
+        "input_mb_per_s": input_bytes / 1024**2 / wall_s,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": peak_rss / 1024,
+        "peak_rss_delta_mb": (peak_rss - rss_before) / 1024,
+    }
+
+
+def git_commit() -> str:
+    """The current commit, or None outside a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run(
+    scale_name: str = "small",
+    cases: list = None,
+    data_dir: Path = DATA_DIR,
+    results_path: Path = RESULTS_PATH,
+    seed: int = 0,
+) -> list:
+    """Runs the cases, each in a fresh process, and appends their results.
+
+    Returns:
+        The result of each case.
+    """
+    scale = SCALES[scale_name]
+    cases = list(CASES) if cases is None else [case for case in CASES if case in cases]
+    work_dir = Path(data_dir) / f"{scale_name}-{seed}"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    prepare_data(work_dir, scale, seed)
+
+    run_info = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "scale": scale_name,
+        **scale,
+    }
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = {**run_info, **executor.submit(_run_case, name, work_dir).result()}
+        results.append(result)
+
+    with open(results_path, "a", encoding="utf-8") as file:
+        for result in results:
+            file.write(json.dumps(result) + "\n")
+
+    print(f"{'case':<18}{'rows':>12}{'wall s':>9}{'cpu s':>9}{'rows/s':>12}{'MB/s':>8}{'RSS MB':>9}")
+    for result in results:
+        print(
+            f"{result['case']:<18}{result['rows']:>12,}{result['wall_s']:>9.2f}"
+            f"{result['cpu_s']:>9.2f}{result['rows_per_s']:>12,.0f}"
+            f"{result['input_mb_per_s']:>8.1f}{result['peak_rss_mb']:>9.0f}"
+        )
+    print(f"Appended results to {results_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=None)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--results", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.scale, args.cases, args.data_dir, args.results, args.seed)
@@ -0,0 +1,169 @@
+"""Deterministic synthetic MTGJSON AllPrices and 17lands game data.
+
+The files have the shapes of the real downloads at a configurable scale, so
+the wrangles can be benchmarked offline.  The same arguments and seed always
+give the same files.
+
+Usage:
+    python -m benchmarks.synthetic prices data/bench/AllPrices.json --n-uuids 1000
+    python -m benchmarks.synthetic games data/bench/game_data_public.BLB.PremierDraft.csv
+"""
+
+import argparse
+import datetime
+import json
+import uuid
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.data.game_data_wrangler import LAND_CARDS
+
+PROVIDERS = {
+    "paper": {"tcgplayer": "USD", "cardmarket": "EUR", "cardkingdom": "USD"},
+    "mtgo": {"cardhoarder": "USD"},
+}
+PRICE_LISTS = ["retail", "buylist"]
+FINISHES = ["normal", "foil", "etched"]
+LAST_DATE = datetime.date(2024, 8, 24)
+
+RANKS = ["bronze", "silver", "gold", "platinum", "diamond", "mythic", ""]
+COLORS = ["WU", "WB", "UB", "BR", "RG", "WG", "BG", "UR", "WR", "UG", "WUB", "BRG"]
+GAMES_PER_DRAFT = 7
+DECK_RATE = 0.1  # Share of card columns in a deck
+
+
+def write_all_prices(
+    path: Path,
+    n_uuids: int = 1_000,
+    n_days: int = 90,
+    fill_rate: float = 0.7,
+    seed: int = 0,
+) -> int:
+    """Writes an AllPrices.json with nested uuid, medium, provider, list, finish, date prices.
+
+    Args:
+        n_uuids: Number of cards.
+        n_days: Number of daily prices, up to LAST_DATE.
+        fill_rate: Chance each medium, provider, list, and finish is present.
+
+    Returns:
+        The number of prices, i.e. the rows of the unstacked data.
+    """
+    rng = np.random.default_rng(seed)
+    dates = [(LAST_DATE - datetime.timedelta(days=i)).isoformat() for i in range(n_days)][::-1]
+    uuids = sorted(str(uuid.UUID(bytes=rng.bytes(16), version=5)) for _ in range(n_uuids))
+    n_prices = 0
+    data = {}
+    for card_uuid in uuids:
+        card = {}
+        for medium, providers in PROVIDERS.items():
+            if rng.random() > fill_rate:
+                continue
+            card[medium] = {}
+            for provider, currency in providers.items():
+                entry = {"currency": currency}
+                for price_list in PRICE_LISTS:
+                    finishes = [f for f in FINISHES if rng.random() < fill_rate]
+                    prices = np.round(rng.lognormal(0, 1.5, (len(finishes), n_days)), 2)
+                    entry[price_list] = {
+                        finish: dict(zip(dates, row.tolist()))
+                        for finish, row in zip(finishes, prices)
+                    }
+                    n_prices += prices.size
+                card[medium][provider] = entry
+        data[card_uuid] = card
+
+    meta = {"date": LAST_DATE.isoformat(), "version": "5.2.2+synthetic"}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"meta": meta, "data": data}, file)
+    return n_prices
+
+
+def game_data(set_code: str = "BLB", n_games: int = 10_000, n_cards: int = 250, seed: int = 0):
+    """A 17lands game_data frame of n_games rows, with the five basic lands and
+    n_cards other cards in each of the card states."""
+    rng = np.random.default_rng(seed)
+    draft_index = np.arange(n_games) // GAMES_PER_DRAFT
+    n_drafts = draft_index[-1] + 1
+    match_number = np.arange(n_games) % GAMES_PER_DRAFT + 1
+    draft_times = np.datetime64("2024-07-30T00:00:00") + draft_index * np.timedelta64(37, "m")
+    game_times = draft_times + match_number * np.timedelta64(20, "m")
+
+    draft_colors = rng.choice(COLORS, n_drafts)
+    draft_ranks = rng.choice(RANKS, n_drafts)
+    columns = {
+        "expansion": np.full(n_games, set_code),
+        "event_type": np.full(n_games, "PremierDraft"),
+        "draft_id": np.char.mod("%032x", draft_index),
+        "draft_time": _format_times(draft_times),
+        "game_time": _format_times(game_times),
+        "build_index": rng.integers(0, 2, n_games),
+        "match_number": match_number,
+        "game_number": np.ones(n_games, dtype=int),
+        "rank": draft_ranks[draft_index],
+        "opp_rank": rng.choice(RANKS, n_games),
+        "main_colors": draft_colors[draft_index],
+        "splash_colors": np.full(n_games, ""),
+        "on_play": rng.random(n_games) < 0.5,
+        "num_mulligans": rng.integers(0, 3, n_games),
+        "opp_num_mulligans": rng.integers(0, 3, n_games),
+        "opp_colors": rng.choice(COLORS, n_games),
+        "num_turns": rng.integers(5, 15, n_games),
+        "won": rng.random(n_games) < 0.55,
+    }
+
+    cards = [*LAND_CARDS, *(f"{set_code} Card {i}" for i in range(n_cards))]
+    in_deck = rng.random((n_games, len(cards))) < DECK_RATE
+    deck = np.where(in_deck, rng.integers(1, 3, (n_games, len(cards))), 0).astype(np.uint8)
+    states = {
+        "deck_": deck,
+        "drawn_": np.minimum(deck, rng.integers(0, 2, deck.shape, dtype=np.uint8)),
+        "opening_hand_": np.minimum(deck, rng.integers(0, 2, deck.shape, dtype=np.uint8)),
+        "sideboard_": (rng.random(deck.shape) < 0.05).astype(np.uint8),
+        "tutored_": np.zeros_like(deck),
+    }
+    for prefix, counts in states.items():
+        for i, card in enumerate(cards):
+            columns[f"{prefix}{card}"] = counts[:, i]
+    columns["user_n_games_bucket"] = rng.choice([10, 50, 100, 500], n_games)
+    columns["user_game_win_rate_bucket"] = np.round(rng.uniform(0.4, 0.7, n_games), 2)
+    return pl.DataFrame(columns)
+
+
+def _format_times(times: np.ndarray) -> np.ndarray:
+    """Formats datetime64 values as 17lands does, e.g. "2024-07-30 00:37:00"."""
+    return np.char.replace(np.datetime_as_string(times, unit="s"), "T", " ")
+
+
+def write_game_csv(
+    path: Path, set_code: str = "BLB", n_games: int = 10_000, n_cards: int = 250, seed: int = 0
+) -> int:
+    """Writes a 17lands game_data CSV.  See game_data().
+
+    Returns:
+        The number of games.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    game_data(set_code, n_games, n_cards, seed).write_csv(path)
+    return n_games
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=["prices", "games"])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--n-uuids", type=int, default=1_000)
+    parser.add_argument("--n-days", type=int, default=90)
+    parser.add_argument("--set-code", default="BLB")
+    parser.add_argument("--n-games", type=int, default=10_000)
+    parser.add_argument("--n-cards", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.kind == "prices":
+        n_rows = write_all_prices(args.path, args.n_uuids, args.n_days, seed=args.seed)
+    else:
+        n_rows = write_game_csv(args.path, args.set_code, args.n_games, args.n_cards, args.seed)
+    print(f"Wrote {n_rows:,} rows to {args.path}")
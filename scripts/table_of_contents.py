@@ -1,10 +1,23 @@
+"""Builds the table of contents notebook from the notebooks' summaries.
+
+Each notebook's metadata is cached by path, mtime, and size, so only new or
+changed notebooks are read, in parallel.  Summaries are read from the raw
+notebook JSON, without nbformat's validation.  The TOC cell is rewritten in
+place, and the TOC notebook is only executed when asked.
+
+Usage:
+    python scripts/table_of_contents.py [--execute] [--rebuild]
+"""
+
+import argparse
+import json
 import os
 import pathlib
-import nbformat
-from nbconvert import NotebookExporter
-from nbconvert.preprocessors import ExecutePreprocessor
+from concurrent.futures import ProcessPoolExecutor
 
 REL_PATH = pathlib.Path("/root/mtg-modeling/notebooks/00-intro/00-00-table-of-contents.ipynb")
+CACHE_NAME = ".toc_cache.json"
+TOC_HEADER = '# Table of Contents'
 
 def _parse_name(name, loc=1):
     title = name.split('-')[:loc]
@@ -39,8 +52,34 @@ class SectionMetadata:
         return _parse_id(self.dirname, loc=1)
     
 
+def extract_summary(path):
+    """The text after the '# Summary' line of the first markdown cell with one.
+
+    Only the markdown cells of the raw notebook JSON are looked at, so the
+    notebook is neither validated nor converted.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        cells = json.load(f).get('cells', [])
+
+    for cell in cells:
+        if cell.get('cell_type') != 'markdown':
+            continue
+        source = cell.get('source', '')
+        lines = ''.join(source).splitlines() if isinstance(source, list) else source.splitlines()
+        for i, line in enumerate(lines):
+            if line.strip() == '# Summary':
+                return '\n'.join(lines[i+1:]).strip()
+
+    return None
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
 class NotebookMetadata:
-    def __init__(self, path):
+    def __init__(self, path, summary=None, extract=True):
         path = pathlib.Path(path) 
 
         self.path = path
@@ -48,7 +87,7 @@ class NotebookMetadata:
         self.directory = SectionMetadata(path.parent)
         self.file_id = self._parse_filename()
         self.title = self._parse_file_id()
-        self.summary = self._extract_summary()
+        self.summary = extract_summary(path) if extract else summary
         self.rel_path = self.path.resolve().relative_to(REL_PATH.parent, walk_up=True)
 
     def __repr__(self):
@@ -67,37 +106,67 @@ class NotebookMetadata:
         return _parse_id(self.filename, loc=2)
 
 
-    def _extract_summary(self):
-
-        with open(self.path, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
-
-        for cell in nb.cells:
-            if cell.cell_type == 'markdown':
-                lines = cell.source.splitlines()
-                for i, line in enumerate(lines):
-                    if line.strip() == '# Summary':
-                        return '\n'.join(lines[i+1:]).strip()
-
-        return None
+class TableOfContents:
+    """The table of contents of the notebooks under root.
 
+    Args:
+        root: The notebooks directory.
+        cache_path: The summary cache.  Defaults to .toc_cache.json in root.
+        rebuild: Ignore the cache, and read every notebook.
+        n_workers: Processes to read changed notebooks with.  Defaults to the CPU count.
+    """
 
-class TableOfContents:
-    def __init__(self, root):
+    def __init__(self, root, cache_path=None, rebuild=False, n_workers=None):
         self.root_dir = root
+        self.cache_path = pathlib.Path(cache_path or pathlib.Path(root) / CACHE_NAME)
+        self.n_workers = n_workers or os.cpu_count()
+        self._cache = {} if rebuild else self._read_cache()
         self._files = []
         self.add_files()
         self.toc = self.compile_toc()
 
     def add_files(self):
+        paths = []
         for dirpath, dirnames, filenames in os.walk(self.root_dir):
             dirnames.sort()
             filenames.sort()
             for filename in filenames:
-                if filename.endswith('.ipynb'):
-                    notebook_path = os.path.join(dirpath, filename)
-                    print(notebook_path)
-                    self._files.append(NotebookMetadata(notebook_path))
+                if filename.endswith('.ipynb') and '.ipynb_checkpoints' not in dirpath:
+                    paths.append(os.path.join(dirpath, filename))
+
+        keys = {path: _file_key(path) for path in paths}
+        changed = [
+            path for path in paths
+            if self._cache.get(path, {}).get('key') != keys[path]
+        ]
+        for path in changed:
+            print(path)
+        if len(changed) > 1 and self.n_workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.n_workers, len(changed))) as executor:
+                summaries = list(executor.map(extract_summary, changed))
+        else:
+            summaries = [extract_summary(path) for path in changed]
+        for path, summary in zip(changed, summaries):
+            self._cache[path] = {'key': keys[path], 'summary': summary}
+        print(f"Read {len(changed)} of {len(paths)} notebooks")
+
+        self._cache = {path: self._cache[path] for path in paths}
+        self._write_cache()
+        self._files = [
+            NotebookMetadata(path, self._cache[path]['summary'], extract=False)
+            for path in paths
+        ]
+
+    def _read_cache(self):
+        if not self.cache_path.exists():
+            return {}
+        try:
+            return json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except json.JSONDecodeError:
+            return {}
+
+    def _write_cache(self):
+        self.cache_path.write_text(json.dumps(self._cache, indent=1), encoding='utf-8')
 
 
     def compile_toc(self):
@@ -113,33 +182,49 @@ class TableOfContents:
             text.append(f"  - {notebook}\n")
         return ''.join(text)
     
-    def write_toc(self):
+    def write_toc(self, execute=False):
+        """Replaces the TOC cell of the TOC notebook.
+
+        The notebook is only written if the TOC changed, and only executed,
+        with nbconvert, when asked.
+        """
         with open(REL_PATH, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
-        
-
-        # Check if the cell at the index is a code cell or markdown cell
-        for cell_index, cell in enumerate(nb.cells):
-            if cell.cell_type == 'markdown':
-                if cell.source.startswith('# Table of Contents'):
-                    print("Found Table of Contents cell")
-                    nb.cells[cell_index].source = self.toc
-                    print(nb.cells[0].source)
-
-        # Execute the notebook to ensure everything is run and up-to-date
-        ep = ExecutePreprocessor(timeout=600, kernel_name='python3')
-        ep.preprocess(nb, {'metadata': {'path': REL_PATH.parent}})
-        
-
-        # Save the modified notebook
-        with open(REL_PATH, 'w', encoding='utf-8') as f:
-            nbformat.write(nb, f)
+            nb = json.load(f)
+
+        changed = False
+        for cell in nb['cells']:
+            source = ''.join(cell['source'])
+            if cell['cell_type'] == 'markdown' and source.startswith(TOC_HEADER):
+                print("Found Table of Contents cell")
+                if source != self.toc:
+                    cell['source'] = self.toc.splitlines(keepends=True)
+                    changed = True
+
+        if execute:
+            import nbformat
+            from nbconvert.preprocessors import ExecutePreprocessor
+
+            nb = nbformat.from_dict(nb)
+            ep = ExecutePreprocessor(timeout=600, kernel_name='python3')
+            ep.preprocess(nb, {'metadata': {'path': REL_PATH.parent}})
+            with open(REL_PATH, 'w', encoding='utf-8') as f:
+                nbformat.write(nb, f)
+        elif changed:
+            with open(REL_PATH, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(nb, indent=1, ensure_ascii=False) + '\n')
+        else:
+            print("Table of Contents is up to date")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--execute', action='store_true', help="Execute the TOC notebook")
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the summary cache")
+    args = parser.parse_args()
+
     cwd = pathlib.Path(os.getcwd())
     print("Working directory:", cwd)
     root_dir = pathlib.Path('/root/mtg-modeling/notebooks').relative_to(cwd, walk_up=True)
     print("Root directory:", root_dir)
-    toc = TableOfContents(root_dir)
+    toc = TableOfContents(root_dir, rebuild=args.rebuild)
     print(toc.toc)
-    toc.write_toc()
+    toc.write_toc(execute=args.execute)
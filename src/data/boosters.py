@@ -0,0 +1,281 @@
+"""Booster pull rates and a vectorized booster pack simulator.
+
+MTGJSON describes each set's boosters with four tables:
+
+    setBoosterContents        sheet picks of each booster config
+    setBoosterContentWeights  weight of each booster config
+    setBoosterSheets          the sheets of each booster
+    setBoosterSheetCards      weight of each card on each sheet
+
+pull_rates() joins them for every set and booster at once, giving the
+expected number of copies of each card per pack.  PackSimulator samples
+whole packs with alias tables, for the spread of pulls around those
+expectations, e.g. for scarcity or expected value estimates.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+BOOSTER_KEYS = ["setCode", "boosterName"]
+BOOSTER_TABLES = {
+    "contents": "setBoosterContents.parquet",
+    "weights": "setBoosterContentWeights.parquet",
+    "sheets": "setBoosterSheets.parquet",
+    "sheet_cards": "setBoosterSheetCards.parquet",
+}
+
+
+def scan_booster_tables(raw_dir: Path) -> dict:
+    """Lazily scans the booster tables of the AllPrintings parquet files."""
+    return {
+        key: pl.scan_parquet(Path(raw_dir) / file) for key, file in BOOSTER_TABLES.items()
+    }
+
+
+def sheet_card_rates(tables: dict, cards: pl.LazyFrame) -> pl.LazyFrame:
+    """Expected pulls of each card per pack, for every config and sheet.
+
+    Args:
+        tables: The booster tables, from scan_booster_tables().
+        cards: Card data with uuid, name, number, and rarity, e.g. cards.parquet.
+
+    The card's sheet rate is its weight over the weight of every card on the
+    sheet, before the join with the cards, so it is the probability of a
+    pick as in PackSimulator.  The baseline notebook divided by the weight of
+    the set's Standard cards only, which overstated the rates on sheets that
+    mix in other cards.
+
+    Returns:
+        One row per set, booster, config, sheet, and card, with the config
+        rate, the card's rate on the sheet, and the expected pulls per pack.
+    """
+    config_keys = [*BOOSTER_KEYS, "boosterIndex"]
+    sheet_keys = [*BOOSTER_KEYS, "sheetName"]
+    weights = tables["weights"].with_columns(
+        (pl.col("boosterWeight") / pl.col("boosterWeight").sum().over(BOOSTER_KEYS)).alias(
+            "boosterConfigRate"
+        )
+    )
+    sheet_cards = tables["sheet_cards"].with_columns(
+        (pl.col("cardWeight") / pl.col("cardWeight").sum().over(sheet_keys)).alias(
+            "cardSheetRate"
+        )
+    )
+    return (
+        tables["contents"]
+        .join(weights, on=config_keys, how="inner")
+        .join(tables["sheets"], on=sheet_keys, how="inner")
+        .join(sheet_cards, on=sheet_keys, how="inner")
+        .join(
+            cards.select("uuid", "name", "number", "rarity"),
+            left_on="cardUuid",
+            right_on="uuid",
+            how="inner",
+        )
+        .with_columns(
+            (
+                pl.col("cardSheetRate") * pl.col("boosterConfigRate") * pl.col("sheetPicks")
+            ).alias("expectedConfigCardPullRate"),
+        )
+    )
+
+
+def pull_rates(tables: dict, cards: pl.LazyFrame) -> pl.LazyFrame:
+    """Expected pulls per pack of each card, for every set and booster.
+
+    The rates are summed over the configs and sheets, by uuid and by name,
+    so alternate printings of a card are lumped together in the name rate.
+    """
+    rates = sheet_card_rates(tables, cards)
+    by_name = rates.group_by(*BOOSTER_KEYS, "name").agg(
+        pl.col("expectedConfigCardPullRate").sum().alias("expectedCardNamePullRate")
+    )
+    return (
+        rates.group_by(*BOOSTER_KEYS, "cardUuid")
+        .agg(
+            pl.col("name").first(),
+            pl.col("number").first(),
+            pl.col("rarity").first(),
+            pl.col("expectedConfigCardPullRate").sum().alias("expectedCardUuidPullRate"),
+        )
+        .join(by_name, on=[*BOOSTER_KEYS, "name"], how="left")
+        .sort([*BOOSTER_KEYS, "expectedCardUuidPullRate"])
+    )
+
+
+def write_booster_rates(raw_dir: Path, processed_dir: Path) -> dict:
+    """Writes the sheet card rates and the card pull rates of every set and booster.
+
+    Returns:
+        The written files, by table name.
+    """
+    processed_dir = Path(processed_dir)
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    files = {
+        "sheet_card_rates": processed_dir / "All_Sets_booster_sheet_card_rates.parquet",
+        "pull_rates": processed_dir / "All_Sets_card_pull_rates.parquet",
+    }
+    tables = scan_booster_tables(raw_dir)
+    cards = pl.scan_parquet(Path(raw_dir) / "cards.parquet")
+    frames = pl.collect_all([sheet_card_rates(tables, cards), pull_rates(tables, cards)])
+    for (name, file), df in zip(files.items(), frames):
+        df.write_parquet(file)
+        print(f"Wrote {name} {df.shape} to {file}")
+    return files
+
+
+def alias_table(weights: np.ndarray) -> tuple:
+    """Builds a Walker alias table, for O(1) sampling from the weights.
+
+    Returns:
+        The acceptance probabilities and the alias of each outcome.
+    """
+    n = len(weights)
+    prob = np.asarray(weights, dtype=np.float64) * n / np.sum(weights)
+    alias = np.arange(n)
+    small = [i for i in range(n) if prob[i] < 1.0]
+    large = [i for i in range(n) if prob[i] >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        alias[less] = more
+        prob[more] -= 1.0 - prob[less]
+        (small if prob[more] < 1.0 else large).append(more)
+    # Leftovers are 1, up to rounding
+    prob[small + large] = 1.0
+    return prob, alias
+
+
+def sample_alias(prob: np.ndarray, alias: np.ndarray, size, rng: np.random.Generator):
+    """Samples outcome indices from an alias table."""
+    index = rng.integers(len(prob), size=size)
+    return np.where(rng.random(size) < prob[index], index, alias[index])
+
+
+class PackSimulator:
+    """Samples booster packs of one set and booster type.
+
+    Each pack draws a booster config by its weight, then sheetPicks cards
+    from each of the config's sheets by card weight.  Cards are drawn with
+    replacement, as in the expected pull rates.
+
+    Args:
+        tables: The booster tables, from scan_booster_tables().
+        set_code: The set code, e.g. "BLB".
+        booster_name: The booster type, e.g. "play".
+        cache_dir: Directory to cache the simulated pull counts in.
+    """
+
+    def __init__(
+        self, tables: dict, set_code: str, booster_name: str, cache_dir: Path = None
+    ):
+        self.set_code = set_code
+        self.booster_name = booster_name
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+
+        booster = (pl.col("setCode") == set_code) & (pl.col("boosterName") == booster_name)
+        weights, contents, sheet_cards = pl.collect_all(
+            [
+                tables["weights"].filter(booster).sort("boosterIndex"),
+                tables["contents"].filter(booster).sort("boosterIndex", "sheetName"),
+                tables["sheet_cards"].filter(booster).sort("sheetName", "cardUuid"),
+            ]
+        )
+        if weights.is_empty():
+            raise ValueError(f"No {booster_name} boosters for {set_code}")
+
+        self.uuids = sheet_cards["cardUuid"].unique(maintain_order=True).to_list()
+        card_index = {uuid: i for i, uuid in enumerate(self.uuids)}
+        self.sheets = {}
+        for (sheet,), df in sheet_cards.group_by("sheetName", maintain_order=True):
+            cards = np.array([card_index[uuid] for uuid in df["cardUuid"]])
+            self.sheets[sheet] = (cards, *alias_table(df["cardWeight"].to_numpy()))
+
+        self.configs = [
+            [
+                (sheet, picks)
+                for sheet, picks in zip(df["sheetName"], df["sheetPicks"])
+                if sheet in self.sheets
+            ]
+            for index in weights["boosterIndex"]
+            for df in [contents.filter(pl.col("boosterIndex") == index)]
+        ]
+        self.config_table = alias_table(weights["boosterWeight"].to_numpy())
+        self.pack_size = max(sum(picks for _, picks in config) for config in self.configs)
+
+    def simulate(self, n_packs: int, seed: int = None) -> np.ndarray:
+        """Samples packs as card indices into self.uuids.
+
+        Returns:
+            An (n_packs, pack_size) array.  Packs of configs with fewer cards
+            are padded with -1.
+        """
+        rng = np.random.default_rng(seed)
+        packs = np.full((n_packs, self.pack_size), -1, dtype=np.int32)
+        config_ids = sample_alias(*self.config_table, n_packs, rng)
+        for config_id, config in enumerate(self.configs):
+            rows = np.flatnonzero(config_ids == config_id)
+            slot = 0
+            for sheet, picks in config:
+                cards, prob, alias = self.sheets[sheet]
+                draws = sample_alias(prob, alias, (len(rows), picks), rng)
+                packs[rows, slot : slot + picks] = cards[draws]
+                slot += picks
+        return packs
+
+    def pull_counts(
+        self, n_packs: int, seed: int = 0, batch_size: int = 1_000_000
+    ) -> pl.DataFrame:
+        """Simulated pulls of each card, in batches of packs.
+
+        Results are cached per set, booster, pack count, and seed when the
+        simulator has a cache_dir.
+
+        Returns:
+            The cardUuid, the total pulls, the mean pulls per pack, and the
+            share of packs with at least one copy.
+        """
+        cache_file = None
+        if self.cache_dir is not None:
+            name = f"{self.set_code}_{self.booster_name}_{n_packs}_{seed}.parquet"
+            cache_file = self.cache_dir / name
+            if cache_file.exists():
+                return pl.read_parquet(cache_file)
+
+        n_cards = len(self.uuids)
+        pulls = np.zeros(n_cards, dtype=np.int64)
+        packs_with = np.zeros(n_cards, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_packs, batch_size):
+            packs = np.sort(self.simulate(min(batch_size, n_packs - start), rng), axis=1)
+            valid = packs >= 0
+            pulls += np.bincount(packs[valid], minlength=n_cards)
+
+            # Count each card once per pack, at its first slot in the sorted pack
+            first = np.ones_like(valid)
+            first[:, 1:] = packs[:, 1:] != packs[:, :-1]
+            packs_with += np.bincount(packs[valid & first], minlength=n_cards)
+
+        counts = pl.DataFrame(
+            {
+                "cardUuid": self.uuids,
+                "simPulls": pulls,
+                "simPullRate": pulls / n_packs,
+                "simPackRate": packs_with / n_packs,
+            }
+        )
+        if cache_file is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            counts.write_parquet(cache_file)
+        return counts
+
+    def pack_values(self, prices: dict, n_packs: int, seed: int = None) -> np.ndarray:
+        """Simulated value of each pack, for expected value estimates.
+
+        Args:
+            prices: Price of each card uuid.  Missing cards are worth 0.
+        """
+        values = np.array([prices.get(uuid, 0.0) for uuid in self.uuids] + [0.0])
+        # The padding index -1 picks the trailing 0
+        return values[self.simulate(n_packs, seed)].sum(axis=1)
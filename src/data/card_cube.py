@@ -0,0 +1,193 @@
+"""Per-card win rate cube of the 17lands game data.
+
+The cube holds the sufficient statistics of the card win rates: the number
+of games and wins for each card and metric, sliced by rank, main colors, and
+date bucket.  The metrics follow 17lands:
+
+    GP   games played, the card is in the deck
+    OH   the card is in the opening hand
+    GD   the card is drawn after the opening hand
+    GIH  games in hand, the card is in the opening hand or drawn
+    GNS  games not seen, the card is in the deck but never in hand
+
+The counts are computed in a single streaming pass over a set's game data,
+and summed over any slices when queried, so notebooks never join the card
+table back to the games.  When a new dump arrives, only the games after the
+cube's last game time are aggregated and added to the counts.
+"""
+
+import datetime
+import json
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from src.data.game_data_wrangler import parse_columns
+
+METRICS = ["GP", "OH", "GD", "GIH", "GNS"]
+SLICE_COLS = ["rank", "main_colors", "date"]
+CUBE_KEYS = ["card", "metric", *SLICE_COLS]
+METADATA_KEY = b"card_cube"
+
+
+class CardCube:
+    """Builds, updates, and queries a set's card cube.
+
+    Args:
+        cube_file: The cube's parquet file, e.g. "BLB_Game_PD_CardCube.parquet".
+        every: Width of the date buckets, as a polars duration, e.g. "1d" or "1w".
+    """
+
+    def __init__(self, cube_file: Path, every: str = "1d"):
+        self.cube_file = Path(cube_file)
+        self.every = every
+        self.last_game_time = None
+        if self.cube_file.exists():
+            metadata = json.loads(pq.read_schema(self.cube_file).metadata[METADATA_KEY])
+            self.every = metadata["every"]
+            self.last_game_time = datetime.datetime.fromisoformat(
+                metadata["last_game_time"]
+            )
+
+    def update(self, game_file: Path, rebuild: bool = False) -> pl.DataFrame:
+        """Adds the games after the last game time in the cube.
+
+        17lands dumps are cumulative, so the games up to the last game time
+        are already counted and are skipped.
+
+        Args:
+            game_file: The set's game data parquet, with the card state columns,
+                e.g. GameDataWrangler.parquet_file.
+            rebuild: Recount all games, replacing the cube.
+        """
+        df_lazy = pl.scan_parquet(game_file)
+        if self.last_game_time is not None and not rebuild:
+            df_lazy = df_lazy.filter(pl.col("game_time") > self.last_game_time)
+
+        last_game_time = df_lazy.select(pl.col("game_time").max()).collect().item()
+        if last_game_time is None:
+            print(f"No new games for {self.cube_file}")
+            return self.load()
+
+        counts = aggregate_card_counts(df_lazy, self.every)
+        if self.cube_file.exists() and not rebuild:
+            counts = (
+                pl.concat([self.load(), counts])
+                .group_by(CUBE_KEYS)
+                .agg(pl.col("n_games").sum(), pl.col("n_wins").sum())
+            )
+        cube = counts.sort(CUBE_KEYS)
+
+        self.last_game_time = last_game_time
+        metadata = {"every": self.every, "last_game_time": last_game_time.isoformat()}
+        table = cube.to_arrow()
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), METADATA_KEY: json.dumps(metadata)}
+        )
+        pq.write_table(table, self.cube_file, compression="zstd")
+        print(f"Wrote {cube.height:,} card cube rows to {self.cube_file}")
+        return cube
+
+    def load(self) -> pl.DataFrame:
+        """Reads the cube."""
+        return pl.read_parquet(self.cube_file).with_columns(
+            pl.col("metric").cast(pl.String).cast(pl.Enum(METRICS))
+        )
+
+    def win_rates(self, by: list = None, **filters) -> pl.DataFrame:
+        """The games, wins, and win rates of the cards, summed over the other slices.
+
+        Args:
+            by: Columns to group by, besides card and metric, e.g. ["rank"].
+            filters: Slices to keep, as a value or list of values,
+                e.g. main_colors=["WG", "BG"].
+        """
+        by = ["card", "metric", *(by or [])]
+        predicates = [
+            pl.col(col).is_in(value) if isinstance(value, list) else pl.col(col) == value
+            for col, value in filters.items()
+        ]
+        df = self.load()
+        if predicates:
+            df = df.filter(*predicates)
+        return (
+            df.group_by(by)
+            .agg(pl.col("n_games").sum(), pl.col("n_wins").sum())
+            .with_columns((pl.col("n_wins") / pl.col("n_games")).alias("win_rate"))
+            .sort(by)
+        )
+
+    def card_table(self, **filters) -> pl.DataFrame:
+        """One row per card with each metric's games and win rate.
+
+        IWD, the improvement when drawn, is the GIH less the GNS win rate.
+        See win_rates() for the filters.
+        """
+        return (
+            self.win_rates(**filters)
+            .with_columns(pl.col("metric").cast(pl.String))
+            .pivot(on="metric", index="card", values=["n_games", "win_rate"])
+            .with_columns(
+                (pl.col("win_rate_GIH") - pl.col("win_rate_GNS")).alias("IWD")
+            )
+        )
+
+
+def aggregate_card_counts(df_lazy: pl.LazyFrame, every: str = "1d") -> pl.DataFrame:
+    """Counts the games and wins of every card and metric in one pass.
+
+    Args:
+        df_lazy: Game data with the rank, main_colors, game_time, won, and
+            card state columns.
+        every: Width of the date buckets.
+
+    Returns:
+        The long counts, one row per card, metric, and slice with any games.
+    """
+    cards = parse_columns(df_lazy.collect_schema().names())["card_names"]
+    won = pl.col("won")
+
+    keys = [(card, metric) for card in cards for metric in METRICS]
+    aggs = []
+    for card in cards:
+        in_deck = pl.col(f"deck_{card}") > 0
+        opening = pl.col(f"opening_hand_{card}") > 0
+        drawn = pl.col(f"drawn_{card}") > 0
+        seen = {
+            "GP": in_deck,
+            "OH": opening,
+            "GD": drawn,
+            "GIH": opening | drawn,
+            "GNS": in_deck & ~(opening | drawn),
+        }
+        for metric in METRICS:
+            aggs.append(seen[metric].sum().alias(f"n_games|{card}|{metric}"))
+            aggs.append((seen[metric] & won).sum().alias(f"n_wins|{card}|{metric}"))
+
+    wide = (
+        df_lazy.with_columns(
+            pl.col("game_time").dt.truncate(every).dt.date().alias("date")
+        )
+        .group_by(SLICE_COLS)
+        .agg(aggs)
+        .collect(streaming=True)
+    )
+
+    # Stack the (card, metric) columns, in the order of keys, into long rows
+    n_slices = wide.height
+    games = wide.select(pl.col("^n_games.*$")).to_numpy().ravel(order="F")
+    wins = wide.select(pl.col("^n_wins.*$")).to_numpy().ravel(order="F")
+    long = wide.select(SLICE_COLS)[np.tile(np.arange(n_slices), len(keys))]
+    return (
+        long.select(
+            pl.Series("card", np.repeat([card for card, _ in keys], n_slices)),
+            pl.Series("metric", np.repeat([metric for _, metric in keys], n_slices)),
+            *SLICE_COLS,
+            pl.Series("n_games", games, pl.UInt32),
+            pl.Series("n_wins", wins, pl.UInt32),
+        )
+        .with_columns(pl.col("metric").cast(pl.Enum(METRICS)))
+        .filter(pl.col("n_games") > 0)
+    )
@@ -0,0 +1,100 @@
+"""Wrangle the MTGJSON AllPrintings card data.
+
+Joins the set, legality, and purchase URL tables onto the cards, then selects
+the Standard legal cards, and the Standard cards of one set.
+"""
+
+from pathlib import Path
+
+import polars as pl
+
+THIN_COLS = [
+    "name",
+    "setCode",
+    "releaseDate",
+    "number",
+    "layout",
+    "availability",
+    "power",
+    "toughness",
+    "colorIdentity",
+    "colors",
+    "types",
+    "subtypes",
+    "supertypes",
+    "manaCost",
+    "manaValue",
+    "edhrecRank",
+    "edhrecSaltiness",
+    "text",
+    "flavorText",
+]
+
+
+def scan_wide_cards(raw_dir: Path) -> pl.LazyFrame:
+    """Lazily joins the sets, legalities, and purchase URLs onto the cards."""
+    raw_dir = Path(raw_dir)
+    cards = pl.scan_parquet(raw_dir / "cards.parquet")
+    legalities = pl.scan_parquet(raw_dir / "cardLegalities.parquet")
+    purchase_urls = pl.scan_parquet(raw_dir / "cardPurchaseUrls.parquet")
+    sets = pl.scan_parquet(raw_dir / "sets.parquet")
+    return (
+        cards.join(sets, left_on="setCode", right_on="code", how="left")
+        .join(legalities, on="uuid", how="left")
+        .join(purchase_urls, on="uuid", how="left")
+    )
+
+
+def standard_cards(wide_cards: pl.LazyFrame) -> pl.LazyFrame:
+    """The Standard legal, black bordered, non-promo cards.
+
+    See the [MTG Wiki Standard/Timeline](https://mtg.fandom.com/wiki/Standard/Timeline)
+    to validate the card composition.
+    """
+    return (
+        wide_cards.filter(pl.col("standard") == "Legal")
+        .filter(pl.col("borderColor") == "black")
+        .filter(pl.col("isPromo").is_null())
+        .filter(pl.col("promoTypes").is_null())
+    )
+
+
+def write_card_tables(paths: dict, set_code: str) -> dict:
+    """Writes the wide cards, the Standard cards, and one set's Standard cards.
+
+    Args:
+        paths: The "raw" AllPrintings parquet directory, and the "interim"
+            and "processed" directories.
+        set_code: The set for the per-set tables, e.g. "BLB".
+
+    Returns:
+        The written files, by table name.
+    """
+    paths = {key: Path(path) for key, path in paths.items()}
+    paths["interim"].mkdir(parents=True, exist_ok=True)
+    paths["processed"].mkdir(parents=True, exist_ok=True)
+    files = {
+        "wide": paths["interim"] / "wide_cards.parquet",
+        "standard": paths["processed"] / "standard_cards.parquet",
+        "set": paths["processed"] / f"{set_code}_std_cards.parquet",
+        "set_thin": paths["processed"] / f"{set_code}_std_thin.parquet",
+    }
+
+    wide = scan_wide_cards(paths["raw"])
+    standard = standard_cards(wide)
+    set_cards = standard.filter(pl.col("setCode") == set_code).sort(pl.col("number"))
+    set_thin = set_cards.select(
+        pl.col(col).str.zfill(3) if col == "number" else pl.col(col) for col in THIN_COLS
+    )
+    frames = pl.collect_all(
+        [
+            wide,
+            standard.sort("power", "releaseDate", "name", maintain_order=True),
+            set_cards,
+            set_thin,
+        ]
+    )
+    for (name, file), df in zip(files.items(), frames):
+        df.write_parquet(file)
+        print(f"Wrote {name} cards {df.shape} to {file}")
+    return files
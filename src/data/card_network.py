@@ -0,0 +1,204 @@
+"""Draft-card networks as sparse matrices.
+
+The bipartite draft-card graph is stored as a draft by card CSR incidence
+matrix.  The card-card projection, the number of drafts with both cards, is
+the sparse integer product B.T @ B, summed over chunks of drafts in parallel.
+At most one chunk per worker is in flight, so the memory is bounded by the
+chunk size times the number of workers.  Graph objects (networkx, PyG) are
+only built on demand from the edge lists.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import polars as pl
+import scipy.sparse
+
+CHUNK_SIZE = 100_000
+
+
+def _cooccurrence_chunk(incidence: scipy.sparse.csr_matrix) -> scipy.sparse.csr_matrix:
+    return (incidence.T @ incidence).tocsr()
+
+
+class CardNetwork:
+    """The draft by card incidence matrix and its card projection.
+
+    Args:
+        incidence: The draft by card CSR matrix.
+        drafts: The draft ids of the rows.
+        cards: The card names of the columns.
+    """
+
+    def __init__(self, incidence: scipy.sparse.csr_matrix, drafts: list, cards: list):
+        self.incidence = incidence.tocsr()
+        self.drafts = list(drafts)
+        self.cards = list(cards)
+
+    @classmethod
+    def from_edges(
+        cls,
+        df: pl.DataFrame,
+        draft_col: str = "draft_idx",
+        card_col: str = "card",
+        binary: bool = True,
+    ):
+        """Builds the network from (draft, card) edge rows.
+
+        Args:
+            df: The edges, e.g. deck_melt_card.feather filtered to in_deck.
+                A pandas DataFrame is also accepted.
+            binary: Count each card once per draft, instead of once per row.
+        """
+        df = pl.from_pandas(df) if not isinstance(df, pl.DataFrame) else df
+        drafts = df[draft_col].unique().sort()
+        cards = df[card_col].unique().sort()
+        rows = _codes(df[draft_col], drafts)
+        cols = _codes(df[card_col], cards)
+        incidence = scipy.sparse.csr_matrix(
+            (np.ones(len(df), dtype=np.int64), (rows, cols)),
+            shape=(len(drafts), len(cards)),
+        )
+        if binary:
+            incidence.data[:] = 1
+        return cls(incidence, drafts.to_list(), cards.to_list())
+
+    @classmethod
+    def from_card_states(cls, store, state: str = "deck", binary: bool = True):
+        """Builds the network from a CardStateStore, with one row per draft.
+
+        The games of each draft are merged, so a card is linked to a draft if
+        it is in the state in any of the draft's games.
+        """
+        games = store.to_csr(state)
+        draft_ids = store.games["draft_id"]
+        drafts = draft_ids.unique().sort()
+        draft_rows = _codes(draft_ids, drafts)
+        game_rows = np.arange(len(draft_rows))
+        merge = scipy.sparse.csr_matrix(
+            (np.ones(len(draft_rows), dtype=np.int64), (draft_rows, game_rows)),
+            shape=(len(drafts), games.shape[0]),
+        )
+        incidence = (merge @ games.astype(np.int64)).tocsr()
+        if binary:
+            incidence.data[:] = 1
+        return cls(incidence, drafts.to_list(), store.cards["card"].to_list())
+
+    def cooccurrence(
+        self, chunk_size: int = CHUNK_SIZE, n_workers: int = None
+    ) -> scipy.sparse.csr_matrix:
+        """The card by card counts of drafts with both cards.
+
+        The diagonal holds each card's number of drafts.
+
+        Args:
+            chunk_size: Drafts per chunk of the product.  Up to n_workers
+                chunks are held in memory at once.
+            n_workers: Processes to use.  Defaults to the CPU count.
+        """
+        n_workers = n_workers or os.cpu_count()
+        starts = range(0, self.incidence.shape[0], chunk_size)
+        chunks = (self.incidence[start : start + chunk_size] for start in starts)
+        total = scipy.sparse.csr_matrix((len(self.cards), len(self.cards)), dtype=np.int64)
+        if n_workers == 1 or len(starts) == 1:
+            for chunk in chunks:
+                total += _cooccurrence_chunk(chunk)
+            return total
+        # Spawn, as forking after polars has started its thread pool can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as executor:
+            # Submit a chunk only when a worker is free, unlike executor.map,
+            # which slices and queues all the chunks at once
+            running = set()
+            for chunk in chunks:
+                if len(running) >= n_workers:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        total += future.result()
+                running.add(executor.submit(_cooccurrence_chunk, chunk))
+            for future in running:
+                total += future.result()
+        return total
+
+    def lift(self, min_count: int = 1, **kwargs) -> pl.DataFrame:
+        """The card pairs, with their co-occurrence count and lift.
+
+        Lift is the rate of drafts with both cards over the rate expected if
+        the cards were independent.  Each pair is listed once.
+
+        Args:
+            min_count: Minimum number of drafts with both cards.
+            kwargs: Passed to cooccurrence().
+        """
+        counts = scipy.sparse.triu(self.cooccurrence(**kwargs), k=1).tocoo()
+        keep = counts.data >= min_count
+        rows, cols = counts.row[keep], counts.col[keep]
+        both = counts.data[keep].astype(np.float64)
+        n_card_drafts = np.asarray(self.incidence.sum(axis=0)).ravel()
+        n_drafts = self.incidence.shape[0]
+        cards = np.array(self.cards, dtype=object)
+        return pl.DataFrame(
+            {
+                "card_a": cards[rows],
+                "card_b": cards[cols],
+                "count": both.astype(np.int64),
+                "lift": both * n_drafts / (n_card_drafts[rows] * n_card_drafts[cols]),
+            }
+        ).sort("lift", descending=True)
+
+    def edge_list(self) -> pl.DataFrame:
+        """The draft-card edges of the bipartite graph."""
+        incidence = self.incidence.tocoo()
+        return pl.DataFrame(
+            {
+                "draft": np.array(self.drafts, dtype=object)[incidence.row],
+                "card": np.array(self.cards, dtype=object)[incidence.col],
+                "weight": incidence.data,
+            }
+        )
+
+    def to_networkx(self, projection: bool = False, **kwargs):
+        """Builds a networkx graph.
+
+        Args:
+            projection: Build the card-card graph, weighted by count and lift,
+                instead of the bipartite draft-card graph.
+            kwargs: Passed to lift() for the projection.
+        """
+        import networkx as nx
+
+        graph = nx.Graph()
+        if projection:
+            edges = self.lift(**kwargs)
+            graph.add_nodes_from(self.cards)
+            graph.add_edges_from(
+                (card_a, card_b, {"weight": count, "lift": lift})
+                for card_a, card_b, count, lift in edges.rows()
+            )
+            return graph
+
+        graph.add_nodes_from(self.drafts, bipartite=0)
+        graph.add_nodes_from(self.cards, bipartite=1)
+        graph.add_edges_from(self.edge_list().select("draft", "card").rows())
+        return graph
+
+    def to_pyg(self):
+        """Builds a PyG HeteroData graph of the draft-card edges."""
+        import torch
+        from torch_geometric.data import HeteroData
+
+        incidence = self.incidence.tocoo()
+        data = HeteroData()
+        data["draft"].num_nodes = len(self.drafts)
+        data["card"].num_nodes = len(self.cards)
+        data["draft", "has", "card"].edge_index = torch.from_numpy(
+            np.vstack([incidence.row, incidence.col]).astype(np.int64)
+        )
+        return data
+
+
+def _codes(values: pl.Series, categories: pl.Series) -> np.ndarray:
+    """The index of each value in the sorted, unique categories."""
+    return np.searchsorted(categories.to_numpy(), values.to_numpy())
@@ -0,0 +1,184 @@
+"""Sparse long-format storage of the 17lands card state columns.
+
+The game_data files store each card state (deck, drawn, opening hand,
+sideboard, tutored) as a wide column per card, and most counts are zero.
+The store keeps only the non-zero counts as long (game_key, card_id, state,
+count) rows, sorted by card, with dictionaries for the games and cards:
+
+    games.parquet   game_key and the game id columns
+    cards.parquet   card_id and the card name
+    states.parquet  game_key, card_id, state, count
+
+A single card's rows are contiguous, so reading them only touches the row
+groups of that card.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import scipy.sparse
+
+from src.data.game_data_wrangler import ID_COLS, STATE_PREFIXES
+
+STATES = [prefix.rstrip("_") for prefix in STATE_PREFIXES]
+STATE_SCHEMA = pa.schema(
+    [
+        ("game_key", pa.uint32()),
+        ("card_id", pa.uint16()),
+        ("state", pa.dictionary(pa.int8(), pa.string())),
+        ("count", pa.uint8()),
+    ]
+)
+ROW_GROUP_SIZE = 64 * 1024
+
+
+class CardStateStore:
+    """Reads a set's sparse card states, as long rows, wide columns, or CSR matrices."""
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.states_path = self.store_dir / "states.parquet"
+        self.games = pl.read_parquet(self.store_dir / "games.parquet")
+        self.cards = pl.read_parquet(self.store_dir / "cards.parquet")
+        self._card_ids = dict(zip(self.cards["card"], self.cards["card_id"]))
+
+    @classmethod
+    def build(cls, wide_path: Path, store_dir: Path, cards_per_read: int = 32):
+        """Builds the store from a wide game_data (or card table) parquet file.
+
+        The card columns are read a few cards at a time, so memory is bounded
+        by the number of games times cards_per_read.
+
+        Args:
+            wide_path: Parquet file with the id columns and the card state columns.
+            store_dir: Directory to write the store to.
+            cards_per_read: Number of cards whose columns are read at once.
+        """
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        names = pq.read_schema(wide_path).names
+        cols = set(names)
+        cards = [col.removeprefix("deck_") for col in names if col.startswith("deck_")]
+
+        (
+            pl.scan_parquet(wide_path)
+            .select(ID_COLS)
+            .with_row_index("game_key")
+            .collect()
+            .write_parquet(store_dir / "games.parquet")
+        )
+        card_ids = pl.int_range(len(cards), dtype=pl.UInt16, eager=True)
+        pl.DataFrame({"card_id": card_ids, "card": cards}).write_parquet(
+            store_dir / "cards.parquet"
+        )
+
+        file = pq.ParquetFile(wide_path)
+        states = pa.array(STATES).dictionary_encode()
+        n_rows = 0
+        with pq.ParquetWriter(store_dir / "states.parquet", STATE_SCHEMA) as writer:
+            for first in range(0, len(cards), cards_per_read):
+                chunk = cards[first : first + cards_per_read]
+                chunk_cols = [
+                    f"{prefix}{card}"
+                    for card in chunk
+                    for prefix in STATE_PREFIXES
+                    if f"{prefix}{card}" in cols
+                ]
+                table = file.read(columns=chunk_cols)
+                columns = {name: [] for name in STATE_SCHEMA.names}
+                for card_id, card in enumerate(chunk, start=first):
+                    for state_id, prefix in enumerate(STATE_PREFIXES):
+                        if f"{prefix}{card}" not in cols:
+                            continue
+                        counts = pc.fill_null(table.column(f"{prefix}{card}"), 0)
+                        counts = counts.to_numpy()
+                        game_keys = np.flatnonzero(counts)
+                        n_counts = len(game_keys)
+                        columns["game_key"].append(game_keys.astype(np.uint32))
+                        columns["card_id"].append(np.full(n_counts, card_id, np.uint16))
+                        columns["state"].append(np.full(n_counts, state_id, np.int8))
+                        columns["count"].append(counts[game_keys].astype(np.uint8))
+                batch = pa.RecordBatch.from_arrays(
+                    [
+                        pa.array(np.concatenate(columns["game_key"])),
+                        pa.array(np.concatenate(columns["card_id"])),
+                        pa.DictionaryArray.from_arrays(
+                            np.concatenate(columns["state"]), states.dictionary
+                        ),
+                        pa.array(np.concatenate(columns["count"])),
+                    ],
+                    schema=STATE_SCHEMA,
+                )
+                writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+                n_rows += batch.num_rows
+        print(f"Built card state store with {n_rows:,} non-zero counts in {store_dir}")
+        return cls(store_dir)
+
+    def scan(self) -> pl.LazyFrame:
+        """Lazily scans the long (game_key, card_id, state, count) rows."""
+        return pl.scan_parquet(self.states_path).with_columns(
+            pl.col("state").cast(pl.String).cast(pl.Enum(STATES))
+        )
+
+    def card(self, card: str, states: list = None) -> pl.DataFrame:
+        """The non-zero counts of one card, joined to the game ids.
+
+        Args:
+            card: The card name.
+            states: States to keep, e.g. ["opening_hand"].  Defaults to all.
+        """
+        df = self.scan().filter(pl.col("card_id") == self._card_ids[card])
+        if states is not None:
+            df = df.filter(pl.col("state").is_in(states))
+        return df.collect().join(self.games, on="game_key", how="left")
+
+    def to_wide(self, states: list = None, cards: list = None) -> pl.DataFrame:
+        """Pivots the counts back to the wide layout, with zeros filled in.
+
+        Args:
+            states: States to include.  Defaults to all.
+            cards: Cards to include.  Defaults to all.
+        """
+        states = states or STATES
+        cards = cards or self.cards["card"].to_list()
+        card_ids = [self._card_ids[card] for card in cards]
+        wide_cols = [f"{state}_{card}" for state in states for card in cards]
+
+        df = (
+            self.scan()
+            .filter(pl.col("state").is_in(states), pl.col("card_id").is_in(card_ids))
+            .join(self.cards.lazy(), on="card_id")
+            .select(
+                "game_key",
+                pl.concat_str("state", "card", separator="_").alias("col"),
+                "count",
+            )
+            .collect()
+            .pivot(on="col", index="game_key", values="count")
+        )
+        missing = [
+            pl.lit(0, pl.UInt8).alias(col) for col in wide_cols if col not in df.columns
+        ]
+        return (
+            self.games.join(df.with_columns(missing), on="game_key", how="left")
+            .with_columns(pl.col(wide_cols).fill_null(0))
+            .select(*self.games.columns, *wide_cols)
+        )
+
+    def to_csr(self, state: str) -> scipy.sparse.csr_matrix:
+        """The games by cards matrix of counts for the state.
+
+        Rows are game_key and columns are card_id, per self.games and self.cards.
+        """
+        df = self.scan().filter(pl.col("state") == state).collect()
+        return scipy.sparse.csr_matrix(
+            (
+                df["count"].to_numpy(),
+                (df["game_key"].to_numpy(), df["card_id"].to_numpy()),
+            ),
+            shape=(len(self.games), len(self.cards)),
+        )
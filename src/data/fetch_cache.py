@@ -0,0 +1,120 @@
+"""Manifest-backed cache of fetched MTGJSON artifacts.
+
+Each artifact is recorded with its HTTP validators (ETag/Last-Modified), the
+MTGJSON Meta version/date it was built from, and the sha256 of the archive.
+A fetch compares these against the remote before downloading, and skips the
+download when nothing changed.
+
+Fetchers of different artifacts can share a manifest, e.g. when the refresh
+downloads the printings and prices concurrently.  Each update re-reads the
+manifest and merges its change under a lock, so no fetch drops another's
+entry or statistics.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+VALIDATORS = ["etag", "last_modified", "meta_version", "meta_date"]
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+class FetchCache:
+    """Tracks fetched artifacts and the cache hit/miss statistics."""
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self.manifest = self._load()
+
+    @property
+    def stats(self) -> dict:
+        """The cumulative hits, misses, and bytes saved."""
+        return self.manifest["stats"]
+
+    def get(self, key: str) -> dict:
+        """The manifest entry of the artifact, or None if it was never fetched."""
+        return self.manifest["artifacts"].get(key)
+
+    def is_fresh(self, key: str, remote: dict, outputs: list) -> bool:
+        """Whether the cached artifact matches the remote and its outputs exist.
+
+        The sha256 decides when both sides have one, since the content is the
+        same regardless of the headers.  Otherwise a 304 response, or matching
+        validators, mark the artifact as unchanged.
+
+        Args:
+            key: The artifact name, e.g. "AllPrices.json.gz".
+            remote: The remote fingerprint, with keys status, sha256, and VALIDATORS.
+            outputs: The paths the artifact was decompressed into.
+        """
+        entry = self.get(key)
+        if entry is None or not all(_has_content(path) for path in outputs):
+            return False
+
+        if remote.get("sha256") and entry.get("sha256"):
+            return remote["sha256"] == entry["sha256"]
+        if remote.get("status") == 304:
+            return True
+
+        compared = [name for name in VALIDATORS if remote.get(name) and entry.get(name)]
+        return bool(compared) and all(remote[name] == entry[name] for name in compared)
+
+    def record_hit(self, key: str):
+        """Counts a skipped download, and the bytes it saved."""
+        size = self.manifest["artifacts"][key].get("size") or 0
+        with self._lock():
+            self.manifest = self._load()
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += size
+            self._save()
+
+    def record_fetch(self, key: str, remote: dict, sha256: str, size: int, outputs: list):
+        """Counts a download, and records its fingerprint for the next fetch."""
+        entry = {
+            **{name: remote.get(name) for name in VALIDATORS},
+            "sha256": sha256,
+            "size": size,
+            "outputs": [str(path) for path in outputs],
+            "fetched": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock():
+            self.manifest = self._load()
+            self.stats["misses"] += 1
+            self.manifest["artifacts"][key] = entry
+            self._save()
+
+    def _lock(self) -> threading.Lock:
+        """The lock shared by the caches of the same manifest."""
+        with _locks_lock:
+            return _locks.setdefault(self.manifest_path.resolve(), threading.Lock())
+
+    def _load(self) -> dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        return {"artifacts": {}, "stats": {"hits": 0, "misses": 0, "bytes_saved": 0}}
+
+    def _save(self):
+        """Atomically writes the manifest, through a temporary file of its own."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=self.manifest_path.parent,
+            prefix=self.manifest_path.name + ".",
+            suffix=".tmp",
+            delete=False,
+        ) as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(file.name, self.manifest_path)
+
+
+def _has_content(path) -> bool:
+    """Whether the path is a file, or a directory with files in it."""
+    path = Path(path)
+    return path.is_file() or (path.is_dir() and any(path.iterdir()))
@@ -0,0 +1,186 @@
+"""Draft table and set summary of the 17lands game data, in one streaming pass.
+
+A single group-by over draft_id computes the draft table, along with a few
+per-draft partial sums (turns, game times, card and land counts) from which
+the set summary is derived.  The game data is scanned once, instead of once
+for the drafts, the summary, the card maxima, and the land sums.
+"""
+
+from pathlib import Path
+
+import polars as pl
+
+from src.data.card_cube import CardCube
+from src.data.game_data_wrangler import ID_COLS, GameDataWrangler, parse_columns
+
+# File suffixes of the processed per-set tables, after the set code
+GAME_TABLES = {
+    "summary": "_Game_PD_Summary",
+    "game": "_Game_PD_Games",
+    "draft": "_Game_PD_Drafts",
+    "card": "_Game_PD_Cards",
+}
+CUBE_SUFFIX = "_Game_PD_CardCube"
+
+DRAFT_COLS = [
+    "draft_id",
+    "expansion",
+    "n_builds",
+    "n_matches",
+    "n_games",
+    "n_wins",
+    "win_rate",
+    "rank",
+    "opp_rank",
+    "main_colors",
+    "opp_colors",
+    "splash_colors",
+    "n_starts",
+    "n_muls",
+    "n_opp_muls",
+    "mean_turns",
+    "draft_time",
+    "first_game_time",
+    "last_game_time",
+    "n_losses",
+]
+
+
+def draft_aggs() -> list:
+    """The aggregations of the draft table, per draft_id."""
+    return [
+        pl.col("expansion").first(),
+        pl.col("build_index").max().alias("n_builds"),
+        pl.col("match_number").max().alias("n_matches"),
+        pl.col("game_number").count().alias("n_games"),
+        pl.col("won").sum().alias("n_wins"),
+        pl.col("won").mean().alias("win_rate"),
+        pl.col("rank").last(),
+        pl.col("opp_rank").last(),
+        pl.col("main_colors").last(),
+        pl.col("opp_colors").last(),
+        pl.col("splash_colors").last(),
+        pl.col("on_play").sum().alias("n_starts"),
+        pl.col("num_mulligans").sum().alias("n_muls"),
+        pl.col("opp_num_mulligans").sum().alias("n_opp_muls"),
+        pl.col("num_turns").mean().alias("mean_turns"),
+        pl.col("draft_time").mean().alias("draft_time"),
+        pl.col("game_time").first().alias("first_game_time"),
+        pl.col("game_time").last().alias("last_game_time"),
+    ]
+
+
+def partial_aggs(land_card_cols: list, non_land_card_cols: list) -> list:
+    """Per-draft partial sums and extrema that the summary is derived from."""
+    land_sum = pl.sum_horizontal(land_card_cols)
+    return [
+        pl.col("draft_id").count().alias("_n_rows"),
+        pl.col("game_time").min().alias("_min_game_time"),
+        pl.col("game_time").max().alias("_max_game_time"),
+        pl.col("game_number").max().alias("_max_game_number"),
+        pl.col("num_turns").count().alias("_n_turns"),
+        pl.col("num_turns").sum().alias("_sum_turns"),
+        pl.col("num_turns").max().alias("_max_turns"),
+        pl.col("num_turns").min().alias("_min_turns"),
+        pl.col("on_play").count().alias("_n_on_play"),
+        pl.col("won").count().alias("_n_won"),
+        pl.max_horizontal(non_land_card_cols).max().alias("_max_card"),
+        land_sum.count().alias("_n_land"),
+        land_sum.sum().alias("_sum_land"),
+        land_sum.max().alias("_max_land"),
+        land_sum.min().alias("_min_land"),
+    ]
+
+
+def draft_partials(df_lazy: pl.LazyFrame) -> pl.LazyFrame:
+    """The draft table with the per-draft partials, as a single group-by."""
+    cols = parse_columns(df_lazy.collect_schema().names())
+    return (
+        df_lazy.group_by("draft_id")
+        .agg(
+            *draft_aggs(),
+            *partial_aggs(cols["land_card_cols"], cols["non_land_card_cols"]),
+        )
+        .with_columns((pl.col("n_games") - pl.col("n_wins")).alias("n_losses"))
+    )
+
+
+def aggregate_game_data(df_lazy: pl.LazyFrame) -> dict:
+    """Computes the draft table and the set summary in one streaming pass.
+
+    Args:
+        df_lazy: A set's game data with the card state columns, e.g.
+            GameDataWrangler.scan().
+
+    Returns:
+        A dict of the "drafts" and "summary" DataFrames, as in the
+        20-draft-data-wrangle notebook.
+    """
+    n_cards = len(parse_columns(df_lazy.collect_schema().names())["card_names"])
+    partials = draft_partials(df_lazy).collect(streaming=True)
+
+    n_games = pl.col("_n_rows").sum()
+    summary = partials.select(
+        pl.col("expansion").first(),
+        pl.col("_min_game_time").min().alias("first_game"),
+        pl.col("_max_game_time").max().alias("last_game"),
+        pl.col("_max_game_number").max().alias("max_games"),
+        (pl.col("n_wins").sum() / pl.col("_n_won").sum()).alias("win_rate"),
+        (pl.col("n_starts").sum() / pl.col("_n_on_play").sum()).alias("start_rate"),
+        n_games.alias("n_games"),
+        pl.col("n_muls").sum().alias("n_mul"),
+        pl.col("n_opp_muls").sum().alias("n_opp_mul"),
+        (pl.col("_sum_turns").sum() / pl.col("_n_turns").sum()).alias("mean_turns"),
+        pl.col("_sum_turns").sum().alias("total_turns"),
+        pl.col("_max_turns").max().alias("max_turns"),
+        pl.col("_min_turns").min().alias("min_turns"),
+        pl.col("draft_id").count().alias("n_drafts"),
+        pl.col("n_matches").sum().alias("n_matches"),
+        pl.col("n_matches").mean().alias("mean_matches"),
+        (n_games / pl.col("draft_id").count()).alias("n_games_per_draft"),
+        pl.lit(n_cards).alias("n_cards"),
+        pl.col("_max_card").max().alias("max_card"),
+        (pl.col("_sum_land").sum() / pl.col("_n_land").sum()).alias("mean_land"),
+        pl.col("_max_land").max().alias("max_land"),
+        pl.col("_min_land").min().alias("min_land"),
+    )
+    return {"drafts": partials.select(DRAFT_COLS), "summary": summary}
+
+
+def write_game_tables(set_code: str, paths: dict, overwrite: bool = False) -> dict:
+    """Writes a set's game, draft, card, and summary tables, and updates its card cube.
+
+    Args:
+        set_code: The set, e.g. "BLB".
+        paths: The "raw", "interim", and "processed" directories of the
+            game data, as for GameDataWrangler.
+        overwrite: Convert the CSV to parquet again, even if it was converted.
+
+    Returns:
+        The written files, by table name.
+    """
+    wrangler = GameDataWrangler(set_code, paths)
+    wrangler.csv_to_parquet(overwrite=overwrite)
+    processed = Path(paths["processed"])
+    files = {
+        name: processed / f"{set_code}{suffix}.parquet" for name, suffix in GAME_TABLES.items()
+    }
+
+    df_lazy = wrangler.scan()
+    columns = wrangler.columns
+    aggregates = aggregate_game_data(df_lazy)
+    tables = {
+        "summary": aggregates["summary"],
+        "draft": aggregates["drafts"],
+        "game": df_lazy.select(columns["index_cols"]).collect(),
+        "card": df_lazy.select(
+            *ID_COLS, *columns["land_card_cols"], *columns["non_land_card_cols"]
+        ).collect(),
+    }
+    for name, df in tables.items():
+        df.write_parquet(files[name])
+        print(f"Wrote {set_code} {name} table {df.shape} to {files[name]}")
+
+    files["cube"] = processed / f"{set_code}{CUBE_SUFFIX}.parquet"
+    CardCube(files["cube"]).update(wrangler.parquet_file)
+    return files
@@ -0,0 +1,101 @@
+"""Wrangle the 17lands game_data CSV files"""
+
+import csv
+import os
+from pathlib import Path
+
+import polars as pl
+
+STATE_PREFIXES = ["tutored_", "deck_", "opening_hand_", "drawn_", "sideboard_"]
+LAND_CARDS = ["Plains", "Island", "Swamp", "Mountain", "Forest"]
+ID_COLS = ["expansion", "draft_id", "match_number", "game_number", "build_index"]
+DATETIME_COLS = ["draft_time", "game_time"]
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Columns with inconsistent inferred types across sets
+SCHEMA_OVERRIDES = {
+    "rank": pl.String,
+    "opp_rank": pl.String,
+    "draft_time": pl.String,
+    "game_time": pl.String,
+}
+
+
+def parse_columns(cols: list) -> dict:
+    """Splits the game_data columns into the index and card state columns.
+
+    Returns:
+        A dict of column lists: card_cols, index_cols, land_card_cols,
+        non_land_card_cols, and the card names.
+    """
+    card_cols = [col for col in cols if col.startswith(tuple(STATE_PREFIXES))]
+    card_col_set = set(card_cols)
+    return {
+        "card_cols": card_cols,
+        "index_cols": [col for col in cols if col not in card_col_set],
+        "card_names": [col.split("_")[-1] for col in card_cols if col.startswith("deck_")],
+        "land_card_cols": [
+            col for col in card_cols if any(land in col for land in LAND_CARDS)
+        ],
+        "non_land_card_cols": [
+            col for col in card_cols if all(land not in col for land in LAND_CARDS)
+        ],
+    }
+
+
+class GameDataWrangler:
+    """Converts a set's 17lands game_data CSV to a typed parquet file.
+
+    The schema override, datetime parsing, and UInt8 typing of the card count
+    columns all happen inside a single streaming CSV to parquet pass.  The
+    schema is built from the header of each file, so sets with different
+    card columns are handled alike.
+    """
+
+    def __init__(self, set_code: str, paths: dict, draft_format: str = "PremierDraft"):
+        self.set_code = set_code
+        self.draft_format = draft_format
+        self.paths = {key: Path(path) for key, path in paths.items()}
+
+        name = f"game_data_public.{set_code}.{draft_format}"
+        self.csv_file = self.paths["raw"] / f"{name}.csv"
+        self.parquet_file = self.paths["interim"] / f"{name}.parquet"
+
+        os.makedirs(self.paths["interim"], exist_ok=True)
+        os.makedirs(self.paths["processed"], exist_ok=True)
+
+    def csv_to_parquet(self, overwrite: bool = False):
+        """Converts the CSV to parquet in one streaming pass, if needed."""
+        if self.parquet_file.exists() and not overwrite:
+            return
+        print(f"Converting {self.csv_file} to parquet...")
+
+        cols = self.read_header()
+        schema_overrides = {
+            **{col: pl.UInt8 for col in parse_columns(cols)["card_cols"]},
+            **{col: dtype for col, dtype in SCHEMA_OVERRIDES.items() if col in cols},
+        }
+        (
+            pl.scan_csv(self.csv_file, schema_overrides=schema_overrides)
+            .with_columns(
+                pl.col(col).str.strptime(pl.Datetime, DATETIME_FORMAT)
+                for col in DATETIME_COLS
+                if col in cols
+            )
+            .sink_parquet(self.parquet_file)
+        )
+        print(f"Converted {self.csv_file} to parquet")
+
+    def read_header(self) -> list:
+        """Reads the column names from the CSV header."""
+        with open(self.csv_file, "r", encoding="utf-8", newline="") as file:
+            return next(csv.reader(file))
+
+    def scan(self) -> pl.LazyFrame:
+        """Lazily scans the converted parquet file."""
+        return pl.scan_parquet(self.parquet_file)
+
+    @property
+    def columns(self) -> dict:
+        """The index and card state columns of the converted file."""
+        return parse_columns(self.scan().collect_schema().names())
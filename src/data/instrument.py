@@ -0,0 +1,291 @@
+"""Structured timing and resource events for the fetch and wrangle stages.
+
+A stage is timed with the stage() context manager, or the instrumented()
+decorator.  When it ends, an event with its wall time, CPU time, peak RSS
+growth, bytes read and written, and rows produced is sent to each sink, as
+a JSON-serializable dict.  Progress messages inside a stage are sent with
+log().  Stages nest, and events carry their parent stage and run id.
+
+    with instrument.Run("refresh"):
+        with instrument.stage("prices.unstack") as s:
+            s.add_input(nested_file)
+            ...
+            s.rows = df.height
+            s.add_output(flat_file)
+
+Sinks have an emit(event) method.  The default prints progress lines, as the
+wrangles did with print().  JsonlSink, LoggingSink, and MemorySink (for
+tests) are also provided; see set_sinks().  A Run prints a summary table of
+its stages when it ends.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import resource
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import polars as pl
+
+_stack = contextvars.ContextVar("instrument_stack", default=())
+_run_id = contextvars.ContextVar("instrument_run_id", default=None)
+
+
+class PrintSink:
+    """Prints messages, and a line per finished stage."""
+
+    def emit(self, event: dict):
+        if event["event"] == "message":
+            print(event["message"])
+        elif event["event"] == "stage":
+            print(format_stage(event))
+
+
+class JsonlSink:
+    """Appends each event as a JSON line to a file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def emit(self, event: dict):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(event, default=str) + "\n")
+
+
+class LoggingSink:
+    """Logs each event as JSON to a logger."""
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("src.data")
+        self.level = level
+
+    def emit(self, event: dict):
+        self.logger.log(self.level, json.dumps(event, default=str))
+
+
+class MemorySink:
+    """Keeps the events in a list, e.g. for tests."""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event: dict):
+        self.events.append(event)
+
+    @property
+    def stages(self) -> list:
+        """The finished stage events."""
+        return [event for event in self.events if event["event"] == "stage"]
+
+
+_sinks = [PrintSink()]
+
+
+def set_sinks(*sinks) -> list:
+    """Replaces the sinks, and returns the previous ones."""
+    previous = list(_sinks)
+    _sinks[:] = sinks
+    return previous
+
+
+def add_sink(sink):
+    """Sends the events to the sink too."""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """Stops sending the events to the sink."""
+    _sinks.remove(sink)
+
+
+def emit(event: dict):
+    """Sends the event to the sinks."""
+    for sink in list(_sinks):
+        sink.emit(event)
+
+
+def log(message: str, **fields):
+    """Sends a progress message, tagged with the current stage."""
+    stack = _stack.get()
+    emit(
+        {
+            "event": "message",
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "run_id": _run_id.get(),
+            "stage": stack[-1].name if stack else None,
+            "message": message,
+            **fields,
+        }
+    )
+
+
+class Stage:
+    """Measures a stage between __enter__ and __exit__.  See stage()."""
+
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.rows = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add_input(self, path: Path):
+        """Counts the size of a file, or of the files in a directory, as read."""
+        self.bytes_read += _size(path)
+
+    def add_output(self, path: Path):
+        """Counts the size of a file, or of the files in a directory, as written."""
+        self.bytes_written += _size(path)
+
+    def __enter__(self):
+        self._token = _stack.set((*_stack.get(), self))
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._rss_start = _max_rss_bytes()
+        self.started = datetime.now().isoformat(timespec="milliseconds")
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall_s = time.perf_counter() - self._start
+        cpu_s = time.process_time() - self._cpu_start
+        _stack.reset(self._token)
+        parent = _stack.get()
+        emit(
+            {
+                "event": "stage",
+                "run_id": _run_id.get(),
+                "stage": self.name,
+                "parent": parent[-1].name if parent else None,
+                "status": "ok" if exc_type is None else "error",
+                "error": None if exc is None else repr(exc),
+                "started": self.started,
+                "wall_s": wall_s,
+                "cpu_s": cpu_s,
+                "peak_rss_delta_bytes": _max_rss_bytes() - self._rss_start,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "rows": self.rows,
+                "rows_per_s": self.rows / wall_s if self.rows and wall_s else None,
+                **self.fields,
+            }
+        )
+        return False
+
+
+def stage(name: str, **fields) -> Stage:
+    """A context manager timing a stage.
+
+    Args:
+        name: The stage name, e.g. "prices.unstack".
+        fields: Extra JSON-serializable fields for the event, e.g. dataset.
+            A status field replaces the default "ok" or "error".
+    """
+    return Stage(name, **fields)
+
+
+def instrumented(name: str = None, **fields):
+    """Decorates a function to run as a stage, named after it by default.
+
+    The function can set the rows and bytes on current_stage().
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__qualname__, **fields):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_stage() -> Stage:
+    """The innermost running stage, or None."""
+    stack = _stack.get()
+    return stack[-1] if stack else None
+
+
+class Run:
+    """A context manager grouping stages under a run id, with a summary table.
+
+    Args:
+        name: The run name, used in the run id.
+        summary: Print the summary table when the run ends.
+    """
+
+    def __init__(self, name: str = "run", summary: bool = True):
+        self.run_id = f"{name}-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.summary = summary
+        self.sink = MemorySink()
+
+    def __enter__(self):
+        self._token = _run_id.set(self.run_id)
+        add_sink(self.sink)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        remove_sink(self.sink)
+        _run_id.reset(self._token)
+        if self.summary:
+            with pl.Config(tbl_rows=-1, fmt_str_lengths=60):
+                print(f"Run {self.run_id}")
+                print(self.table())
+        return False
+
+    def table(self) -> pl.DataFrame:
+        """The summary of the run's stages.  See summarize()."""
+        return summarize(self.sink.stages)
+
+
+def summarize(events: list) -> pl.DataFrame:
+    """A table of the stage events, with sizes in MB."""
+    if not events:
+        return pl.DataFrame()
+    return pl.DataFrame(events, infer_schema_length=None).select(
+        "stage",
+        "status",
+        pl.col("wall_s").round(2),
+        pl.col("cpu_s").round(2),
+        (pl.col("peak_rss_delta_bytes") / 1024**2).round(1).alias("rss_mb"),
+        (pl.col("bytes_read") / 1024**2).round(1).alias("read_mb"),
+        (pl.col("bytes_written") / 1024**2).round(1).alias("written_mb"),
+        "rows",
+    )
+
+
+def format_stage(event: dict) -> str:
+    """A one line description of a stage event."""
+    parts = [f"{event['wall_s']:.1f}s", f"cpu {event['cpu_s']:.1f}s"]
+    if event["rows"] is not None:
+        parts.append(f"{event['rows']:,} rows")
+    if event["bytes_read"]:
+        parts.append(f"read {event['bytes_read'] / 1024**2:,.1f} MB")
+    if event["bytes_written"]:
+        parts.append(f"wrote {event['bytes_written'] / 1024**2:,.1f} MB")
+    parts.append(f"peak RSS +{event['peak_rss_delta_bytes'] / 1024**2:,.0f} MB")
+    if event["error"] is not None:
+        status = f" FAILED {event['error']}"
+    else:
+        status = "" if event["status"] == "ok" else f" ({event['status']})"
+    return f"{event['stage']}: {', '.join(parts)}{status}"
+
+
+def _max_rss_bytes() -> int:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _size(path: Path) -> int:
+    """Size in bytes of the file, or of the files under the directory."""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return 0
@@ -0,0 +1,101 @@
+"""Incremental parsing of large MTGJSON files.
+
+MTGJSON files are a top-level object of sections, e.g. {"meta": {...},
+"data": {uuid: {...}, ...}}.  The parser walks the token stream and yields
+each member of each section, so only one member is decoded in memory at a
+time, regardless of the file size.
+"""
+
+import json
+
+READ_SIZE = 16 * 1024 * 1024
+WHITESPACE = " \t\n\r"
+
+
+class JsonSectionReader:
+    """Reads the members of the top-level sections of a JSON file, one at a time."""
+
+    def __init__(self, path, read_size: int = READ_SIZE):
+        self.path = path
+        self.read_size = read_size
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        """Yields (section, key, value) for each member of each top-level section.
+
+        Top-level values that are not objects are yielded as (key, None, value).
+        """
+        with open(self.path, "r", encoding="utf-8") as file:
+            self._file = file
+            self._buffer = ""
+            self._pos = 0
+            self._eof = False
+
+            self._expect("{")
+            for section in self._iter_keys():
+                if self._peek() == "{":
+                    self._pos += 1
+                    for key in self._iter_keys():
+                        yield section, key, self._decode()
+                else:
+                    yield section, None, self._decode()
+
+    def _iter_keys(self):
+        """Yields the keys of the object at the cursor, leaving it on each value."""
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(":")
+            yield key
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or '}}' in {self.path}, got {char!r}.")
+
+    def _decode(self):
+        """Decodes the JSON value at the cursor, reading more of the file as needed."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next read
+            if end < len(self._buffer) or self._eof or not self._read():
+                self._pos = end
+                return value
+
+    def _peek(self) -> str:
+        """Skips whitespace, and returns the next character."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read():
+                raise ValueError(f"Unexpected end of {self.path}.")
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(
+                f"Expected {char!r} in {self.path}, got {self._buffer[self._pos]!r}."
+            )
+        self._pos += 1
+
+    def _read(self) -> bool:
+        """Appends the next block of the file to the buffer, dropping consumed text."""
+        if self._eof:
+            return False
+        block = self._file.read(self.read_size)
+        if not block:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + block
+        self._pos = 0
+        return True
@@ -1,48 +1,144 @@
 """Fetches MTG JSON data from API"""
 
+import hashlib
+import json
 import os
-import platform
 from pathlib import Path
-from datetime import datetime
+
+from src.data import instrument, stream_fetch
+from src.data.fetch_cache import FetchCache
 
 
 class MtgJsonFetcher:
-    
-    def __init__(self, dataset: str, save_root: str = "data/raw/mtgjson"):
+
+    def __init__(
+        self,
+        dataset: str,
+        save_root: str = "data/raw/mtgjson",
+        base_url: str = "https://mtgjson.com/api/v5",
+        n_workers: int = 4,
+        chunk_size: int = 8 * stream_fetch.MiB,
+    ):
         self.dataset = dataset
         self.save_root = Path(save_root)
         self.final_path = self.save_root / Path(self.dataset).stem
         self._validate_inputs()
 
-        self.os_name = platform.system()
         self.filename = self._get_filename()
-        self.filepath = self.save_root / self.filename
-        self.api_url = f"https://mtgjson.com/api/v5/{self.filename}"
-
-    def fetch(self):
-        """Fetches the data from the URL and decompresses."""
-
-        print(f"Downloading {self.dataset} Data")
-        print(f"Starting datetime: {datetime.now()}")
+        self.base_url = base_url.rstrip("/")
+        self.api_url = f"{self.base_url}/{self.filename}"
+        self.state_path = self.save_root / f"{self.filename}.state.json"
+        self.cache = FetchCache(self.save_root / "manifest.json")
+        self.downloader = stream_fetch.RangeDownloader(
+            self.api_url, n_workers=n_workers, chunk_size=chunk_size
+        )
 
-        if self.os_name == "Linux":
-            size = self._linux_data_fetch()
-        elif self.os_name == "Windows":
-            size = self._windows_data_fetch()
+    def fetch(self, force: bool = False):
+        """Fetches the data from the URL and decompresses.
+
+        The archive is downloaded with concurrent range requests and
+        decompressed as a stream, so it never lands on disk.  A dropped
+        connection is retried from the last byte of its range.  If the fetch
+        itself is interrupted, the rerun downloads the archive from the start,
+        but a sidecar state file lets it skip writing the output already
+        written.
+
+        The download is skipped when the cache manifest shows the remote
+        archive is unchanged since the last fetch.
+
+        Args:
+            force: Download even if the cached data is fresh.
+        """
+
+        with instrument.stage("mtgjson.fetch", dataset=self.dataset) as stage:
+            instrument.log(f"Downloading {self.dataset} Data")
+            remote = self._get_remote_fingerprint()
+            if not force and self.cache.is_fresh(self.filename, remote, self.outputs):
+                self.cache.record_hit(self.filename)
+                stage.fields["cache"] = "hit"
+                instrument.log(
+                    f"{self.dataset} is unchanged since the last fetch. Skipped download."
+                )
+            else:
+                self._download(remote)
+                stage.fields["cache"] = "miss"
+                stage.bytes_read = self._n_bytes
+                stage.add_output(self.final_path)
+
+            stats = self.cache.stats
+            instrument.log(
+                f"{self.dataset} is {self._get_size(self.final_path) / 1024**3:.2f} GB "
+                f"in {self.final_path}. Cache hits: {stats['hits']}, "
+                f"misses: {stats['misses']}, saved: {stats['bytes_saved'] / 1024**3:.2f} GB",
+                cache_stats=stats,
+            )
+
+    @property
+    def outputs(self):
+        """The paths the archive is decompressed into."""
+        if self.filename.endswith(".tar.gz"):
+            return [self.final_path]
+        return [self.final_path / self.dataset]
+
+    def _download(self, remote):
+        """Streams the archive into the outputs and records it in the cache."""
+        info = remote if remote["status"] == 200 else self.downloader.probe()
+        state = stream_fetch.load_state(self.state_path, info)
+        digest = hashlib.sha256()
+        chunks = self._report_progress(self.downloader.iter_chunks(info), info["size"])
+        chunks = self._hash_chunks(chunks, digest)
+
+        def save_state(state):
+            stream_fetch.save_state(self.state_path, state)
+
+        if self.filename.endswith(".tar.gz"):
+            stream_fetch.untar_stream(chunks, self.save_root, state, save_state)
         else:
-            raise ValueError(f"OS {self.os_name} not supported.")
-
-        print(f"Downloaded {self.dataset} Data")
-        print(f"Final size: {size}")
-        print(f"Final path: {self.final_path}")
+            stream_fetch.gunzip_stream(chunks, self.outputs[0], state, save_state)
+        self.state_path.unlink(missing_ok=True)
+
+        sha256 = digest.hexdigest()
+        if remote["sha256"] and remote["sha256"] != sha256:
+            raise ValueError(
+                f"Checksum mismatch for {self.filename}: "
+                f"expected {remote['sha256']}, got {sha256}."
+            )
+        self.cache.record_fetch(
+            self.filename, {**remote, **info}, sha256, self._n_bytes, self.outputs
+        )
 
-        print(f"Finished datetime: {datetime.now()}")
+    def _get_remote_fingerprint(self):
+        """Cheap freshness check of the remote archive.
+
+        Sends a conditional HEAD request, and reads the MTGJSON Meta file and
+        the published sha256 of the archive, when available.
+        """
+        entry = self.cache.get(self.filename) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        remote = self.downloader.probe(headers)
+
+        meta = stream_fetch.read_url(f"{self.base_url}/Meta.json")
+        meta = json.loads(meta).get("data", {}) if meta else {}
+        remote["meta_version"] = meta.get("version")
+        remote["meta_date"] = meta.get("date")
+
+        sha256 = stream_fetch.read_url(f"{self.api_url}.sha256")
+        remote["sha256"] = sha256.decode().split()[0].lower() if sha256 else None
+        return remote
 
     def _validate_inputs(self):
         """Validates the inputs for the fetcher"""
 
         # Validate dataset
-        valid_datasets = ["AllPrices.json", "AllPrintingsParquetFiles"]
+        valid_datasets = [
+            "AllPrices.json",
+            "AllPricesToday.json",
+            "AllPrintingsParquetFiles",
+        ]
         if self.dataset not in valid_datasets:
             raise ValueError(f"Dataset must be one of {valid_datasets}.")
 
@@ -51,43 +147,43 @@ class MtgJsonFetcher:
         os.makedirs(self.final_path, exist_ok=True)
 
     def _get_filename(self):
-        """Gets the filename for the dataset"""
+        """Gets the filename for the dataset.
 
-        if self.os_name == "Linux":
-            if self.dataset == "AllPrintingsParquetFiles":
-                file_ext = "tar.gz"
-            else:
-                file_ext = "gz"
-        elif self.os_name == "Windows":
-            file_ext = "zip"
+        The gzip archives are decompressed in Python, so the same archive is
+        used on every OS.
+        """
+
+        if self.dataset == "AllPrintingsParquetFiles":
+            file_ext = "tar.gz"
         else:
-            raise ValueError(f"OS {self.os_name} not supported.")
+            file_ext = "gz"
 
         return f"{self.dataset}.{file_ext}"
 
-    def _linux_data_fetch(self):
-        """Linux commands"""
-        os.system(f"wget -P {self.save_root} --progress=dot:giga {self.api_url}")
-        if "tar" in self.filepath.name:
-            os.system(f"tar -xzf {self.filepath} -C {self.save_root}")
-        else:
-            os.system(f"gunzip -c  {self.filepath} > {self.final_path / self.dataset}")
-        os.system(f"rm {self.filepath}")
-        size = os.system(f"du -sh {self.save_root}")
-        return size
-
-    def _windows_data_fetch(self):
-        """Windows commands (using PowerShell)"""
-        os.system(
-            f"powershell Invoke-WebRequest -Uri {self.api_url} -OutFile {self.filepath}"
-        )
-        os.system(
-            f"powershell Expand-Archive -Path {self.filepath} -DestinationPath {self.final_path}"
-        )
-        os.system(f"powershell Remove-Item {self.filepath}")
-        size = os.system(
-            f"powershell Get-ChildItem {self.save_root} | "
-            f"Measure-Object -Property Length -Sum | "
-            f"ForEach-Object {{ $_.Sum / 1MB }}"
-        )
-        return size
+    def _report_progress(self, chunks, size, step=0.1):
+        """Passes the chunks through, logging progress at each step of the size."""
+        n_bytes = 0
+        next_report = step
+        for chunk in chunks:
+            n_bytes += len(chunk)
+            if size and n_bytes / size >= next_report:
+                instrument.log(
+                    f"  {n_bytes / size:.0%} of {size / 1024**2:,.0f} MB",
+                    bytes_done=n_bytes,
+                    bytes_total=size,
+                )
+                next_report = (int(n_bytes / size / step) + 1) * step
+            yield chunk
+
+    def _hash_chunks(self, chunks, digest):
+        """Passes the chunks through, updating the digest and byte count."""
+        self._n_bytes = 0
+        for chunk in chunks:
+            digest.update(chunk)
+            self._n_bytes += len(chunk)
+            yield chunk
+
+    @staticmethod
+    def _get_size(path):
+        """Total size in bytes of the files under path."""
+        return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
@@ -1,9 +1,34 @@
 """Wrangle the MTG JSON AllPrices.JSON Data"""
 
+import datetime
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data.json_stream import JsonSectionReader
+from src.data import instrument, price_compact
+from src.data.price_dataset import write_price_dataset
+
+PRICE_KEYS = ["uuid", "medium", "providers", "currency", "list", "finish"]
+SORT_KEYS = [*PRICE_KEYS, "date"]
+FLAT_PRICE_SCHEMA = pa.schema(
+    [
+        ("uuid", pa.string()),
+        ("medium", pa.string()),
+        ("providers", pa.string()),
+        ("currency", pa.string()),
+        ("list", pa.string()),
+        ("finish", pa.string()),
+        ("date", pa.date32()),
+        ("price", pa.float64()),
+    ]
+)
 
 
 class MtgPricesJsonWrangler:
@@ -21,107 +46,397 @@ class MtgPricesJsonWrangler:
 
         self._validate_paths()
 
-    def unstack_data(self):
+    def unstack_data(self, n_shards: int = None, n_workers: int = None):
         """Unstack the data from the interim directory and save to interim directory.
 
-        The data is unstacked and saved to the interim directory.  The data is
+        The nested prices are unnested and unpivoted into the tidy layout,
+        sorted, and saved to the interim directory.
 
+        Args:
+            n_shards: Process the data out-of-core in this many shards.  The
+                uuids are range partitioned by their leading hex digits, so
+                each shard is unstacked and sorted independently, and the
+                concatenation of the sorted shards is globally sorted.  Memory
+                is bounded by the shard size.
+            n_workers: Number of processes for the shards.  Defaults to the
+                number of CPUs.
         """
-        df = pl.read_parquet(self.paths["interim"] / self.interim_filename)
-        df_tidy = df.lazy()
-
-        indices = {
-            "medium": "uuid",
-            "providers": "medium",
-            "list": ["providers", "currency"],
-            "finish": "list",
-            "date": "finish",
-        }
-        accum_index = []
-
-        print("Unstacking data...")
-
-        for var, index in indices.items():
-            accum_index.extend(index if isinstance(index, list) else [index])
-            df_tidy = df_tidy.pipe(
-                self._unnest_and_unpivot, var_name=var, index=accum_index
+        if n_shards:
+            self._unstack_shards(n_shards, n_workers)
+            return
+
+        interim_path = self.paths["interim"] / self.interim_filename
+        with instrument.stage("prices.unstack") as stage:
+            stage.add_input(interim_path)
+            df_tidy = _tidy_prices(pl.scan_parquet(interim_path)).collect()
+            if self.final_filename is None:
+                min_date = df_tidy["date"].min()
+                max_date = df_tidy["date"].max()
+                self.final_filename = (
+                    self.paths["interim"] / f"flat_prices_{min_date}_{max_date}.parquet"
+                )
+            df_tidy.write_parquet(self.final_filename)
+            stage.rows = df_tidy.height
+            stage.add_output(self.final_filename)
+
+    def _unstack_shards(self, n_shards: int, n_workers: int = None):
+        """Partitions the nested prices into shards, and unstacks them in a process pool.
+
+        The sorted shards are then concatenated in order into the final file.
+        """
+        shard_dir = self.paths["interim"] / "shards"
+        shard_dir.mkdir(exist_ok=True)
+        input_paths = [shard_dir / f"nested-{i:04d}.parquet" for i in range(n_shards)]
+        output_paths = [shard_dir / f"flat-{i:04d}.parquet" for i in range(n_shards)]
+
+        interim_path = self.paths["interim"] / self.interim_filename
+        with instrument.stage("prices.unstack", n_shards=n_shards) as stage:
+            with instrument.stage("prices.unstack.partition") as partition:
+                partition.add_input(interim_path)
+                _partition_nested_prices(interim_path, input_paths)
+                for path in input_paths:
+                    partition.add_output(path)
+            stage.add_input(interim_path)
+
+            # The shard processes' CPU time and RSS are not in this process's
+            # measurements, so their rows are counted from the returned stats
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+                dates = list(pool.map(_unstack_shard, input_paths, output_paths))
+
+            if self.final_filename is None:
+                min_date = min(min_date for min_date, _, _ in dates if min_date is not None)
+                max_date = max(max_date for _, max_date, _ in dates if max_date is not None)
+                self.final_filename = (
+                    self.paths["interim"] / f"flat_prices_{min_date}_{max_date}.parquet"
+                )
+            pl.scan_parquet(output_paths).sink_parquet(
+                self.final_filename, maintain_order=True
             )
+            for path in [*input_paths, *output_paths]:
+                os.remove(path)
+            shard_dir.rmdir()
+            stage.rows = sum(n_rows for _, _, n_rows in dates)
+            stage.add_output(self.final_filename)
+
+    def flatten_json_to_parquet(self, batch_size: int = 1_000_000):
+        """Reads the JSON file and writes the tidy prices in a single pass.
+
+        An alternative to raw_json_to_parquet() followed by unstack_data().
+        Each card's nested prices are traversed as it is streamed from the
+        JSON, emitting the final (uuid, medium, providers, currency, list,
+        finish, date, price) rows directly.  There is no interim nested file,
+        and no intermediate unpivoted frames.
+
+        Rows are emitted in sorted order within each card, so the output is
+        sorted if the uuids in the file are.  Otherwise it is sorted after
+        writing.
+
+        Args:
+            batch_size: Number of price rows per record batch.
+        """
+        reader = JsonSectionReader(self.paths["raw_file"])
+        tmp_path = self.paths["interim"] / "flat_prices.parquet.tmp"
+        columns = {name: [] for name in FLAT_PRICE_SCHEMA.names}
+        meta = {"field": [], "meta": []}
+        dates = set()
+        is_sorted = True
+        prev_uuid = ""
+
+        with instrument.stage("prices.flatten") as stage:
+            stage.add_input(self.paths["raw_file"])
+            n_rows = 0
+            with pq.ParquetWriter(tmp_path, FLAT_PRICE_SCHEMA) as writer:
+                for section, key, value in reader:
+                    if section == "meta":
+                        meta["field"].append(key)
+                        meta["meta"].append(value)
+                        continue
+                    if section != "data" or not value:
+                        continue
+
+                    is_sorted = is_sorted and key > prev_uuid
+                    prev_uuid = key
+                    _flatten_card(key, value, columns)
+                    if len(columns["price"]) >= batch_size:
+                        n_rows += _write_flat_batch(writer, columns, dates)
+                n_rows += _write_flat_batch(writer, columns, dates)
+            pq.write_table(pa.table(meta), self.paths["interim"] / self.meta_filename)
+
+            if self.final_filename is None:
+                min_date = min(dates, default=None)
+                max_date = max(dates, default=None)
+                self.final_filename = (
+                    self.paths["interim"] / f"flat_prices_{min_date}_{max_date}.parquet"
+                )
+            if is_sorted:
+                os.replace(tmp_path, self.final_filename)
+            else:
+                with instrument.stage("prices.flatten.sort") as sort:
+                    sort.rows = n_rows
+                    pl.scan_parquet(tmp_path).sort(SORT_KEYS).sink_parquet(
+                        self.final_filename
+                    )
+                os.remove(tmp_path)
+            stage.rows = n_rows
+            stage.add_output(self.final_filename)
+            stage.add_output(self.paths["interim"] / self.meta_filename)
+
+    def update_history(
+        self, history_dir: Path = None, only_new: bool = True, batch_size: int = 1_000_000
+    ):
+        """Appends the prices in the raw file to a date-partitioned history.
 
-        df_tidy = (
-            df_tidy.rename({"data": "price"})
-            .with_columns(pl.col("date").cast(pl.Date))
-            .sort(["uuid", "medium", "providers", "currency", "list", "finish", "date"])
-            .collect()
+        The history keeps one partition per date, "date=YYYY-MM-DD/prices.parquet",
+        so it grows beyond MTGJSON's rolling 90 day window.  The raw file can be
+        AllPricesToday.json, or AllPrices.json diffed against the latest date
+        already stored.  Only the partitions of the ingested dates are written,
+        so the daily cost depends on one day of data, not the full history.
+
+        Args:
+            history_dir: Root of the history.  Defaults to "price_history" in
+                the processed directory.
+            only_new: Only ingest dates after the latest stored date.  If
+                False, every date in the raw file is upserted, so restated
+                prices replace the stored ones.
+            batch_size: Number of price rows per staged record batch.
+
+        Returns:
+            The list of dates written.
+        """
+        history_dir = Path(history_dir or self.paths["processed"] / "price_history")
+        history_dir.mkdir(parents=True, exist_ok=True)
+        stored_dates = self.history_dates(history_dir)
+        min_date = max(stored_dates).isoformat() if only_new and stored_dates else None
+
+        with instrument.stage("prices.update_history", only_new=only_new) as stage:
+            # Stage the rows of the ingested dates, to bound memory by batch size
+            stage.add_input(self.paths["raw_file"])
+            staging_path = history_dir / "staging.parquet.tmp"
+            columns = {name: [] for name in FLAT_PRICE_SCHEMA.names}
+            dates = set()
+            stage.rows = 0
+            with pq.ParquetWriter(staging_path, FLAT_PRICE_SCHEMA) as writer:
+                for section, key, value in JsonSectionReader(self.paths["raw_file"]):
+                    if section != "data" or not value:
+                        continue
+                    _flatten_card(key, value, columns, min_date=min_date)
+                    if len(columns["price"]) >= batch_size:
+                        stage.rows += _write_flat_batch(writer, columns, dates)
+                stage.rows += _write_flat_batch(writer, columns, dates)
+
+            for date in sorted(dates):
+                df = (
+                    pl.scan_parquet(staging_path)
+                    .filter(pl.col("date") == date)
+                    .drop("date")
+                    .collect()
+                )
+                partition = history_dir / f"date={date}" / "prices.parquet"
+                if partition.exists():
+                    # Upsert restated prices over the stored ones
+                    df = pl.concat([df, pl.read_parquet(partition)]).unique(
+                        subset=PRICE_KEYS, keep="first"
+                    )
+                partition.parent.mkdir(exist_ok=True)
+                df.sort(PRICE_KEYS).write_parquet(partition.with_suffix(".tmp"))
+                os.replace(partition.with_suffix(".tmp"), partition)
+                stage.add_output(partition)
+                instrument.log(f"Wrote {df.height:,} prices for {date}", date=date, rows=df.height)
+            os.remove(staging_path)
+            stage.fields["n_dates"] = len(dates)
+
+        return sorted(dates)
+
+    @staticmethod
+    def history_dates(history_dir: Path) -> list:
+        """The dates stored in the history, read from the partition names."""
+        return sorted(
+            datetime.date.fromisoformat(path.name.removeprefix("date="))
+            for path in Path(history_dir).glob("date=*")
+            if (path / "prices.parquet").exists()
+        )
+
+    @staticmethod
+    def scan_history(history_dir: Path) -> pl.LazyFrame:
+        """Lazily scans the price history, in the layout of the flat prices."""
+        return pl.scan_parquet(
+            Path(history_dir) / "date=*" / "prices.parquet",
+            hive_partitioning=True,
+            hive_schema={"date": pl.Date},
+        ).select(FLAT_PRICE_SCHEMA.names)
+
+    def write_dataset(self, cards_file: Path, dataset_dir: Path = None, **kwargs):
+        """Writes the final data as a partitioned dataset in the processed directory.
+
+        See price_dataset.write_price_dataset() for the layout, and
+        price_dataset.scan_price_dataset() to load per-set slices.
+
+        Args:
+            cards_file: Card data with the uuid and setCode columns.
+            dataset_dir: Root of the dataset.  Defaults to "prices" in the
+                processed directory.
+            kwargs: Passed to write_price_dataset().
+        """
+        if self.final_filename is None:
+            raise ValueError("No data to write.  Run unstack_data() first.")
+        dataset_dir = Path(dataset_dir or self.paths["processed"] / "prices")
+        write_price_dataset(
+            pl.scan_parquet(self.final_filename),
+            pl.scan_parquet(cards_file),
+            dataset_dir,
+            **kwargs,
         )
+        return dataset_dir
+
+    def compact_data(self, price_dtype: pl.DataType = pl.Float32):
+        """Writes the final data in the compact, dictionary-encoded representation.
 
-        print("Data unstacked!\nSaving data...")
+        See price_compact for the encoding.  The card key dimension table is
+        written to "card_keys.parquet" in the interim directory.
 
+        Args:
+            price_dtype: The price type, e.g. pl.Float32 or pl.Decimal(10, 2).
+        """
         if self.final_filename is None:
-            min_date = df_tidy["date"].min()
-            max_date = df_tidy["date"].max()
-            self.final_filename = (
-                self.paths["interim"] / f"flat_prices_{min_date}_{max_date}.parquet"
+            raise ValueError("No data to compact.  Run unstack_data() first.")
+        with instrument.stage("prices.compact", price_dtype=str(price_dtype)) as stage:
+            stage.add_input(self.final_filename)
+            df = pl.read_parquet(self.final_filename)
+            compact, keys = price_compact.compact_prices(df, price_dtype=price_dtype)
+            price_compact.report_memory(df, compact, keys)
+            price_compact.write_compact_prices(
+                compact, keys, self.compact_filename, self.keys_filename
             )
-        df_tidy.write_parquet(self.final_filename)
+            stage.rows = compact.height
+            stage.add_output(self.compact_filename)
+            stage.add_output(self.keys_filename)
+
+    @property
+    def compact_filename(self):
+        return self.final_filename.with_name(f"compact_{self.final_filename.name}")
 
-        print("Data saved!")
+    @property
+    def keys_filename(self):
+        return self.paths["interim"] / "card_keys.parquet"
 
-    def load_data(self):
-        """Load the data from the interim directory"""
-        if self.final_filename:
-            print("Final data loaded!")
-            return pl.read_parquet(self.final_filename)
-        else:
+    def load_data(self, compact: bool = False, decode: bool = True):
+        """Load the data from the interim directory
+
+        Args:
+            compact: Load the compact data written by compact_data().
+            decode: Restore the uuid column of the compact data.
+        """
+        if not self.final_filename:
             raise ValueError("No data to load.  Run unstack_data() first.")
+        with instrument.stage("prices.load", compact=compact) as stage:
+            if compact:
+                stage.add_input(self.compact_filename)
+                stage.add_input(self.keys_filename)
+                df = price_compact.read_compact_prices(
+                    self.compact_filename, self.keys_filename, decode=decode
+                )
+            else:
+                stage.add_input(self.final_filename)
+                df = pl.read_parquet(self.final_filename)
+            stage.rows = df.height
+        return df
 
-    def raw_json_to_parquet(self):
+    def raw_json_to_parquet(self, streaming: bool = False, batch_size: int = 10_000):
         """Reads the JSON File. Saves the meta and data as Parquet.
 
         The metadata is saved to the processed directory.  The data is saved
         to the interim directory, as it requires additional processing.
 
         Args:
-            persist: A flag to store the data as members of the class.
-            Otherwise data is just pass-through
+            streaming: Walk the JSON token stream uuid by uuid, writing record
+                batches, instead of loading the whole file with pandas.  Peak
+                memory is bounded by the batch size, not the file size.
+            batch_size: Number of uuids per record batch when streaming.
         """
+        if streaming:
+            self._stream_json_to_parquet(batch_size)
+            return
 
-        # Read JSON
-        # NOTE: The polars.read_json() and json.load() methods are MUCH,
-        # MUCH slower than pandas.read_json().
-        print("Reading JSON")
-        df = pd.read_json(str(self.paths["raw_file"]))
-        df = pd.DataFrame(df)  # Fixes pylint type confusion.
-
-        # Get Metadata
-        print("Writing data...")
-        (
-            df.dropna(subset=["meta"])
-            .drop(columns=["data"])
-            .reset_index()
-            .rename(columns={"index": "field"})
-            .to_parquet(self.paths["interim"] / self.meta_filename)
-        )
-        print("Metadata written!")
-
-        # Get Data
-        (
-            df.dropna(subset=["data"])
-            .drop(columns=["meta"])
-            .reset_index()
-            .rename(columns={"index": "uuid"})
-            .to_parquet(self.paths["interim"] / self.interim_filename)
-        )
-        print("Interim data written!")
-
-    def _unnest_and_unpivot(
-        self, df: pl.DataFrame, index: list, var_name: str
-    ) -> pl.DataFrame:
-        """Takes a DataFrame with a nested column and unnests it, then unpivots the data column"""
-        return (
-            df.unnest("data")
-            .unpivot(index=index, value_name="data", variable_name=var_name)
-            .drop_nulls("data")
-        )
+        with instrument.stage("prices.ingest", streaming=False) as stage:
+            # Read JSON
+            # NOTE: The polars.read_json() and json.load() methods are MUCH,
+            # MUCH slower than pandas.read_json().
+            stage.add_input(self.paths["raw_file"])
+            df = pd.read_json(str(self.paths["raw_file"]))
+            df = pd.DataFrame(df)  # Fixes pylint type confusion.
+
+            # Get Metadata
+            (
+                df.dropna(subset=["meta"])
+                .drop(columns=["data"])
+                .reset_index()
+                .rename(columns={"index": "field"})
+                .to_parquet(self.paths["interim"] / self.meta_filename)
+            )
+
+            # Get Data
+            data = df.dropna(subset=["data"])
+            (
+                data.drop(columns=["meta"])
+                .reset_index()
+                .rename(columns={"index": "uuid"})
+                .to_parquet(self.paths["interim"] / self.interim_filename)
+            )
+            stage.rows = len(data)
+            stage.add_output(self.paths["interim"] / self.meta_filename)
+            stage.add_output(self.paths["interim"] / self.interim_filename)
+
+    def _stream_json_to_parquet(self, batch_size: int):
+        """Streams the JSON file into the meta and interim Parquet files.
+
+        Parquet needs one schema for the whole file, but the nested keys (such
+        as the dates) vary by card.  So a first pass over the token stream
+        collects the union of the keys, and a second pass writes the batches.
+        """
+        reader = JsonSectionReader(self.paths["raw_file"])
+        meta_path = self.paths["interim"] / self.meta_filename
+        interim_path = self.paths["interim"] / self.interim_filename
+
+        with instrument.stage("prices.ingest", streaming=True) as ingest:
+            with instrument.stage("prices.ingest.schema") as stage:
+                stage.add_input(self.paths["raw_file"])
+                meta = {"field": [], "meta": []}
+                key_tree = {}
+                for section, key, value in reader:
+                    if section == "meta":
+                        meta["field"].append(key)
+                        meta["meta"].append(value)
+                    elif section == "data":
+                        _merge_key_tree(key_tree, value)
+                pq.write_table(pa.table(meta), meta_path)
+                stage.add_output(meta_path)
+
+            with instrument.stage("prices.ingest.write") as stage:
+                stage.add_input(self.paths["raw_file"])
+                schema = pa.schema(
+                    [("uuid", pa.string()), ("data", _key_tree_to_arrow_type(key_tree))]
+                )
+                stage.rows = 0
+                rows = []
+                with pq.ParquetWriter(interim_path, schema) as writer:
+                    for section, key, value in reader:
+                        if section != "data":
+                            continue
+                        rows.append({"uuid": key, "data": value})
+                        if len(rows) == batch_size:
+                            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                            stage.rows += len(rows)
+                            rows = []
+                    if rows:
+                        writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                        stage.rows += len(rows)
+                stage.add_output(interim_path)
+
+            ingest.rows = stage.rows
+            ingest.add_input(self.paths["raw_file"])
+            ingest.add_output(meta_path)
+            ingest.add_output(interim_path)
 
     def _validate_paths(self):
         """Validate paths exist and add needed directories."""
@@ -144,3 +459,157 @@ class MtgPricesJsonWrangler:
 
         if self.final_filename is not None:
             self.final_filename = self.paths["interim"] / self.final_filename
+
+
+def _tidy_prices(df: pl.LazyFrame) -> pl.LazyFrame:
+    """Unnests and unpivots the nested prices into the sorted tidy layout."""
+    indices = {
+        "medium": "uuid",
+        "providers": "medium",
+        "list": ["providers", "currency"],
+        "finish": "list",
+        "date": "finish",
+    }
+    accum_index = []
+
+    for var, index in indices.items():
+        accum_index.extend(index if isinstance(index, list) else [index])
+        df = df.pipe(_unnest_and_unpivot, var_name=var, index=accum_index)
+
+    return (
+        df.rename({"data": "price"})
+        .with_columns(pl.col("date").cast(pl.Date))
+        .sort(SORT_KEYS)
+    )
+
+
+def _unnest_and_unpivot(df: pl.LazyFrame, index: list, var_name: str) -> pl.LazyFrame:
+    """Takes a DataFrame with a nested column and unnests it, then unpivots the data column"""
+    return (
+        df.unnest("data")
+        .unpivot(index=index, value_name="data", variable_name=var_name)
+        .drop_nulls("data")
+    )
+
+
+def _partition_nested_prices(
+    interim_path: Path, shard_paths: list, batch_size: int = 10_000
+):
+    """Range partitions the nested prices by uuid into the shard files, in batches.
+
+    Shards are ranges of the first four hex digits of the uuid, so shard order
+    is uuid order.
+    """
+    n_shards = len(shard_paths)
+    file = pq.ParquetFile(interim_path)
+    writers = [pq.ParquetWriter(path, file.schema_arrow) for path in shard_paths]
+    try:
+        for batch in file.iter_batches(batch_size=batch_size):
+            shards = (
+                pl.from_arrow(batch.column("uuid"))
+                .str.slice(0, 4)
+                .str.to_integer(base=16, strict=False)
+                .fill_null(0)
+                * n_shards
+                // 0x10000
+            ).to_numpy()
+            for shard in np.unique(shards):
+                writers[shard].write_batch(batch.filter(pa.array(shards == shard)))
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+def _unstack_shard(input_path: Path, output_path: Path):
+    """Unstacks one shard of the nested prices into a sorted file.
+
+    Returns:
+        The min and max date, and the number of rows, of the shard.
+    """
+    df = pl.read_parquet(input_path).lazy().pipe(_tidy_prices).collect()
+    df.write_parquet(output_path)
+    return df["date"].min(), df["date"].max(), df.height
+
+
+def _flatten_card(uuid: str, card: dict, columns: dict, min_date: str = None):
+    """Appends the tidy price rows of one card to the column buffers, in sort order.
+
+    Args:
+        min_date: Only keep prices after this ISO date, if given.
+    """
+    for medium in sorted(card):
+        providers = card[medium] or {}
+        for provider in sorted(providers):
+            entry = providers[provider] or {}
+            currency = entry.get("currency")
+            for list_name in sorted(key for key in entry if key != "currency"):
+                finishes = entry[list_name] or {}
+                for finish in sorted(finishes):
+                    prices = finishes[finish] or {}
+                    dates = [
+                        date
+                        for date in sorted(prices)
+                        if prices[date] is not None
+                        and (min_date is None or date > min_date)
+                    ]
+                    n_dates = len(dates)
+                    columns["uuid"].extend([uuid] * n_dates)
+                    columns["medium"].extend([medium] * n_dates)
+                    columns["providers"].extend([provider] * n_dates)
+                    columns["currency"].extend([currency] * n_dates)
+                    columns["list"].extend([list_name] * n_dates)
+                    columns["finish"].extend([finish] * n_dates)
+                    columns["date"].extend(dates)
+                    columns["price"].extend([prices[date] for date in dates])
+
+
+def _write_flat_batch(writer: pq.ParquetWriter, columns: dict, dates: set) -> int:
+    """Writes and clears the column buffers, collecting the distinct dates.
+
+    Returns:
+        The number of rows written.
+    """
+    n_rows = len(columns["price"])
+    if n_rows == 0:
+        return 0
+    arrays = [
+        pa.array(columns[name]).cast(field.type)
+        for name, field in zip(FLAT_PRICE_SCHEMA.names, FLAT_PRICE_SCHEMA)
+    ]
+    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=FLAT_PRICE_SCHEMA))
+    dates.update(arrays[FLAT_PRICE_SCHEMA.get_field_index("date")].unique().to_pylist())
+    for values in columns.values():
+        values.clear()
+    return n_rows
+
+
+def _merge_key_tree(tree: dict, value: dict):
+    """Merges the nested keys of the value into the tree.
+
+    Leaves are stored as the Arrow type of the value.
+    """
+    for key, child in value.items():
+        if isinstance(child, dict):
+            _merge_key_tree(tree.setdefault(key, {}), child)
+        elif key not in tree or tree[key] == pa.null():
+            tree[key] = _arrow_leaf_type(child)
+
+
+def _arrow_leaf_type(value) -> pa.DataType:
+    if value is None:
+        return pa.null()
+    if isinstance(value, str):
+        return pa.string()
+    if isinstance(value, bool):
+        return pa.bool_()
+    return pa.float64()
+
+
+def _key_tree_to_arrow_type(tree: dict) -> pa.DataType:
+    """Converts the merged key tree to an Arrow struct type."""
+    return pa.struct(
+        [
+            (key, _key_tree_to_arrow_type(child) if isinstance(child, dict) else child)
+            for key, child in tree.items()
+        ]
+    )
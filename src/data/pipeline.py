@@ -0,0 +1,301 @@
+"""A content-hash aware runner for the data refresh stages.
+
+Each Stage declares its input and output paths, and the stages form a DAG,
+from explicit dependencies and from inputs that are other stages' outputs.
+A stage is rerun only when it is stale: the sha256 of its inputs or params
+changed since its last run, or its outputs are missing or were modified.
+Stages whose dependencies are done run concurrently in a thread pool, as
+they are mostly I/O or polars work that releases the GIL.  Each stage is
+an instrument stage, with the pipeline status (ran, fresh, failed, skipped,
+or blocked) as its status, so its record reaches the instrument sinks.
+
+File hashes are cached by path, mtime, and size in the state file, so
+unchanged files, such as the multi-GB raw downloads, are not rehashed.
+Changes to a stage's code are not detected; bump a "version" param instead.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import polars as pl
+
+from src.data import instrument
+
+STATE_PATH = Path("data/pipeline_state.json")
+HASH_CHUNK_SIZE = 8 * 1024**2
+
+
+class Stage:
+    """A step of the pipeline.
+
+    Args:
+        name: The unique name of the stage.
+        func: Called with no arguments to run the stage.
+        inputs: Files or directories the stage reads.
+        outputs: Files or directories the stage writes.
+        deps: Names of stages to run first, besides those writing the inputs.
+        params: JSON-serializable settings, hashed with the inputs.
+        always: Run on every refresh, e.g. fetches that check the remote.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func,
+        inputs: list = (),
+        outputs: list = (),
+        deps: list = (),
+        params: dict = None,
+        always: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = [Path(path) for path in inputs]
+        self.outputs = [Path(path) for path in outputs]
+        self.deps = list(deps)
+        self.params = params or {}
+        self.always = always
+
+    def __repr__(self):
+        return f"Stage({self.name})"
+
+
+class Pipeline:
+    """Runs the stale stages of a DAG, and records their hashes and timings.
+
+    Args:
+        stages: The stages, in any order.
+        state_path: The JSON file of file hashes and stage records.
+    """
+
+    def __init__(self, stages: list, state_path: Path = STATE_PATH):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique.")
+        self.state_path = Path(state_path)
+        self.state = self._load()
+        self.deps = {name: self._find_deps(stage) for name, stage in self.stages.items()}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        targets: list = None,
+        force: bool = False,
+        skip: list = (),
+        n_workers: int = 4,
+    ) -> pl.DataFrame:
+        """Runs the stale stages, concurrently where the DAG allows.
+
+        Args:
+            targets: Stages to bring up to date, with their upstream stages.
+                Defaults to all stages.
+            force: Rerun the stages even if they are fresh.
+            skip: Stages not to run, e.g. the fetches when offline.  Their
+                outputs are used as they are.
+            n_workers: Number of stages to run at once.
+
+        Returns:
+            The status ("ran", "fresh", "skipped", "failed", or "blocked"),
+            start offset, and seconds of each stage.
+
+        Raises:
+            RuntimeError: If a stage failed.  The stages that do not depend
+                on it are still run.
+        """
+        pending = {name: set(self.deps[name]) for name in self.upstream(targets)}
+        records = {}
+        errors = {}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            running = {}
+            while pending or running:
+                for name, deps in list(pending.items()):
+                    if deps - records.keys():
+                        continue
+                    del pending[name]
+                    now = time.perf_counter() - start
+                    if any(records[dep]["status"] in ("failed", "blocked") for dep in deps):
+                        records[name] = _record(name, "blocked", now, 0.0)
+                        _emit_skipped(name, "blocked")
+                    elif name in skip:
+                        records[name] = _record(name, "skipped", now, 0.0)
+                        _emit_skipped(name, "skipped")
+                    else:
+                        # Copy the context, so the stage's instrument events keep the run id
+                        future = executor.submit(
+                            contextvars.copy_context().run,
+                            self._run_stage,
+                            self.stages[name],
+                            force,
+                        )
+                        running[future] = (name, now)
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    try:
+                        status, seconds = future.result()
+                    except Exception as err:  # pylint: disable=broad-except
+                        status, seconds = "failed", time.perf_counter() - start - started
+                        errors[name] = err
+                        instrument.log(f"Stage {name} failed: {err!r}")
+                    records[name] = _record(name, status, started, seconds)
+
+        with self._lock:
+            self._save()
+        timings = pl.DataFrame(list(records.values())).sort("start_s")
+        instrument.log(f"Pipeline finished in {time.perf_counter() - start:.1f}s\n{timings}")
+        if errors:
+            raise RuntimeError(f"Stages failed: {list(errors)}") from next(iter(errors.values()))
+        return timings
+
+    def upstream(self, targets: list = None) -> list:
+        """The targets and the stages they depend on, in DAG order."""
+        targets = list(self.stages) if targets is None else targets
+        order = []
+
+        def visit(name, path=()):
+            if name in path:
+                raise ValueError(f"Stage dependency cycle: {[*path, name]}")
+            if name in order:
+                return
+            for dep in self.deps[name]:
+                visit(dep, (*path, name))
+            order.append(name)
+
+        for name in targets:
+            visit(name)
+        return order
+
+    def stale(self, targets: list = None) -> list:
+        """The stages that would run, judged by the current files.
+
+        Stages downstream of a stale stage may also run, once its outputs change.
+        """
+        return [
+            name for name in self.upstream(targets) if self._is_stale(self.stages[name])[0]
+        ]
+
+    def _find_deps(self, stage: Stage) -> list:
+        """The explicit dependencies, and the stages writing the stage's inputs."""
+        deps = list(stage.deps)
+        for other in self.stages.values():
+            if other.name == stage.name or other.name in deps:
+                continue
+            if any(
+                path == output or output in path.parents
+                for path in stage.inputs
+                for output in other.outputs
+            ):
+                deps.append(other.name)
+        unknown = [dep for dep in deps if dep not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+        return deps
+
+    def _run_stage(self, stage: Stage, force: bool) -> tuple:
+        """Runs the stage if stale, and records its hashes.  Returns (status, seconds)."""
+        # The status stays "failed" unless the stage returns
+        with instrument.stage(stage.name, status="failed") as record:
+            is_stale, key = self._is_stale(stage)
+            if not (is_stale or force):
+                record.fields["status"] = "fresh"
+                instrument.log(f"Stage {stage.name} is fresh")
+                return "fresh", 0.0
+
+            instrument.log(f"Running stage {stage.name}")
+            start = time.perf_counter()
+            stage.func()
+            seconds = time.perf_counter() - start
+            if stage.always:
+                key = self._stage_key(stage)
+            outputs = {str(path): self._hash_path(path) for path in stage.outputs}
+            with self._lock:
+                self.state["stages"][stage.name] = {
+                    "key": key,
+                    "outputs": outputs,
+                    "seconds": seconds,
+                    "finished": datetime.now().isoformat(timespec="seconds"),
+                }
+                self._save()
+            record.fields["status"] = "ran"
+            return "ran", seconds
+
+    def _is_stale(self, stage: Stage) -> tuple:
+        """Whether the stage must run, and its key of input and param hashes."""
+        key = self._stage_key(stage)
+        record = self.state["stages"].get(stage.name)
+        if stage.always or record is None or record["key"] != key:
+            return True, key
+        outputs = {str(path): self._hash_path(path) for path in stage.outputs}
+        return outputs != record["outputs"] or None in outputs.values(), key
+
+    def _stage_key(self, stage: Stage) -> str:
+        inputs = {str(path): self._hash_path(path) for path in stage.inputs}
+        key = json.dumps({"inputs": inputs, "params": stage.params}, sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _hash_path(self, path: Path) -> str:
+        """The sha256 of the file, or of a directory's file names and hashes.
+
+        Returns None if the path does not exist.
+        """
+        if path.is_file():
+            return self._hash_file(path)
+        if not path.is_dir():
+            return None
+        digest = hashlib.sha256()
+        for file in sorted(f for f in path.rglob("*") if f.is_file()):
+            digest.update(f"{file.relative_to(path).as_posix()}:{self._hash_file(file)}\n".encode())
+        return digest.hexdigest()
+
+    def _hash_file(self, path: Path) -> str:
+        """The sha256 of the file, cached by its mtime and size."""
+        stat = path.stat()
+        key = [stat.st_mtime_ns, stat.st_size]
+        with self._lock:
+            cached = self.state["files"].get(str(path))
+        if cached is not None and cached["key"] == key:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        with self._lock:
+            self.state["files"][str(path)] = {"key": key, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def _load(self) -> dict:
+        if self.state_path.exists():
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        return {"files": {}, "stages": {}}
+
+    def _save(self):
+        """Atomically writes the state."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.state, file, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def _record(name: str, status: str, start_s: float, seconds: float) -> dict:
+    return {"stage": name, "status": status, "start_s": start_s, "seconds": seconds}
+
+
+def _emit_skipped(name: str, status: str):
+    """Sends the instrument event of a stage that was not run."""
+    with instrument.stage(name, status=status):
+        pass
@@ -0,0 +1,128 @@
+"""Compact, dictionary-encoded representation of the tidy price table.
+
+The tidy prices repeat a 36 character uuid and the medium, providers,
+currency, list, and finish strings on every row.  The compact table replaces
+the uuid with an Int32 card key into a sorted uuid dimension table, the
+low-cardinality strings with pl.Enum categoricals, and the price with a
+Float32 (or Decimal).  The row order and sort order are unchanged.
+"""
+
+import json
+from pathlib import Path
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from src.data import instrument
+
+# Known values from the MTGJSON price spec.  New values are appended when seen.
+CATEGORIES = {
+    "medium": ["mtgo", "paper"],
+    "providers": [
+        "cardhoarder",
+        "cardkingdom",
+        "cardmarket",
+        "cardsphere",
+        "manapool",
+        "tcgplayer",
+    ],
+    "currency": ["EUR", "USD"],
+    "list": ["buylist", "retail"],
+    "finish": ["etched", "foil", "normal"],
+}
+METADATA_KEY = b"price_categories"
+
+
+def compact_prices(df: pl.DataFrame, price_dtype: pl.DataType = pl.Float32):
+    """Encodes the tidy prices in the compact representation.
+
+    Args:
+        df: The tidy prices, as written by MtgPricesJsonWrangler.
+        price_dtype: The price type, e.g. pl.Float32 or pl.Decimal(10, 2).
+
+    Returns:
+        The compact prices, and the card key dimension table.
+    """
+    uuids = df["uuid"].unique().sort()
+    keys = pl.DataFrame(
+        {"card_key": pl.int_range(len(uuids), dtype=pl.Int32, eager=True), "uuid": uuids}
+    )
+    categories = {
+        col: _get_categories(df[col], known) for col, known in CATEGORIES.items()
+    }
+
+    compact = df.select(
+        # The Enum of the sorted uuids maps each uuid to its card key
+        pl.col("uuid").cast(pl.Enum(uuids)).to_physical().cast(pl.Int32).alias("card_key"),
+        *[pl.col(col).cast(pl.Enum(cats)) for col, cats in categories.items()],
+        pl.col("date"),
+        _cast_price(pl.col("price"), price_dtype),
+    )
+    return compact, keys
+
+
+def decode_prices(compact: pl.DataFrame, keys: pl.DataFrame) -> pl.DataFrame:
+    """Restores the uuid column of the compact prices.
+
+    The categorical columns stay as pl.Enum, which behave like strings in
+    filters and joins.
+    """
+    uuids = keys.sort("card_key")["uuid"]
+    return compact.select(
+        uuids.gather(compact["card_key"]).alias("uuid"),
+        pl.exclude("card_key"),
+    )
+
+
+def write_compact_prices(compact: pl.DataFrame, keys: pl.DataFrame, path: Path, keys_path: Path):
+    """Writes the compact prices, keeping the Enum categories in the file metadata."""
+    categories = {col: compact[col].cat.get_categories().to_list() for col in CATEGORIES}
+    table = compact.to_arrow()
+    metadata = {**(table.schema.metadata or {}), METADATA_KEY: json.dumps(categories)}
+    pq.write_table(table.replace_schema_metadata(metadata), path, compression="zstd")
+    keys.write_parquet(keys_path)
+
+
+def read_compact_prices(path: Path, keys_path: Path, decode: bool = True) -> pl.DataFrame:
+    """Reads the compact prices, restoring the Enum types.
+
+    Args:
+        decode: Restore the uuid column from the card keys.
+    """
+    metadata = pq.read_schema(path).metadata
+    categories = json.loads(metadata[METADATA_KEY])
+    compact = pl.read_parquet(path).with_columns(
+        [pl.col(col).cast(pl.String).cast(pl.Enum(cats)) for col, cats in categories.items()]
+    )
+    if not decode:
+        return compact
+    return decode_prices(compact, pl.read_parquet(keys_path))
+
+
+def report_memory(df: pl.DataFrame, compact: pl.DataFrame, keys: pl.DataFrame):
+    """Logs the memory of the tidy and compact tables."""
+    before = df.estimated_size()
+    after = compact.estimated_size() + keys.estimated_size()
+    instrument.log(
+        f"Mem Size in GB: {before / 1024**3:.2f} -> {after / 1024**3:.2f}, "
+        f"compression: {before / after:.1f}x",
+        tidy_bytes=before,
+        compact_bytes=after,
+    )
+
+
+def _get_categories(series: pl.Series, known: list) -> list:
+    """The known categories, followed by any new values in the series."""
+    new = series.drop_nulls().unique().sort().to_list()
+    return [*known, *[value for value in new if value not in known]]
+
+
+def _cast_price(price: pl.Expr, price_dtype: pl.DataType) -> pl.Expr:
+    """Casts the float prices, exactly for a Decimal.
+
+    Casting a float to a Decimal truncates its binary value, e.g. 0.58 to
+    0.57, so the prices are rounded to the scale and parsed from strings.
+    """
+    if isinstance(price_dtype, pl.Decimal):
+        return price.round(price_dtype.scale).cast(pl.String).cast(price_dtype)
+    return price.cast(price_dtype)
@@ -0,0 +1,144 @@
+"""Hive-partitioned price dataset, with filters pushed down to the files.
+
+The tidy prices are written as a dataset partitioned by set code and month,
+e.g. "setCode=OTJ/month=2024-08/part-0.parquet".  Within each file the rows
+are clustered by provider and uuid, in row groups with column statistics, so
+a filtered scan only reads the partitions and row groups it needs.
+"""
+
+import datetime
+import shutil
+from pathlib import Path
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.data import instrument
+
+PARTITION_BY = ["setCode", "month"]
+CLUSTER_BY = ["providers", "uuid", "medium", "currency", "list", "finish", "date"]
+ROW_GROUP_SIZE = 128 * 1024
+
+
+def write_price_dataset(
+    prices: pl.LazyFrame,
+    cards: pl.LazyFrame,
+    root: Path,
+    partition_by: list = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+):
+    """Writes the tidy prices as a partitioned dataset.
+
+    The prices are joined to the set codes in a streaming pass and staged
+    unsorted by partition.  Then each partition is sorted and written on its
+    own, so memory is bounded by the largest partition, not the price table.
+    Partitions that already exist for the written keys are replaced.
+
+    Args:
+        prices: The tidy prices, as written by MtgPricesJsonWrangler.
+        cards: Card data with the uuid and setCode columns, e.g. wide_cards.parquet.
+        root: Root directory of the dataset.
+        partition_by: Columns to partition by.  Any of setCode, month, providers.
+        row_group_size: Maximum number of rows per row group.
+    """
+    partition_by = partition_by or PARTITION_BY
+    cluster_by = [col for col in CLUSTER_BY if col not in partition_by]
+    root = Path(root)
+    staging_dir = root.with_name(root.name + ".staging")
+    joined_path = staging_dir / "joined.parquet"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+
+    with instrument.stage("prices.dataset", partition_by=partition_by) as stage:
+        try:
+            (
+                prices.lazy()
+                .join(cards.lazy().select("uuid", "setCode"), on="uuid", how="inner")
+                .with_columns(pl.col("date").dt.strftime("%Y-%m").alias("month"))
+                .sink_parquet(joined_path, row_group_size=row_group_size)
+            )
+            joined = pq.ParquetFile(joined_path)
+            ds.write_dataset(
+                pa.RecordBatchReader.from_batches(
+                    joined.schema_arrow, joined.iter_batches(batch_size=row_group_size)
+                ),
+                staging_dir / "partitions",
+                format="parquet",
+                partitioning=partition_by,
+                partitioning_flavor="hive",
+            )
+            stage.rows = joined.metadata.num_rows
+            joined_path.unlink()
+
+            write_options = {"compression": "zstd", "row_group_size": row_group_size}
+            for files in _partition_files(staging_dir / "partitions", partition_by):
+                partition = files[0].parent.relative_to(staging_dir / "partitions")
+                df = pl.read_parquet(files).drop(partition_by, strict=False).sort(cluster_by)
+                out_dir = root / partition
+                shutil.rmtree(out_dir, ignore_errors=True)
+                out_dir.mkdir(parents=True)
+                df.write_parquet(out_dir / "part-0.parquet", statistics=True, **write_options)
+                stage.add_output(out_dir)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        instrument.log(f"Wrote {stage.rows:,} prices to {root}")
+
+
+def scan_price_dataset(
+    root: Path,
+    set_codes: list = None,
+    start: datetime.date = None,
+    end: datetime.date = None,
+    providers: list = None,
+    partition_by: list = None,
+) -> pl.LazyFrame:
+    """Lazily scans the price dataset, pushing the filters down to the files.
+
+    Set code and month filters prune the partitions that are read.  The
+    provider and date filters skip row groups using the column statistics.
+
+    Args:
+        root: Root directory of the dataset.
+        set_codes: Set codes to keep, e.g. ["OTJ"].
+        start: First date to keep, as a date or ISO string.
+        end: Last date to keep, as a date or ISO string.
+        providers: Price providers to keep, e.g. ["tcgplayer"].
+        partition_by: Columns the dataset was partitioned by.
+    """
+    partition_by = partition_by or PARTITION_BY
+    df = pl.scan_parquet(
+        Path(root) / "**" / "*.parquet",
+        hive_partitioning=True,
+        hive_schema={col: pl.String for col in partition_by},
+    )
+
+    if set_codes is not None:
+        df = df.filter(pl.col("setCode").is_in(set_codes))
+    if providers is not None:
+        df = df.filter(pl.col("providers").is_in(providers))
+    if start is not None:
+        start = _to_date(start)
+        df = df.filter(
+            pl.col("month") >= start.strftime("%Y-%m"), pl.col("date") >= start
+        )
+    if end is not None:
+        end = _to_date(end)
+        df = df.filter(pl.col("month") <= end.strftime("%Y-%m"), pl.col("date") <= end)
+    return df
+
+
+def _partition_files(root: Path, partition_by: list) -> list:
+    """The parquet files of each leaf partition under root, grouped by directory."""
+    pattern = "/".join(["*"] * len(partition_by) + ["*.parquet"])
+    groups = {}
+    for path in sorted(Path(root).glob(pattern)):
+        groups.setdefault(path.parent, []).append(path)
+    return list(groups.values())
+
+
+def _to_date(value) -> datetime.date:
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
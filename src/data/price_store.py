@@ -0,0 +1,153 @@
+"""Indexed point and range lookups over the price history.
+
+The store keeps the tidy prices sorted by uuid in small row groups, with a
+persistent index of the rows of each uuid.  A lookup reads only the row
+groups holding the requested cards, instead of scanning the whole file.
+"""
+
+import bisect
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data import instrument
+from src.data.mtgjson_wrangler import SORT_KEYS
+
+ROW_GROUP_SIZE = 4 * 1024
+
+
+class PriceStore:
+    """Lookups of price series by card, provider, finish, and date range."""
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.prices_path = self.store_dir / "prices.parquet"
+        self.index_path = self.store_dir / "index.parquet"
+        if not self.prices_path.exists() or not self.index_path.exists():
+            raise FileNotFoundError(
+                f"No price store in {self.store_dir}.  Run PriceStore.build() first."
+            )
+
+        self._file = pq.ParquetFile(self.prices_path)
+        row_group_rows = [
+            self._file.metadata.row_group(i).num_rows
+            for i in range(self._file.num_row_groups)
+        ]
+        self._row_group_starts = np.concatenate([[0], np.cumsum(row_group_rows)])
+
+        index = pl.read_parquet(self.index_path)
+        ranges = zip(index["start"].to_list(), index["length"].to_list())
+        self._index = dict(zip(index["uuid"].to_list(), ranges))
+
+    @classmethod
+    def build(
+        cls, prices_path: Path, store_dir: Path, row_group_size: int = ROW_GROUP_SIZE
+    ):
+        """Builds the store from the tidy prices written by MtgPricesJsonWrangler.
+
+        Args:
+            prices_path: The flat prices parquet file.
+            store_dir: Directory to write the store to.
+            row_group_size: Rows per row group.  Smaller groups read fewer
+                bytes per lookup, at the cost of a larger footer.
+        """
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+
+        with instrument.stage("prices.store") as stage:
+            stage.add_input(prices_path)
+            df = pl.scan_parquet(prices_path).sort(SORT_KEYS).collect()
+            df.write_parquet(
+                store_dir / "prices.parquet",
+                row_group_size=row_group_size,
+                statistics=True,
+            )
+            (
+                df.select("uuid")
+                .with_row_index("start")
+                .group_by("uuid", maintain_order=True)
+                .agg(pl.col("start").first(), pl.len().alias("length"))
+                .write_parquet(store_dir / "index.parquet")
+            )
+            stage.rows = len(df)
+            stage.add_output(store_dir)
+            instrument.log(f"Built price store for {len(df):,} prices in {store_dir}")
+        return cls(store_dir)
+
+    @property
+    def uuids(self) -> list:
+        """The uuids in the store."""
+        return list(self._index)
+
+    def series(self, uuid: str, **filters) -> pl.DataFrame:
+        """The prices of one card.  See lookup() for the filters."""
+        return self.lookup([uuid], **filters)
+
+    def lookup(
+        self,
+        uuids: list,
+        providers: list = None,
+        finishes: list = None,
+        start=None,
+        end=None,
+        **filters,
+    ) -> pl.DataFrame:
+        """The prices of the cards, sorted by uuid.
+
+        Args:
+            uuids: The card uuids.  Unknown uuids are ignored.
+            providers: Providers to keep, e.g. ["tcgplayer"].
+            finishes: Finishes to keep, e.g. ["foil"].
+            start: First date to keep.
+            end: Last date to keep.
+            filters: Other columns to match, e.g. medium="paper", list="retail".
+        """
+        ranges = sorted(self._index[uuid] for uuid in set(uuids) if uuid in self._index)
+        df = pl.from_arrow(self._read_ranges(ranges))
+
+        predicates = [pl.col(col) == value for col, value in filters.items()]
+        if providers is not None:
+            predicates.append(pl.col("providers").is_in(providers))
+        if finishes is not None:
+            predicates.append(pl.col("finish").is_in(finishes))
+        if start is not None:
+            predicates.append(pl.col("date") >= pl.lit(start).cast(pl.Date))
+        if end is not None:
+            predicates.append(pl.col("date") <= pl.lit(end).cast(pl.Date))
+        return df.filter(*predicates) if predicates else df
+
+    def _read_ranges(self, ranges: list) -> pa.Table:
+        """Reads the rows of the (start, length) ranges from their row groups."""
+        if not ranges:
+            return self._file.schema_arrow.empty_table()
+
+        starts = self._row_group_starts
+        row_groups = sorted(
+            {
+                group
+                for start, length in ranges
+                for group in range(
+                    bisect.bisect_right(starts, start) - 1,
+                    bisect.bisect_right(starts, start + length - 1),
+                )
+            }
+        )
+        table = self._file.read_row_groups(row_groups)
+
+        # Map the file row numbers to rows of the table of read row groups
+        offsets = {}
+        position = 0
+        for group in row_groups:
+            offsets[group] = position - starts[group]
+            position += starts[group + 1] - starts[group]
+        indices = np.concatenate(
+            [
+                np.arange(start, start + length)
+                + offsets[bisect.bisect_right(starts, start) - 1]
+                for start, length in ranges
+            ]
+        )
+        return table.take(indices)
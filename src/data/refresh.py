@@ -0,0 +1,208 @@
+"""The production data refresh, as a pipeline of stages.
+
+Replaces running the wrangling notebooks in order with their PROCESS_DATA
+and OVERWRITE flags.  The stages are:
+
+    fetch_printings, fetch_prices   MTGJSON downloads (10-get-data)
+    cards                           card tables (20-card-data-wrangle)
+    boosters                        booster rates (21-booster-data-wrangle)
+    prices, price_dataset           price tables (22-price-data-wrangle)
+    games_<SET>                     17lands tables (20-draft-data-wrangle)
+    set_union                       multi-set tables (22-draft_data-mult-set)
+
+The fetches run every refresh, and skip the download when the remote is
+unchanged.  The other stages only run when their inputs changed, and the
+card, booster, price, and per-set 17lands stages run concurrently.
+
+Usage:
+    python -m src.data.refresh [--sets BLB OTJ] [--skip-fetch] [--force]
+"""
+
+import argparse
+from functools import partial
+from pathlib import Path
+
+from src.data import instrument
+from src.data.boosters import BOOSTER_TABLES, write_booster_rates
+from src.data.card_data import write_card_tables
+from src.data.game_aggregates import CUBE_SUFFIX, GAME_TABLES, write_game_tables
+from src.data.mtgjson_fetcher import MtgJsonFetcher
+from src.data.mtgjson_wrangler import MtgPricesJsonWrangler
+from src.data.pipeline import Pipeline, Stage
+from src.data.set_union import UNION_NAME, SetUnion
+
+SET_CODES = ["MKM", "OTJ", "MH3", "BLB"]
+CARD_SET_CODE = "BLB"
+FLAT_PRICES = "flat_prices.parquet"
+CARD_TABLES = ["cards", "cardLegalities", "cardPurchaseUrls", "sets"]
+
+
+def data_paths(root: Path = Path("data")) -> dict:
+    """The paths of the raw, interim, and processed data of each source."""
+    root = Path(root)
+    mtgjson = Path("mtgjson")
+    game_data = Path("17lands/game_data")
+    return {
+        "mtgjson_raw": root / "raw" / mtgjson,
+        "printings": {
+            "raw": root / "raw" / mtgjson / "AllPrintingsParquetFiles",
+            "interim": root / "interim" / mtgjson / "AllPrintings",
+            "processed": root / "processed" / mtgjson / "AllPrintings",
+        },
+        "boosters": root / "processed" / mtgjson / "Boosters",
+        "prices": {
+            "raw_file": root / "raw" / mtgjson / "AllPrices" / "AllPrices.json",
+            "interim": root / "interim" / mtgjson / "AllPrices",
+            "processed": root / "processed" / mtgjson / "AllPrices",
+        },
+        "games": {
+            "raw": root / "raw" / game_data / "PremierDraft",
+            "interim": root / "interim" / game_data / "premier_draft",
+            "processed": root / "processed" / game_data / "premier_draft",
+        },
+    }
+
+
+def refresh_stages(
+    set_codes: list = SET_CODES, card_set_code: str = CARD_SET_CODE, root: Path = Path("data")
+) -> list:
+    """The stages of the refresh.
+
+    Args:
+        set_codes: The 17lands sets to wrangle and union.
+        card_set_code: The set of the per-set card tables.
+        root: The data directory.
+    """
+    paths = data_paths(root)
+    printings = paths["printings"]
+    prices = paths["prices"]
+    games = paths["games"]
+    flat_prices = prices["interim"] / FLAT_PRICES
+    wide_cards = printings["interim"] / "wide_cards.parquet"
+
+    stages = [
+        Stage(
+            "fetch_printings",
+            partial(_fetch, "AllPrintingsParquetFiles", paths["mtgjson_raw"]),
+            outputs=[printings["raw"]],
+            always=True,
+        ),
+        Stage(
+            "fetch_prices",
+            partial(_fetch, "AllPrices.json", paths["mtgjson_raw"]),
+            outputs=[prices["raw_file"]],
+            always=True,
+        ),
+        Stage(
+            "cards",
+            partial(write_card_tables, printings, card_set_code),
+            inputs=[printings["raw"] / f"{table}.parquet" for table in CARD_TABLES],
+            outputs=[
+                wide_cards,
+                printings["processed"] / "standard_cards.parquet",
+                printings["processed"] / f"{card_set_code}_std_cards.parquet",
+                printings["processed"] / f"{card_set_code}_std_thin.parquet",
+            ],
+            params={"set_code": card_set_code},
+        ),
+        Stage(
+            "boosters",
+            partial(write_booster_rates, printings["raw"], paths["boosters"]),
+            inputs=[
+                printings["raw"] / "cards.parquet",
+                *[printings["raw"] / file for file in BOOSTER_TABLES.values()],
+            ],
+            outputs=[
+                paths["boosters"] / "All_Sets_booster_sheet_card_rates.parquet",
+                paths["boosters"] / "All_Sets_card_pull_rates.parquet",
+            ],
+        ),
+        Stage(
+            "prices",
+            partial(_flatten_prices, prices),
+            inputs=[prices["raw_file"]],
+            outputs=[flat_prices],
+        ),
+        Stage(
+            "price_dataset",
+            partial(_write_price_dataset, prices, wide_cards),
+            inputs=[flat_prices, wide_cards],
+            outputs=[prices["processed"] / "prices"],
+        ),
+    ]
+
+    for set_code in set_codes:
+        outputs = [
+            games["interim"] / f"game_data_public.{set_code}.PremierDraft.parquet",
+            *[
+                games["processed"] / f"{set_code}{suffix}.parquet"
+                for suffix in GAME_TABLES.values()
+            ],
+            games["processed"] / f"{set_code}{CUBE_SUFFIX}.parquet",
+        ]
+        stages.append(
+            Stage(
+                f"games_{set_code}",
+                partial(write_game_tables, set_code, games, overwrite=True),
+                inputs=[games["raw"] / f"game_data_public.{set_code}.PremierDraft.csv"],
+                outputs=outputs,
+            )
+        )
+
+    stages.append(
+        Stage(
+            "set_union",
+            partial(_union_sets, games["processed"], set_codes),
+            inputs=[
+                games["processed"] / f"{set_code}{suffix}.parquet"
+                for set_code in set_codes
+                for suffix in GAME_TABLES.values()
+            ],
+            outputs=[
+                games["processed"] / f"{UNION_NAME}{suffix}.parquet"
+                for suffix in GAME_TABLES.values()
+            ],
+            params={"set_codes": sorted(set_codes)},
+        )
+    )
+    return stages
+
+
+def _fetch(dataset: str, save_root: Path):
+    MtgJsonFetcher(dataset=dataset, save_root=save_root).fetch()
+
+
+def _flatten_prices(paths: dict):
+    MtgPricesJsonWrangler(dict(paths), filename=FLAT_PRICES).flatten_json_to_parquet()
+
+
+def _write_price_dataset(paths: dict, cards_file: Path):
+    MtgPricesJsonWrangler(dict(paths), filename=FLAT_PRICES).write_dataset(cards_file)
+
+
+def _union_sets(root: Path, set_codes: list):
+    for suffix in GAME_TABLES.values():
+        SetUnion(root, suffix).append(set_codes, overwrite=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refreshes the MTGJSON and 17lands data.")
+    parser.add_argument("--sets", nargs="+", default=SET_CODES, help="17lands set codes")
+    parser.add_argument("--card-set", default=CARD_SET_CODE, help="Set of the card tables")
+    parser.add_argument("--targets", nargs="+", default=None, help="Stages to refresh")
+    parser.add_argument("--skip-fetch", action="store_true", help="Use the downloaded data")
+    parser.add_argument("--force", action="store_true", help="Rerun fresh stages")
+    parser.add_argument("--n-workers", type=int, default=4)
+    parser.add_argument("--events", type=Path, default=None, help="JSONL file of stage events")
+    args = parser.parse_args()
+
+    if args.events:
+        instrument.add_sink(instrument.JsonlSink(args.events))
+    pipeline = Pipeline(refresh_stages(args.sets, args.card_set))
+    with instrument.Run("refresh"):
+        pipeline.run(
+            targets=args.targets,
+            force=args.force,
+            skip=["fetch_printings", "fetch_prices"] if args.skip_fetch else (),
+            n_workers=args.n_workers,
+        )
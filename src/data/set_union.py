@@ -0,0 +1,120 @@
+"""Union of the processed 17lands tables across sets.
+
+Each set's table is appended to a directory of per-set parts, e.g.
+"All_Sets_Game_PD_Games.parquet/BLB.parquet", by a streaming copy, so adding
+a set never rewrites the sets already in the union.  The sets' schemas are
+aligned lazily when the union is scanned: columns missing from a set are
+filled in (with zero counts for the card state columns), and columns with
+differing types are cast to their common supertype.
+"""
+
+from pathlib import Path
+
+import polars as pl
+
+from src.data.game_data_wrangler import STATE_PREFIXES
+
+UNION_NAME = "All_Sets"
+
+# Columns with inconsistent types across sets, cast before appending
+TYPE_OVERRIDES = {"rank": pl.String, "opp_rank": pl.String}
+
+
+def union_schema(schemas: list) -> dict:
+    """The union of the schemas, in order of first appearance.
+
+    Columns with differing types get their supertype, e.g. Int64 and String
+    give String.
+    """
+    frames = [pl.DataFrame(schema=schema) for schema in schemas]
+    return dict(pl.concat(frames, how="diagonal_relaxed").schema)
+
+
+def align(df_lazy: pl.LazyFrame, schema: dict) -> pl.LazyFrame:
+    """Selects the schema's columns from the frame, in order and type.
+
+    Missing card state columns are filled with zero counts, and other
+    missing columns with nulls.
+    """
+    cols = set(df_lazy.collect_schema().names())
+    exprs = []
+    for col, dtype in schema.items():
+        if col in cols:
+            exprs.append(pl.col(col).cast(dtype))
+        elif col.startswith(tuple(STATE_PREFIXES)):
+            exprs.append(pl.lit(0, dtype).alias(col))
+        else:
+            exprs.append(pl.lit(None, dtype).alias(col))
+    return df_lazy.select(exprs)
+
+
+def scan_sets(files: list) -> pl.LazyFrame:
+    """Lazily scans the files as one frame, aligning their schemas."""
+    frames = [pl.scan_parquet(file) for file in files]
+    schema = union_schema([frame.collect_schema() for frame in frames])
+    return pl.concat([align(frame, schema) for frame in frames], how="vertical")
+
+
+class SetUnion:
+    """The union of one processed table, e.g. "_Game_PD_Cards", across sets.
+
+    Args:
+        root: Directory of the processed per-set files.
+        file_suffix: Suffix of the table's files, e.g. "_Game_PD_Games".
+    """
+
+    def __init__(self, root: Path, file_suffix: str):
+        self.root = Path(root)
+        self.file_suffix = file_suffix
+        self.out_dir = self.root / f"{UNION_NAME}{file_suffix}.parquet"
+
+    def set_file(self, set_code: str) -> Path:
+        """The processed file of one set."""
+        return self.root / f"{set_code}{self.file_suffix}.parquet"
+
+    @property
+    def parts(self) -> list:
+        """The per-set files in the union."""
+        return sorted(self.out_dir.glob("*.parquet"))
+
+    @property
+    def set_codes(self) -> list:
+        """The sets in the union."""
+        return [part.stem for part in self.parts]
+
+    def append(self, set_codes: list, overwrite: bool = False):
+        """Appends the sets to the union, skipping sets already in it.
+
+        Args:
+            set_codes: The sets to add, e.g. ["MKM", "OTJ"].
+            overwrite: Replace the sets that are already in the union.
+        """
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        for set_code in set_codes:
+            part = self.out_dir / f"{set_code}.parquet"
+            if part.exists() and not overwrite:
+                continue
+            df_lazy = pl.scan_parquet(self.set_file(set_code))
+            cols = df_lazy.collect_schema().names()
+            df_lazy.with_columns(
+                pl.col(col).cast(dtype)
+                for col, dtype in TYPE_OVERRIDES.items()
+                if col in cols
+            ).sink_parquet(part)
+            print(f"Appended {set_code} to {self.out_dir}")
+
+    def scan(self, set_codes: list = None) -> pl.LazyFrame:
+        """Lazily scans the union, aligning the sets' schemas.
+
+        Args:
+            set_codes: Sets to include.  Defaults to all sets in the union.
+        """
+        parts = self.parts
+        if set_codes is not None:
+            parts = [part for part in parts if part.stem in set_codes]
+        return scan_sets(parts)
+
+    def write(self, out_file: Path):
+        """Streams the aligned union to a single parquet file."""
+        self.scan().sink_parquet(out_file)
+        print(f"Wrote {self.out_dir} to {out_file}")
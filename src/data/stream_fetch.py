@@ -0,0 +1,327 @@
+"""Stream HTTP downloads with concurrent range requests and inline decompression.
+
+The downloader yields the response body as ordered chunks, so the caller can
+decompress (and untar) straight into the destination without the compressed
+archive ever touching disk.
+"""
+
+import collections
+import http.client
+import io
+import itertools
+import json
+import os
+import tarfile
+import time
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+MiB = 1024 * 1024
+GZIP_WBITS = zlib.MAX_WBITS | 16
+READ_SIZE = 256 * 1024
+INFLATE_BLOCK = 4 * MiB
+STATE_SAVE_BYTES = 256 * MiB
+STATE_SAVE_SECONDS = 10
+
+
+class RangeDownloader:
+    """Downloads a URL as ordered chunks using concurrent HTTP range requests.
+
+    Ranges are fetched by a thread pool, a bounded window ahead of the
+    consumer, and yielded in file order.  A dropped connection is retried from
+    the last byte received for that range, rather than from the start.
+    Servers without range support fall back to a single streaming GET.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        n_workers: int = 4,
+        chunk_size: int = 8 * MiB,
+        max_retries: int = 5,
+        timeout: float = 60,
+    ):
+        self.url = url
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def probe(self, headers: dict = None) -> dict:
+        """Requests the headers of the URL.
+
+        Returns:
+            A dict with the status, size, etag, last_modified, and whether the
+            server accepts byte ranges.
+        """
+        request = urllib.request.Request(self.url, method="HEAD", headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status = response.status
+                response_headers = response.headers
+        except urllib.error.HTTPError as err:
+            if err.code != 304:
+                raise
+            status = err.code
+            response_headers = err.headers
+
+        size = response_headers.get("Content-Length")
+        return {
+            "status": status,
+            "size": int(size) if size is not None else None,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "accepts_ranges": response_headers.get("Accept-Ranges", "").lower()
+            == "bytes",
+        }
+
+    def iter_chunks(self, info: dict = None):
+        """Yields the body of the URL as ordered chunks of bytes.
+
+        Args:
+            info: The result of probe().  Probed if not given.
+        """
+        info = info or self.probe()
+        if not info["accepts_ranges"] or not info["size"]:
+            yield from self._iter_stream()
+            return
+
+        size = info["size"]
+        ranges = (
+            (first, min(first + self.chunk_size, size) - 1)
+            for first in range(0, size, self.chunk_size)
+        )
+        window = 2 * self.n_workers
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+            pending = collections.deque(
+                pool.submit(self._fetch_range, first, last)
+                for first, last in itertools.islice(ranges, window)
+            )
+            try:
+                while pending:
+                    chunk = pending.popleft().result()
+                    for first, last in itertools.islice(ranges, 1):
+                        pending.append(pool.submit(self._fetch_range, first, last))
+                    yield chunk
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _fetch_range(self, first: int, last: int) -> bytes:
+        """Fetches the inclusive byte range, resuming after dropped connections."""
+        buffer = bytearray()
+        n_bytes = last - first + 1
+        attempt = 0
+        while len(buffer) < n_bytes:
+            start = first + len(buffer)
+            request = urllib.request.Request(
+                self.url, headers={"Range": f"bytes={start}-{last}"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    if response.status != 206:
+                        raise ValueError(
+                            f"Expected a partial response for {self.url}, "
+                            f"got status {response.status}."
+                        )
+                    while len(buffer) < n_bytes:
+                        block = response.read(min(READ_SIZE, n_bytes - len(buffer)))
+                        if not block:
+                            break
+                        buffer.extend(block)
+            except urllib.error.HTTPError as err:
+                if err.code < 500:
+                    raise
+                attempt = self._retry_or_raise(attempt, err)
+            except (OSError, http.client.HTTPException) as err:
+                attempt = self._retry_or_raise(attempt, err)
+            else:
+                if len(buffer) < n_bytes:
+                    attempt = self._retry_or_raise(
+                        attempt, IOError(f"Connection closed at byte {start}.")
+                    )
+        return bytes(buffer)
+
+    def _iter_stream(self):
+        """Yields the body from a single GET, for servers without range support."""
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            while True:
+                block = response.read(self.chunk_size)
+                if not block:
+                    break
+                yield block
+
+    def _retry_or_raise(self, attempt: int, err: Exception) -> int:
+        """Sleeps with backoff before the next attempt, or raises when out of retries."""
+        attempt += 1
+        if attempt > self.max_retries:
+            raise IOError(f"Failed to download {self.url}: {err}") from err
+        time.sleep(min(2**attempt, 30))
+        return attempt
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._chunk = memoryview(chunk)
+        n_bytes = min(len(buffer), len(self._chunk))
+        buffer[:n_bytes] = self._chunk[:n_bytes]
+        self._chunk = self._chunk[n_bytes:]
+        return n_bytes
+
+
+def inflate(chunks):
+    """Yields decompressed blocks from a stream of (multi-member) gzip chunks."""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    for chunk in chunks:
+        while chunk:
+            block = decompressor.decompress(chunk, INFLATE_BLOCK)
+            if block:
+                yield block
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+            else:
+                chunk = decompressor.unconsumed_tail
+    block = decompressor.flush()
+    if block:
+        yield block
+
+
+class StateSaver:
+    """Calls save_state at most every STATE_SAVE_BYTES or STATE_SAVE_SECONDS.
+
+    Saving after every block rewrites the state file thousands of times on
+    the multi-GB archives.  A stale state only means redoing some writes.
+    """
+
+    def __init__(self, save_state, every_bytes=STATE_SAVE_BYTES, every_seconds=STATE_SAVE_SECONDS):
+        self.save_state = save_state
+        self.every_bytes = every_bytes
+        self.every_seconds = every_seconds
+        self._bytes = 0
+        self._time = time.monotonic()
+
+    def update(self, state: dict, n_bytes: int, flush=None):
+        """Counts the bytes, and saves the state when a threshold is reached.
+
+        Args:
+            flush: Called before saving, e.g. to flush the output the state
+                points past.
+        """
+        self._bytes += n_bytes
+        if self._bytes >= self.every_bytes or time.monotonic() - self._time >= self.every_seconds:
+            if flush is not None:
+                flush()
+            self.save_state(state)
+            self._bytes = 0
+            self._time = time.monotonic()
+
+
+def gunzip_stream(chunks, out_path: Path, state: dict, save_state) -> int:
+    """Decompresses gzip chunks into out_path, resuming from state["written"].
+
+    The output is written to a ".part" file and renamed when complete.  Only
+    the output writes are resumed: zlib state cannot be persisted, and the
+    archive is not kept on disk, so a resumed run downloads and inflates the
+    whole archive again, and skips writing the bytes already in the partial
+    output.
+
+    Returns:
+        The number of bytes written to out_path.
+    """
+    out_path = Path(out_path)
+    part_path = out_path.with_name(out_path.name + ".part")
+    skip = state.get("written", 0)
+    if not part_path.exists() or part_path.stat().st_size < skip:
+        skip = 0
+
+    position = 0
+    saver = StateSaver(save_state)
+    with open(part_path, "r+b" if skip else "wb") as file:
+        file.truncate(skip)
+        file.seek(skip)
+        for block in inflate(chunks):
+            if position + len(block) <= skip:
+                position += len(block)
+                continue
+            if position < skip:
+                block = block[skip - position :]
+                position = skip
+            file.write(block)
+            position += len(block)
+            state["written"] = position
+            saver.update(state, len(block), flush=file.flush)
+
+    os.replace(part_path, out_path)
+    return position
+
+
+def untar_stream(chunks, out_dir: Path, state: dict, save_state) -> int:
+    """Extracts a gzipped tar stream into out_dir, resuming from state["members_done"].
+
+    As with gunzip_stream(), a resumed run reads the whole archive again, and
+    only skips extracting the members already done.
+
+    Returns:
+        The number of members extracted.
+    """
+    skip = state.get("members_done", 0)
+    reader = io.BufferedReader(ChunkReader(inflate(chunks)), buffer_size=MiB)
+    n_members = 0
+    saver = StateSaver(save_state)
+    with tarfile.open(fileobj=reader, mode="r|") as tar:
+        for n_members, member in enumerate(tar, start=1):
+            if n_members <= skip:
+                continue
+            tar.extract(member, out_dir, filter="data")
+            state["members_done"] = n_members
+            saver.update(state, member.size)
+    return n_members
+
+
+def load_state(path: Path, info: dict) -> dict:
+    """Loads the sidecar state if it matches the remote file, otherwise starts fresh."""
+    fresh = {key: info[key] for key in ["size", "etag", "last_modified"]}
+    path = Path(path)
+    if not path.exists():
+        return fresh
+    with open(path, "r", encoding="utf-8") as file:
+        state = json.load(file)
+    if any(state.get(key) != value for key, value in fresh.items()):
+        return fresh
+    return state
+
+
+def save_state(path: Path, state: dict):
+    """Atomically writes the sidecar state."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(tmp_path, path)
+
+
+def read_url(url: str, timeout: float = 60) -> bytes:
+    """Reads a small file from the URL, or returns None if it is not available."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.read()
+    except (OSError, http.client.HTTPException):
+        return None
@@ -1,16 +1,54 @@
 """Creates mana icons for each color combination.
 
-Using the color_palette.yaml file, draws circles using 
-mana colors and characters. For multi-color combinations, 
-each color is a circle sector (i.e. pizza slice).  
-The circles are saved as PNG.
+Using the color_palette.yaml file, draws circles using
+mana colors and characters. For multi-color combinations,
+each color is a circle sector (i.e. pizza slice).
+The circles are saved as PNG, or as SVG.  The PNGs are also packed into a
+sprite atlas at a few scales, for src.plots.symbols to memory-map.
+
+Each symbol's drawing config (colors, text positions, and angle) is hashed,
+and the hashes of the last run are kept in a manifest next to the images, so
+only the symbols whose config changed are drawn again.  Symbols are drawn
+by one of three renderers:
+
+    matplotlib  draws a matplotlib figure per symbol, as originally (default)
+    raster      draws directly with PIL, supersampled for anti-aliasing
+    svg         writes the SVG markup directly
+
+The raster renderer is much faster, but its icons differ slightly from the
+committed matplotlib ones, so it is opt-in.
+
+Usage:
+    python -m src.graphics.mana_symbols [--renderer matplotlib] [--force]
+    python -m src.graphics.mana_symbols --atlas-only
 """
 
-import matplotlib.pyplot as plt
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import numpy as np
 import yaml
 
 SCALE = 100
+CONFIG_PATH = Path("src/graphics/color_palette.yml")
+OUT_ROOT = Path("images/mana_symbols")
+MANIFEST_NAME = "manifest.json"
+RENDERERS = ["matplotlib", "raster", "svg"]
+ICON_SIZE = 77  # pixels, the size of the matplotlib axes in a 1 inch figure
+SUPERSAMPLE = 4
+TEXT_COLOR = "#130c0e"
+LINE_WIDTH = 0.25  # points
+POINTS_PER_INCH = 72
+FONT_FILE = "DejaVuSansMono-Bold.ttf"
+ATLAS_NAME = "atlas"
+ATLAS_SCALES = (1, 0.75, 0.5)
+ATLAS_WIDTH = 1024  # pixels
+
 
 def get_circle_sector_points(rotation=45, extend=180):
     """Defines the geometric points of the circle sector."""
@@ -44,11 +82,258 @@ def scale_fill(sector_lines):
     scaled_y = center + (sector_lines["y"] - center) * scale_factor
     return scaled_x, scaled_y
 
-def plot_circle_sector(char, fill_color, sector_lines, text_pos, fontsize):
+
+def load_config(config_path=CONFIG_PATH):
+    """Reads the color palette config."""
+    with open(config_path, "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)
+
+
+def symbol_specs(color_config):
+    """The drawing spec of each symbol: its sectors' colors, text, and angles."""
+    color_palette = color_config["colors"]
+    text_configs = color_config["text_positions"]
+    start_angles = color_config["start_angles"]
+
+    specs = {}
+    for name, colors in color_config["pairs"].items():
+        n_colors = len(colors)
+        text_config = text_configs[n_colors]
+        sector_angle = 360 / n_colors
+        specs[name] = {
+            "fontsize": text_config["size"],
+            "sectors": [
+                {
+                    "char": color,
+                    "fill_color": color_palette[color],
+                    "rotation": start_angles[n_colors] - i * sector_angle,
+                    "extend": sector_angle,
+                    "text_pos": text_config["text_pos"][i],
+                }
+                for i, color in enumerate(colors)
+            ],
+        }
+    return specs
+
+
+def spec_hash(spec, renderer):
+    """Hash of everything that changes how the symbol is drawn."""
+    key = json.dumps({"spec": spec, "renderer": renderer, "scale": SCALE}, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def generate(
+    config_path=CONFIG_PATH,
+    out_root=OUT_ROOT,
+    renderer="matplotlib",
+    n_workers=None,
+    force=False,
+):
+    """Draws the symbols whose config changed since the last run.
+
+    Args:
+        config_path: The color palette config.
+        out_root: Directory for the png/ or svg/ output directory.
+        renderer: One of "matplotlib", "raster", or "svg".
+        n_workers: Processes to draw with.  Defaults to the CPU count.
+        force: Draw all symbols.
+
+    Returns:
+        The names of the symbols drawn.
+    """
+    if renderer not in RENDERERS:
+        raise ValueError(f"renderer must be one of {RENDERERS}, not {renderer}")
+    suffix = "svg" if renderer == "svg" else "png"
+    out_dir = Path(out_root) / suffix
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    specs = symbol_specs(load_config(config_path))
+    hashes = {name: spec_hash(spec, renderer) for name, spec in specs.items()}
+    stale = [
+        name
+        for name in specs
+        if force
+        or manifest.get(name) != hashes[name]
+        or not (out_dir / f"{name}.{suffix}").exists()
+    ]
+
+    jobs = [(renderer, specs[name], out_dir / f"{name}.{suffix}") for name in stale]
+    n_workers = min(n_workers or os.cpu_count(), len(jobs))
+    if n_workers > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as executor:
+            list(executor.map(_render, jobs))
+    else:
+        for job in jobs:
+            _render(job)
+
+    manifest = {name: hashes[name] for name in specs}
+    manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    print(f"Drew {len(stale)} of {len(specs)} mana symbols in {out_dir}")
+    if suffix == "png" and (stale or not (Path(out_root) / f"{ATLAS_NAME}.npy").exists()):
+        build_atlas(out_dir, out_root)
+    return stale
+
+
+def build_atlas(png_dir=OUT_ROOT / "png", out_root=OUT_ROOT, scales=ATLAS_SCALES):
+    """Packs the PNG icons into one RGBA sprite atlas, at each scale.
+
+    Icons are resized as IconCache does, and packed in shelves (rows) of at
+    most ATLAS_WIDTH pixels.  The atlas is saved uncompressed as atlas.npy, so
+    it can be memory-mapped, with atlas.json giving each icon's rectangle.
+
+    Returns:
+        The atlas index: {scale: {label: [x, y, width, height]}}.
+    """
+    from PIL import Image
+
+    full_icons = {
+        png.stem: Image.open(png).convert("RGBA") for png in sorted(Path(png_dir).glob("*.png"))
+    }
+    icons = {}
+    for scale in scales:
+        for label, full in full_icons.items():
+            size = (int(full.width * scale), int(full.height * scale))
+            icons[scale, label] = np.array(full if scale == 1 else full.resize(size))
+
+    index = {str(scale): {} for scale in scales}
+    x = y = shelf_height = 0
+    for (scale, label), icon in icons.items():
+        height, width = icon.shape[:2]
+        if x + width > ATLAS_WIDTH:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        index[str(scale)][label] = [x, y, width, height]
+        x += width
+        shelf_height = max(shelf_height, height)
+
+    atlas = np.zeros((y + shelf_height, ATLAS_WIDTH, 4), dtype=np.uint8)
+    for (scale, label), icon in icons.items():
+        x, y, width, height = index[str(scale)][label]
+        atlas[y : y + height, x : x + width] = icon
+
+    out_root = Path(out_root)
+    np.save(out_root / f"{ATLAS_NAME}.npy", atlas)
+    (out_root / f"{ATLAS_NAME}.json").write_text(json.dumps(index))
+    print(f"Packed {len(icons)} icons into a {atlas.shape[1]}x{atlas.shape[0]} atlas")
+    return index
+
+
+def _render(job):
+    renderer, spec, path = job
+    if renderer == "raster":
+        render_raster(spec, path)
+    elif renderer == "svg":
+        render_svg(spec, path)
+    else:
+        render_matplotlib(spec, path)
+
+
+def render_raster(spec, path):
+    """Draws the symbol with PIL, at SUPERSAMPLE times the size, then downsamples.
+
+    The image matches the matplotlib renderer's: ICON_SIZE pixels across the
+    0-SCALE axes, with font sizes in points at SCALE dpi.
+    """
+    import matplotlib
+    from PIL import Image, ImageDraw, ImageFont
+
+    size = ICON_SIZE * SUPERSAMPLE
+    px_per_unit = size / SCALE
+    px_per_point = SCALE / POINTS_PER_INCH * SUPERSAMPLE
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    font_path = Path(matplotlib.get_data_path()) / "fonts" / "ttf" / FONT_FILE
+    font = ImageFont.truetype(str(font_path), round(spec["fontsize"] * px_per_point))
+
+    def to_pixels(x, y):
+        return list(zip(x * px_per_unit, (SCALE - y) * px_per_unit))
+
+    for sector in spec["sectors"]:
+        lines = get_circle_sector_points(sector["rotation"], sector["extend"])
+        draw.line(
+            to_pixels(lines["x"], lines["y"]),
+            fill="black",
+            # Half a pixel once downsampled, close to matplotlib's hairline
+            width=max(SUPERSAMPLE // 2, round(LINE_WIDTH * px_per_point)),
+        )
+        draw.polygon(to_pixels(*scale_fill(lines)), fill=sector["fill_color"])
+    for sector in spec["sectors"]:
+        pos = sector["text_pos"]
+        draw.text(
+            (pos["x"] * px_per_unit, (SCALE - pos["y"]) * px_per_unit),
+            sector["char"],
+            fill=TEXT_COLOR,
+            font=font,
+            anchor="mm",
+        )
+
+    img.resize((ICON_SIZE, ICON_SIZE), Image.LANCZOS).save(path)
+
+
+def render_svg(spec, path):
+    """Writes the symbol as SVG markup, the same size as the PNG icons."""
+    units_per_point = SCALE / POINTS_PER_INCH * SCALE / ICON_SIZE
+    elements = []
+    for sector in spec["sectors"]:
+        lines = get_circle_sector_points(sector["rotation"], sector["extend"])
+        elements.append(
+            f'<path d="{_svg_path(*scale_fill(lines))}" fill="{sector["fill_color"]}"/>'
+        )
+        elements.append(
+            f'<path d="{_svg_path(lines["x"], lines["y"])}" fill="none" '
+            f'stroke="black" stroke-width="{LINE_WIDTH * units_per_point:.2f}"/>'
+        )
+    for sector in spec["sectors"]:
+        pos = sector["text_pos"]
+        elements.append(
+            f'<text x="{pos["x"]}" y="{SCALE - pos["y"]}" '
+            f'font-size="{spec["fontsize"] * units_per_point:.2f}" '
+            f'font-family="DejaVu Sans Mono, monospace" font-weight="bold" '
+            f'fill="{TEXT_COLOR}" text-anchor="middle" dominant-baseline="central">'
+            f'{sector["char"]}</text>'
+        )
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{ICON_SIZE}" '
+        f'height="{ICON_SIZE}" viewBox="0 0 {SCALE} {SCALE}">\n'
+        + "\n".join(elements)
+        + "\n</svg>\n"
+    )
+    Path(path).write_text(svg, encoding="utf-8")
+
+
+def _svg_path(x, y):
+    points = " L ".join(f"{x_i:.2f},{SCALE - y_i:.2f}" for x_i, y_i in zip(x, y))
+    return f"M {points} Z"
+
+
+def render_matplotlib(spec, path):
+    """Draws the symbol as a matplotlib figure."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(1, 1), dpi=SCALE)
+    for sector in spec["sectors"]:
+        lines = get_circle_sector_points(sector["rotation"], sector["extend"])
+        plot_circle_sector(
+            ax,
+            char=sector["char"],
+            fill_color=sector["fill_color"],
+            sector_lines=lines,
+            text_pos=sector["text_pos"],
+            fontsize=spec["fontsize"],
+        )
+    save_plot(fig, ax, path)
+
+
+def plot_circle_sector(ax, char, fill_color, sector_lines, text_pos, fontsize):
     """Plots the circle sector, including lines, fill, and text."""
     ax.plot(
-        sector_lines["x"], sector_lines["y"], 
-        color="black", linewidth=0.25
+        sector_lines["x"], sector_lines["y"],
+        color="black", linewidth=LINE_WIDTH
     )
     scaled_x, scaled_y = scale_fill(sector_lines)
     ax.fill(scaled_x, scaled_y, color=fill_color)
@@ -57,50 +342,42 @@ def plot_circle_sector(char, fill_color, sector_lines, text_pos, fontsize):
         text_pos["y"] * SCALE / 100,
         char,
         fontsize=fontsize,
-        color="#130c0e",
+        color=TEXT_COLOR,
         ha="center",
         va="center",
         fontname="monospace",
         weight="bold",
     )
 
-def save_plot():
+def save_plot(fig, ax, path):
     """Clean up and save plot."""
+    import matplotlib.pyplot as plt
+
     ax.set_aspect("equal")
-    plt.xlim(0, SCALE)
-    plt.ylim(0, SCALE)
-    plt.axis("off")
-    plt.savefig(
-        f"images/mana_symbols/png/{name}.png",
+    ax.set_xlim(0, SCALE)
+    ax.set_ylim(0, SCALE)
+    ax.axis("off")
+    fig.savefig(
+        path,
         bbox_inches="tight",
         pad_inches=0,
         transparent=True,
     )
-    plt.close()
-
-# Read configs
-with open("src/graphics/color_palette.yml", "r", encoding="utf-8") as file:
-    color_config = yaml.safe_load(file)
-color_palette = color_config["colors"]
-text_configs = color_config["text_positions"]
-start_angles = color_config["start_angles"]
-
-# Draw mana symbols
-for name, colors in color_config["pairs"].items():
-    n_colors = len(colors)
-    text_config = text_configs[n_colors]
-    sector_angle = 360 / n_colors
-    fig, ax = plt.subplots(figsize=(1, 1), dpi=SCALE)
-    for i, color in enumerate(colors):
-        rotation_angle = start_angles[n_colors] - i * sector_angle
-        lines = get_circle_sector_points(rotation=rotation_angle, extend=sector_angle)
+    plt.close(fig)
 
-        plot_circle_sector(
-            char=color,
-            fill_color=color_palette[color],
-            sector_lines=lines,
-            text_pos=text_config["text_pos"][i],
-            fontsize=text_config["size"],
-        )
 
-    save_plot()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draws the mana symbols.")
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH)
+    parser.add_argument("--out-root", type=Path, default=OUT_ROOT)
+    parser.add_argument("--renderer", choices=RENDERERS, default="matplotlib")
+    parser.add_argument("--n-workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument(
+        "--atlas-only", action="store_true", help="Only pack the existing PNGs into the atlas"
+    )
+    args = parser.parse_args()
+    if args.atlas_only:
+        build_atlas(args.out_root / "png", args.out_root)
+    else:
+        generate(args.config, args.out_root, args.renderer, args.n_workers, args.force)
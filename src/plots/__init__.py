@@ -0,0 +1,11 @@
+"""Plotting helpers.  The submodules are imported on first attribute access."""
+
+import importlib
+
+__all__ = ["annotate", "icon_collection", "symbols"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
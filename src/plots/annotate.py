@@ -1,23 +1,14 @@
-"""Supplemental annotations for plots, such as labels or lines."""
-
-from sys import implementation
-import pandas as pd
-from pytest import yield_fixture
-from tqdm.notebook import tqdm
-from pathlib import Path
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from matplotlib.ticker import FuncFormatter
-from matplotlib.colors import to_rgba, to_hex
-import matplotlib.dates as mdates
-import seaborn as sns
-import numpy as np
-import time
-import polars as pl
-from datetime import datetime, timedelta
-from PIL import Image
-from typing import Optional, Union, Dict, List
-from matplotlib.legend import Legend
+"""Supplemental annotations for plots, such as labels or lines.
+
+matplotlib is imported when a function is first called, so importing this
+module is cheap.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    from matplotlib.legend import Legend
 
 
 def set_axis_labels_and_show(
@@ -25,7 +16,7 @@ def set_axis_labels_and_show(
     title: Optional[str] = None,
     xlabel: Optional[str] = None,
     ylabel: Optional[str] = None,
-    legend: Union[bool, Legend] = False,
+    legend: Union[bool, "Legend"] = False,
     legend_title: Optional[str] = None,
     legend_labels: Optional[Dict[str, str]] = None,
     legend_format: Optional[str] = None,
@@ -35,6 +26,8 @@ def set_axis_labels_and_show(
     reverse_y: bool = False,
 ):
     """Sets the title and axis labels and shows the plot."""
+    import matplotlib.pyplot as plt
+    from matplotlib.legend import Legend
 
     fig = plt.gcf()
     ax = plt.gca()
@@ -83,6 +76,8 @@ def set_axis_labels_and_show(
 
 
 def _format_axis_labels(formatter, axis):
+    import matplotlib.pyplot as plt
+
     ax = plt.gca()
 
     if axis == "x":
@@ -97,6 +92,8 @@ def _format_axis_labels(formatter, axis):
 
 
 def _get_percent_precision(axis='x'):
+    import matplotlib.pyplot as plt
+
     ax = plt.gca()
     if axis=='x':
         lims = ax.get_xlim()
@@ -115,6 +112,7 @@ def _get_percent_precision(axis='x'):
 
 def set_labels_to_percent(axis="x", precision=None):
     """Sets the axis labels to percent format"""
+    from matplotlib.ticker import FuncFormatter
 
     precision = _get_percent_precision(axis)
     formatter = FuncFormatter(lambda x, _: f"{x:.{precision}%}")
@@ -123,11 +121,15 @@ def set_labels_to_percent(axis="x", precision=None):
 
 def set_labels_to_commas(axis="x", precision=0):
     """Sets the axis labels to percent format"""
+    from matplotlib.ticker import FuncFormatter
+
     formatter = FuncFormatter(lambda x, _: f"{x:,.{precision}f}")
     _format_axis_labels(formatter, axis)
 
 def set_labels_to_ints(axis="x"):
     """Converts floating point axis tick labels to integers."""
+    import matplotlib.pyplot as plt
+
     ticks = plt.gca().get_xticks()
     ticks = list(set(map(int, ticks)))
 
@@ -138,6 +140,8 @@ def set_labels_to_ints(axis="x"):
 
 def annotate_bars(padding_ratio=1.05):
     """Annotate the bars in a bar plot with the height of the bar."""
+    import matplotlib.pyplot as plt
+
     fig = plt.gcf()
     ax = plt.gca()
 
@@ -174,6 +178,9 @@ def annotate_bars(padding_ratio=1.05):
 
 def plot_vert_line(x, label=None, use_arrow=False, offset=0, y_pos=0.83):
     """Plots a vertical line with optional annotation."""
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
     fig = plt.gcf()
     ax = plt.gca()
 
@@ -0,0 +1,87 @@
+"""A matplotlib artist that draws many icons as one composited image."""
+
+import matplotlib.artist
+import numpy as np
+from PIL import Image
+
+from src.plots.symbols import icon_cache
+
+
+class IconCollection(matplotlib.artist.Artist):
+    """Icons centered on data points, drawn as a single composited image.
+
+    At draw time the icon extents are transformed to pixels together, each
+    label's icon is resized once, and the icons are blended in order into one
+    image of the axes, so thousands of icons are one artist and one image.
+
+    Args:
+        x, y: The icon centers, in data coordinates.
+        labels: The icon label of each point.
+        width, height: The icon size, in data units.
+    """
+
+    def __init__(self, x, y, labels, width, height, **kwargs):
+        super().__init__()
+        self.set(**kwargs)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.labels = np.asarray(labels)
+        self.width = width
+        self.height = height
+
+    def draw(self, renderer):
+        if not self.get_visible() or len(self.x) == 0:
+            return
+        ax = self.axes
+        corners = np.column_stack(
+            [
+                np.concatenate([self.x - self.width / 2, self.x + self.width / 2]),
+                np.concatenate([self.y - self.height / 2, self.y + self.height / 2]),
+            ]
+        )
+        pixels = ax.transData.transform(corners)
+        lower, upper = pixels[: len(self.x)], pixels[len(self.x) :]
+        icon_w = int(round(abs(upper[0, 0] - lower[0, 0])))
+        icon_h = int(round(abs(upper[0, 1] - lower[0, 1])))
+        if icon_w < 1 or icon_h < 1:
+            return
+
+        x0, y0 = int(np.floor(ax.bbox.x0)), int(np.floor(ax.bbox.y0))
+        canvas_w = int(np.ceil(ax.bbox.x1)) - x0
+        canvas_h = int(np.ceil(ax.bbox.y1)) - y0
+        lefts = np.round(np.minimum(lower[:, 0], upper[:, 0]) - x0).astype(int)
+        tops = canvas_h - np.round(np.maximum(lower[:, 1], upper[:, 1]) - y0).astype(int)
+
+        # Premultiplied alpha icons, resized once per label
+        label_ids, inverse = np.unique(self.labels, return_inverse=True)
+        sprites = []
+        for label in label_ids:
+            icon = Image.fromarray(icon_cache.get(label, 1)).resize((icon_w, icon_h))
+            sprite = np.asarray(icon, dtype=np.float32) / 255
+            sprite[..., :3] *= sprite[..., 3:]
+            sprites.append(sprite)
+
+        canvas = np.zeros((canvas_h, canvas_w, 4), dtype=np.float32)
+        for left, top, sprite_id in zip(lefts, tops, inverse):
+            # Clip the icon to the canvas
+            c0, r0 = max(left, 0), max(top, 0)
+            c1, r1 = min(left + icon_w, canvas_w), min(top + icon_h, canvas_h)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            sprite = sprites[sprite_id][r0 - top : r1 - top, c0 - left : c1 - left]
+            region = canvas[r0:r1, c0:c1]
+            region *= 1 - sprite[..., 3:]
+            region += sprite
+
+        alpha = canvas[..., 3:]
+        canvas[..., :3] = np.divide(
+            canvas[..., :3], alpha, out=np.zeros_like(canvas[..., :3]), where=alpha > 0
+        )
+        # The renderer expects the bottom row first
+        image = (canvas[::-1] * 255).round().astype(np.uint8)
+
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(ax.bbox)
+        renderer.draw_image(gc, x0, y0, image)
+        gc.restore()
+        self.stale = False
@@ -1,27 +1,123 @@
-"""Add icons to plots as tick labels, plot labels, or points"""
+"""Add icons to plots as tick labels, plot labels, or points
 
+matplotlib, NumPy, and PIL are imported when first used, so importing this
+module is cheap and does no file I/O.
+"""
+
+import json
+from collections import OrderedDict
 from pathlib import Path
 
-import matplotlib.collections
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import seaborn as sns
-import numpy as np
-from PIL import Image
-import pandas as pd
+ICON_ROOT = Path("images/mana_symbols/png")
+ATLAS_PATH = Path("images/mana_symbols/atlas.npy")
+CACHE_SIZE = 256
+
+
+class IconCache:
+    """Decoded RGBA icons, keyed by (label, scale), with least recently used eviction.
+
+    Icons at the scales of the sprite atlas, written by
+    src.graphics.mana_symbols, are views into the memory-mapped atlas, so
+    they cost no decoding, and processes share the atlas' page cache.
+    Otherwise the label index is globbed on first use, and each icon file is
+    decoded once.  Other scales are resized from the full size icon.
+    """
+
+    def __init__(self, icon_root=ICON_ROOT, max_size=CACHE_SIZE, atlas_path=ATLAS_PATH):
+        self.icon_root = Path(icon_root)
+        self.max_size = max_size
+        self.atlas_path = Path(atlas_path) if atlas_path is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._index = None
+        self._atlas = None
+        self._icons = OrderedDict()
+
+    @property
+    def index(self):
+        """The icon file of each label."""
+        if self._index is None:
+            self._index = {f.stem: f for f in self.icon_root.glob("*.png")}
+        return self._index
+
+    @property
+    def atlas(self):
+        """The memory-mapped atlas and its {scale: {label: rect}} index, if any."""
+        if self._atlas is None:
+            self._atlas = (None, {})
+            index_path = None if self.atlas_path is None else self.atlas_path.with_suffix(".json")
+            if index_path is not None and index_path.exists():
+                import numpy as np
+
+                index = json.loads(index_path.read_text())
+                atlas = np.load(self.atlas_path, mmap_mode="r")
+                self._atlas = (atlas, {float(scale): rects for scale, rects in index.items()})
+        return self._atlas
+
+    def get(self, label, scale=0.5):
+        """The icon as a read-only RGBA array, resized by the scale."""
+        atlas, index = self.atlas
+        rect = index.get(scale, {}).get(label)
+        if rect is not None:
+            self.hits += 1
+            x, y, width, height = rect
+            return atlas[y : y + height, x : x + width]
+
+        key = (label, scale)
+        if key in self._icons:
+            self.hits += 1
+            self._icons.move_to_end(key)
+            return self._icons[key]
 
-icon_root = Path("images/mana_symbols/png")
-png_files = list(icon_root.glob("*"))
-label_to_icon = {f.stem: f for f in png_files}
+        import numpy as np
+        from PIL import Image
+
+        self.misses += 1
+        if scale == 1:
+            img = Image.open(self.index[label]).convert("RGBA")
+        else:
+            full = Image.fromarray(self.get(label, 1))
+            img = full.resize((int(full.width * scale), int(full.height * scale)))
+        icon = np.array(img)
+        icon.flags.writeable = False
+        self._put(key, icon)
+        return icon
+
+    def warm_up(self, labels=None, scales=(0.5,)):
+        """Decodes the icons ahead of plotting.  Defaults to all labels."""
+        labels = self.index if labels is None else labels
+        for label in labels:
+            for scale in scales:
+                self.get(label, scale)
+
+    def clear(self):
+        """Drops the cached icons, the label index, and the atlas."""
+        self._icons.clear()
+        self._index = None
+        self._atlas = None
+
+    def _put(self, key, icon):
+        self._icons[key] = icon
+        self._icons.move_to_end(key)
+        while len(self._icons) > self.max_size:
+            self._icons.popitem(last=False)
 
 
-def _load_image(path, scale=0.5):
-    img = Image.open(path)
-    img = img.resize((int(img.width * scale), int(img.height * scale)))
-    return np.array(img)
+icon_cache = IconCache()
+
+
+def warm_up(labels=None, scales=(0.5,)):
+    """Decodes the icons ahead of plotting, e.g. at the start of a report job."""
+    icon_cache.warm_up(labels, scales)
+
+
+def _load_image(label, scale=0.5):
+    return icon_cache.get(label, scale)
 
 def add_tick_symbols(orient="y", scale=0.75, x_top=False):
     """Adds icons, such as symbols, as the plot axis labels."""
+    import matplotlib.pyplot as plt
+
     fig = plt.gcf()
     ax = plt.gca()
 
@@ -41,7 +137,7 @@ def add_tick_symbols(orient="y", scale=0.75, x_top=False):
 
     for tick, pos in zip(tick_labels, tick_positions):
         label = tick.get_text()
-        icon = _load_image(label_to_icon[label], scale=scale)
+        icon = _load_image(label, scale=scale)
         aspect_ratio = (y_lims[1] - y_lims[0]) / (x_lims[1] - x_lims[0]) * fig_lims[0] / fig_lims[1]
 
         if orient == "y":
@@ -95,8 +191,18 @@ def add_heatmap_symbols(scale=0.75):
     add_tick_symbols(orient="x", scale=scale, x_top=True)
 
 
-def add_timeseries_symbols(data, x_col, y_col, label_col, locs, scale=0.035):
-    """Adds icons to the time series lines."""
+def add_timeseries_symbols(data, x_col, y_col, label_col, locs, scale=0.035, batched=True):
+    """Adds icons to the time series lines.
+
+    Args:
+        data: A pandas or polars DataFrame.
+        locs: The x values to label, or "first" or "last".
+        batched: Draw all icons as one IconCollection, instead of an image per row.
+    """
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     fig = plt.gcf()
     ax = plt.gca()
 
@@ -107,39 +213,34 @@ def add_timeseries_symbols(data, x_col, y_col, label_col, locs, scale=0.035):
     if not isinstance(locs, list):
         locs = [locs]
 
+    x_all, y_all, labels_all = _columns(data, x_col, y_col, label_col)
+    w = (x_lims[1] - x_lims[0]) * scale
+    h = (y_lims[1] - y_lims[0]) * scale * fig_lims[0] / fig_lims[1]
     for loc in locs:
-        if loc == 'first':
-            loc = data[x_col].min()
-        elif loc == 'last':
-            loc = data[x_col].max()
-
-        mask = data[x_col] == loc
-        labels = data.loc[mask].sort_values(y_col, ascending=False)
-
-        w = (x_lims[1] - x_lims[0]) * scale
-        h = (y_lims[1] - y_lims[0]) * scale * fig_lims[0] / fig_lims[1]
-        for i, row in labels.iterrows():
-            icon = _load_image(label_to_icon[row[label_col]])
-            x = mdates.date2num(row[x_col])
-            y = row[y_col] - y_lims[1] * 0.0
-            ax.imshow(
-                icon,
-                extent=(
-                    x - w / 2,
-                    x + w / 2,
-                    y - h / 2,
-                    y + h / 2,
-                ),
-                aspect="auto",  # Preserve aspect ratio of the image
-                zorder=5,  # Draw images above plot lines
-            )
+        if loc == "first":
+            loc = x_all.min()
+        elif loc == "last":
+            loc = x_all.max()
+
+        rows = np.flatnonzero(x_all == np.asarray(loc, dtype=x_all.dtype))
+        rows = rows[np.argsort(-y_all[rows], kind="stable")]
+        x = mdates.date2num(x_all[rows])
+        y = y_all[rows]
+        _draw_icons(ax, x, y, labels_all[rows], w, h, batched)
 
     ax.set_ylim(y_lims)
     ax.set_xlim(x_lims)
 
 
-def add_plot_symbols(data, x_col, y_col, label_col, scale=0.045):
-    """Adds icons to the time series lines."""
+def add_plot_symbols(data, x_col, y_col, label_col, scale=0.045, batched=True):
+    """Adds icons to the plot as points.
+
+    Args:
+        data: A pandas or polars DataFrame.
+        batched: Draw all icons as one IconCollection, instead of an image per row.
+    """
+    import matplotlib.pyplot as plt
+
     fig = plt.gcf()
     ax = plt.gca()
 
@@ -149,21 +250,29 @@ def add_plot_symbols(data, x_col, y_col, label_col, scale=0.045):
 
     w = (x_lims[1] - x_lims[0]) * scale
     h = (y_lims[1] - y_lims[0]) * scale * fig_lims[0] / fig_lims[1]
-    for i, row in data.iterrows():
-        icon = _load_image(label_to_icon[row[label_col]])
-        x = row[x_col]
-        y = row[y_col]
+    x, y, labels = _columns(data, x_col, y_col, label_col)
+    _draw_icons(ax, x, y, labels, w, h, batched)
+
+    ax.set_ylim(y_lims)
+    ax.set_xlim(x_lims)
+
+
+def _draw_icons(ax, x, y, labels, w, h, batched):
+    """Draws the icons centered on the points, in the order given."""
+    if batched:
+        from src.plots.icon_collection import IconCollection
+
+        ax.add_artist(IconCollection(x, y, labels, w, h, zorder=5))
+        return
+    for x_i, y_i, label in zip(x, y, labels):
         ax.imshow(
-            icon,
-            extent=(
-                x - w / 2,
-                x + w / 2,
-                y - h / 2,
-                y + h / 2,
-            ),
+            _load_image(label),
+            extent=(x_i - w / 2, x_i + w / 2, y_i - h / 2, y_i + h / 2),
             aspect="auto",  # Preserve aspect ratio of the image
             zorder=5,  # Draw images above plot lines
         )
 
-    ax.set_ylim(y_lims)
-    ax.set_xlim(x_lims)
+
+def _columns(data, *cols):
+    """The columns of a pandas or polars DataFrame, as NumPy arrays."""
+    return [data[col].to_numpy() for col in cols]
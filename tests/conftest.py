@@ -0,0 +1,31 @@
+"""Shared fixtures: small synthetic 17lands sets, converted to parquet."""
+
+import pytest
+
+from benchmarks import synthetic
+from src.data.game_data_wrangler import GameDataWrangler
+
+
+def _converted_set(root, set_code: str, n_games: int, n_cards: int, seed: int) -> GameDataWrangler:
+    paths = {"raw": root / "raw", "interim": root / "interim", "processed": root / "processed"}
+    wrangler = GameDataWrangler(set_code, paths)
+    synthetic.write_game_csv(wrangler.csv_file, set_code, n_games, n_cards, seed)
+    wrangler.csv_to_parquet()
+    return wrangler
+
+
+@pytest.fixture(scope="session")
+def games_root(tmp_path_factory):
+    return tmp_path_factory.mktemp("games")
+
+
+@pytest.fixture(scope="session")
+def blb_games(games_root) -> GameDataWrangler:
+    """700 BLB games with 20 non-land cards."""
+    return _converted_set(games_root, "BLB", 700, 20, seed=1)
+
+
+@pytest.fixture(scope="session")
+def otj_games(games_root) -> GameDataWrangler:
+    """350 OTJ games with 12 non-land cards."""
+    return _converted_set(games_root, "OTJ", 350, 12, seed=2)
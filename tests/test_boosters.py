@@ -0,0 +1,86 @@
+"""Booster pull rates, and the pack simulator they should agree with."""
+
+import numpy as np
+import polars as pl
+import pytest
+
+from src.data.boosters import PackSimulator, pull_rates, sheet_card_rates
+
+BOOSTER = {"setCode": "BLB", "boosterName": "play"}
+
+
+@pytest.fixture
+def tables():
+    """Two configs of a common and a rare sheet.  The rare sheet has a special guest."""
+    weights = pl.DataFrame({**BOOSTER, "boosterIndex": [0, 1], "boosterWeight": [3, 1]})
+    contents = pl.DataFrame(
+        {
+            **BOOSTER,
+            "boosterIndex": [0, 0, 1, 1],
+            "sheetName": ["common", "rare", "common", "rare"],
+            "sheetPicks": [2, 1, 3, 0],
+        }
+    )
+    sheets = pl.DataFrame({**BOOSTER, "sheetName": ["common", "rare"], "sheetIsFoil": False})
+    sheet_cards = pl.DataFrame(
+        {
+            **BOOSTER,
+            "sheetName": ["common"] * 3 + ["rare"] * 3,
+            "cardUuid": ["c1", "c2", "c3", "r1", "r2", "guest"],
+            "cardWeight": [1, 1, 2, 3, 3, 2],
+        }
+    )
+    return {
+        "weights": weights.lazy(),
+        "contents": contents.lazy(),
+        "sheets": sheets.lazy(),
+        "sheet_cards": sheet_cards.lazy(),
+    }
+
+
+@pytest.fixture
+def cards():
+    """The set's cards, without the special guest."""
+    uuids = ["c1", "c2", "c3", "r1", "r2"]
+    return pl.LazyFrame(
+        {
+            "uuid": uuids,
+            "name": ["Common A", "Common A", "Common B", "Rare A", "Rare B"],
+            "number": ["1", "2", "3", "4", "5"],
+            "rarity": ["common"] * 3 + ["rare"] * 2,
+        }
+    )
+
+
+def test_sheet_rate_is_over_the_whole_sheet(tables, cards):
+    rates = sheet_card_rates(tables, cards).filter(pl.col("boosterIndex") == 0).collect()
+    sheet_rates = dict(rates.select("cardUuid", "cardSheetRate").rows())
+
+    assert sheet_rates == pytest.approx(
+        {"c1": 0.25, "c2": 0.25, "c3": 0.5, "r1": 0.375, "r2": 0.375}
+    )
+    assert "guest" not in sheet_rates
+
+
+def test_pull_rates_sum_configs_and_names(tables, cards):
+    rates = pull_rates(tables, cards).collect()
+    by_uuid = dict(rates.select("cardUuid", "expectedCardUuidPullRate").rows())
+    by_name = dict(rates.select("cardUuid", "expectedCardNamePullRate").rows())
+
+    # 2 common picks in 3/4 of packs, and 3 in 1/4
+    assert by_uuid["c1"] == pytest.approx(0.25 * (0.75 * 2 + 0.25 * 3))
+    assert by_uuid["r1"] == pytest.approx(0.375 * 0.75)
+    assert by_name["c1"] == by_name["c2"] == pytest.approx(2 * by_uuid["c1"])
+
+
+def test_simulated_pulls_match_the_expected_rates(tables, cards):
+    simulator = PackSimulator(tables, "BLB", "play")
+    packs = simulator.simulate(1000, seed=0)
+    assert packs.shape == (1000, 3)
+
+    sim = simulator.pull_counts(200_000, seed=0, batch_size=50_000)
+    expected = pull_rates(tables, cards).collect()
+    joined = sim.join(expected, on="cardUuid")
+    assert joined.height == 5
+    assert np.allclose(joined["simPullRate"], joined["expectedCardUuidPullRate"], atol=0.01)
+    assert (sim["simPackRate"] <= sim["simPullRate"] + 1e-12).all()
@@ -0,0 +1,84 @@
+"""Co-occurrence counts of the draft-card network."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import polars as pl
+
+from src.data import card_network
+from src.data.card_network import CardNetwork
+from src.data.card_states import CardStateStore
+
+
+def _edges(n_drafts: int = 500, n_cards: int = 30, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    in_deck = rng.random((n_drafts, n_cards)) < 0.3
+    drafts, cards = np.nonzero(in_deck)
+    # Repeated rows, as a card is in several games of a draft
+    return pl.DataFrame({"draft_idx": drafts, "card": [f"card {i:02d}" for i in cards]}).vstack(
+        pl.DataFrame({"draft_idx": drafts[::3], "card": [f"card {i:02d}" for i in cards[::3]]})
+    )
+
+
+def test_cooccurrence_counts_are_exact_integers():
+    network = CardNetwork.from_edges(_edges())
+    dense = network.incidence.toarray()
+    expected = dense.T @ dense
+
+    serial = network.cooccurrence(n_workers=1)
+    parallel = network.cooccurrence(chunk_size=128, n_workers=2)
+    assert serial.dtype == np.int64
+    assert np.array_equal(serial.toarray(), expected)
+    assert np.array_equal(parallel.toarray(), expected)
+    assert np.array_equal(serial.diagonal(), dense.sum(axis=0))
+
+
+def test_parallel_cooccurrence_bounds_chunks_in_flight(monkeypatch):
+    in_flight = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        """Counts the submitted chunks not yet finished."""
+
+        def __init__(self, max_workers, mp_context):
+            super().__init__(max_workers)
+            self.futures = []
+
+        def submit(self, fn, chunk):
+            self.futures.append(super().submit(fn, chunk))
+            in_flight.append(sum(not future.done() for future in self.futures))
+            return self.futures[-1]
+
+    monkeypatch.setattr(card_network, "ProcessPoolExecutor", CountingExecutor)
+    network = CardNetwork.from_edges(_edges())
+    counts = network.cooccurrence(chunk_size=16, n_workers=2)
+
+    assert len(in_flight) == -(-len(network.drafts) // 16)
+    assert max(in_flight) <= 2
+    assert np.array_equal(counts.toarray(), network.cooccurrence(n_workers=1).toarray())
+
+
+def test_lift_lists_each_pair_once():
+    network = CardNetwork.from_edges(_edges())
+    lift = network.lift(n_workers=1)
+    n_cards = len(network.cards)
+    assert lift.height == n_cards * (n_cards - 1) // 2
+    assert (lift["card_a"] < lift["card_b"]).all()
+    assert lift["count"].dtype == pl.Int64
+
+
+def test_from_card_states_merges_games_into_drafts(blb_games, tmp_path):
+    store = CardStateStore.build(blb_games.parquet_file, tmp_path / "store")
+    network = CardNetwork.from_card_states(store)
+
+    wide = blb_games.scan().collect()
+    deck_cols = [f"deck_{card}" for card in network.cards]
+    expected = (
+        wide.group_by("draft_id")
+        .agg((pl.col(deck_cols) > 0).any())
+        .sort("draft_id")
+        .select(deck_cols)
+        .to_numpy()
+        .astype(np.int64)
+    )
+    assert network.drafts == sorted(wide["draft_id"].unique())
+    assert np.array_equal(network.incidence.toarray(), expected)
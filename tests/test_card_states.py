@@ -0,0 +1,35 @@
+"""Round trips of the sparse card state store."""
+
+import numpy as np
+import polars as pl
+
+from src.data.card_states import STATES, CardStateStore
+from src.data.game_data_wrangler import ID_COLS
+
+
+def test_store_round_trips_to_wide_and_csr(blb_games, tmp_path):
+    wide = blb_games.scan().collect()
+    store = CardStateStore.build(blb_games.parquet_file, tmp_path / "store", cards_per_read=7)
+
+    card_cols = [col for col in store.to_wide().columns if col not in [*ID_COLS, "game_key"]]
+    assert store.to_wide().select(*ID_COLS, *card_cols).equals(wide.select(*ID_COLS, *card_cols))
+    assert len(card_cols) == len(STATES) * len(store.cards)
+
+    # Only the non-zero counts are stored
+    n_non_zero = sum((wide[col] != 0).sum() for col in card_cols)
+    assert store.scan().select(pl.len()).collect().item() == n_non_zero
+
+    deck = store.to_csr("deck").toarray()
+    expected = wide.select(f"deck_{card}" for card in store.cards["card"]).to_numpy()
+    assert np.array_equal(deck, expected)
+
+
+def test_card_reads_one_card(blb_games, tmp_path):
+    wide = blb_games.scan().collect()
+    store = CardStateStore.build(blb_games.parquet_file, tmp_path / "store")
+
+    df = store.card("BLB Card 3", states=["opening_hand"])
+    expected = wide.filter(pl.col("opening_hand_BLB Card 3") != 0)
+    assert df.height == expected.height
+    assert df.sort("game_key")["count"].to_list() == expected["opening_hand_BLB Card 3"].to_list()
+    assert set(df["state"].cast(pl.String)) == {"opening_hand"}
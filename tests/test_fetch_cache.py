@@ -0,0 +1,52 @@
+"""The fetch manifest, shared by concurrent fetchers."""
+
+import threading
+
+from src.data.fetch_cache import FetchCache
+
+REMOTE = {"etag": '"abc"', "last_modified": None, "meta_version": "5.2.2", "meta_date": None}
+
+
+def test_caches_of_one_manifest_keep_each_others_entries(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    printings = FetchCache(manifest_path)
+    prices = FetchCache(manifest_path)
+
+    printings.record_fetch("AllPrintingsParquetFiles.tar.gz", REMOTE, "aa", 10, [tmp_path])
+    prices.record_fetch("AllPrices.json.gz", REMOTE, "bb", 20, [tmp_path])
+    printings.record_hit("AllPrintingsParquetFiles.tar.gz")
+
+    cache = FetchCache(manifest_path)
+    assert set(cache.manifest["artifacts"]) == {
+        "AllPrintingsParquetFiles.tar.gz",
+        "AllPrices.json.gz",
+    }
+    assert cache.stats == {"hits": 1, "misses": 2, "bytes_saved": 10}
+
+
+def test_concurrent_fetch_records_are_merged(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    n_fetches = 16
+    barrier = threading.Barrier(n_fetches)
+    errors = []
+
+    def fetch(i):
+        cache = FetchCache(manifest_path)
+        barrier.wait()
+        try:
+            for _ in range(5):
+                cache.record_fetch(f"artifact{i}.gz", REMOTE, f"{i}", i, [tmp_path])
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(n_fetches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    cache = FetchCache(manifest_path)
+    assert set(cache.manifest["artifacts"]) == {f"artifact{i}.gz" for i in range(n_fetches)}
+    assert cache.stats["misses"] == 5 * n_fetches
+    assert list(tmp_path.glob("*.tmp")) == []
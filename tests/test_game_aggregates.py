@@ -0,0 +1,21 @@
+"""The one-pass game aggregates agree with the notebook's sequence of scans."""
+
+import math
+
+from benchmarks.game_aggregates import ScanCounter, notebook_sequence
+from src.data.game_aggregates import aggregate_game_data
+
+
+def test_one_pass_matches_notebook_sequence(blb_games):
+    df_lazy = blb_games.scan()
+    expected = notebook_sequence(df_lazy, ScanCounter())
+    actual = aggregate_game_data(df_lazy)
+
+    assert actual["drafts"].sort("draft_id").equals(expected["drafts"].sort("draft_id"))
+    assert actual["summary"].columns == expected["summary"].columns
+    for col in expected["summary"].columns:
+        left, right = expected["summary"][col][0], actual["summary"][col][0]
+        if isinstance(left, float):
+            assert math.isclose(left, right, rel_tol=1e-12), col
+        else:
+            assert left == right, col
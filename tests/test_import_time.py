@@ -0,0 +1,16 @@
+"""The plotting modules import fast, without the heavy libraries."""
+
+import pytest
+
+from benchmarks.import_time import BUDGETS_MS, HEAVY_MODULES, import_time_ms, imported_packages
+
+
+@pytest.mark.parametrize("module", list(BUDGETS_MS))
+def test_no_heavy_imports(module):
+    assert not set(imported_packages(module)) & set(HEAVY_MODULES)
+
+
+@pytest.mark.parametrize("module", list(BUDGETS_MS))
+def test_import_time_in_budget(module):
+    elapsed = min(import_time_ms(module) for _ in range(3))
+    assert elapsed <= BUDGETS_MS[module], f"{module} imports in {elapsed:.1f} ms"
@@ -0,0 +1,124 @@
+"""Stage events of the instrumentation, and of the price wrangles."""
+
+import json
+
+import polars as pl
+import pytest
+
+from benchmarks import synthetic
+from src.data import instrument
+from src.data.mtgjson_wrangler import MtgPricesJsonWrangler
+from src.data.price_dataset import write_price_dataset
+from src.data.price_store import PriceStore
+
+
+@pytest.fixture
+def sink():
+    """Collects the events in memory, instead of printing them."""
+    sink = instrument.MemorySink()
+    previous = instrument.set_sinks(sink)
+    yield sink
+    instrument.set_sinks(*previous)
+
+
+def test_stage_records_measurements(sink, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"x" * 1000)
+
+    with instrument.stage("outer", dataset="test") as outer:
+        with instrument.stage("inner") as inner:
+            inner.add_input(path)
+            inner.add_output(tmp_path)
+            inner.rows = 10
+            instrument.log("progress", done=1)
+        outer.rows = 20
+
+    message, inner_event, outer_event = sink.events
+    assert message == {
+        **message,
+        "event": "message",
+        "stage": "inner",
+        "message": "progress",
+        "done": 1,
+    }
+    assert inner_event["parent"] == "outer"
+    assert inner_event["bytes_read"] == 1000
+    assert inner_event["bytes_written"] == 1000
+    assert inner_event["rows"] == 10
+    assert outer_event["parent"] is None
+    assert outer_event["dataset"] == "test"
+    assert outer_event["wall_s"] >= inner_event["wall_s"] >= 0
+    assert outer_event["cpu_s"] >= 0
+    assert outer_event["peak_rss_delta_bytes"] >= 0
+    assert all(event["status"] == "ok" for event in sink.stages)
+    json.dumps(sink.events)
+
+
+def test_failed_stage_is_recorded_and_reraised(sink):
+    with pytest.raises(ValueError):
+        with instrument.stage("broken"):
+            raise ValueError("bad input")
+
+    (event,) = sink.stages
+    assert event["status"] == "error"
+    assert event["error"] == "ValueError('bad input')"
+
+
+def test_instrumented_decorator(sink):
+    @instrument.instrumented()
+    def count_rows(n_rows):
+        instrument.current_stage().rows = n_rows
+        return n_rows
+
+    assert count_rows(5) == 5
+    (event,) = sink.stages
+    assert event["stage"].endswith("count_rows")
+    assert event["rows"] == 5
+
+
+def test_run_tags_events_and_summarizes(sink, tmp_path, capsys):
+    events_path = tmp_path / "events.jsonl"
+    instrument.add_sink(instrument.JsonlSink(events_path))
+    with instrument.Run("test") as run:
+        for name in ["a", "b"]:
+            with instrument.stage(name) as stage:
+                stage.rows = 3
+
+    assert {event["run_id"] for event in sink.events} == {run.run_id}
+    table = run.table()
+    assert table["stage"].to_list() == ["a", "b"]
+    assert table["rows"].to_list() == [3, 3]
+    assert run.run_id in capsys.readouterr().out
+    lines = events_path.read_text().splitlines()
+    assert [json.loads(line)["stage"] for line in lines] == ["a", "b"]
+
+
+def test_price_wrangles_emit_stages(sink, tmp_path, capsys):
+    raw_file = tmp_path / "AllPrices.json"
+    n_prices = synthetic.write_all_prices(raw_file, n_uuids=20, n_days=10)
+    paths = {"raw_file": raw_file, "interim": tmp_path / "interim", "processed": tmp_path}
+    wrangler = MtgPricesJsonWrangler(paths, filename="flat_prices.parquet")
+
+    wrangler.flatten_json_to_parquet()
+    wrangler.compact_data()
+    wrangler.load_data(compact=True)
+    cards = pl.read_parquet(wrangler.final_filename).select("uuid").unique()
+    cards = cards.with_columns(setCode=pl.lit("BLB"))
+    write_price_dataset(pl.scan_parquet(wrangler.final_filename), cards.lazy(), tmp_path / "ds")
+    PriceStore.build(wrangler.final_filename, tmp_path / "store")
+
+    stages = {event["stage"]: event for event in sink.stages}
+    assert list(stages) == [
+        "prices.flatten",
+        "prices.compact",
+        "prices.load",
+        "prices.dataset",
+        "prices.store",
+    ]
+    assert all(event["rows"] == n_prices for event in stages.values())
+    assert stages["prices.flatten"]["bytes_read"] == raw_file.stat().st_size
+    assert stages["prices.flatten"]["bytes_written"] > 0
+    messages = [event for event in sink.events if event["event"] == "message"]
+    assert {event["stage"] for event in messages} >= {"prices.compact", "prices.dataset"}
+    # Everything goes through the sinks, nothing is printed
+    assert capsys.readouterr().out == ""
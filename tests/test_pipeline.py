@@ -0,0 +1,201 @@
+"""Staleness, failures, and state of the refresh pipeline, on small file stages."""
+
+import json
+import os
+
+import pytest
+
+from src.data import instrument
+from src.data.pipeline import Pipeline, Stage
+
+
+@pytest.fixture
+def sink():
+    sink = instrument.MemorySink()
+    previous = instrument.set_sinks(sink)
+    yield sink
+    instrument.set_sinks(*previous)
+
+
+class Files:
+    """A raw -> clean -> report chain, and an unrelated notes stage."""
+
+    def __init__(self, root):
+        self.root = root
+        self.raw = root / "raw.txt"
+        self.clean = root / "clean.txt"
+        self.report = root / "out" / "report.txt"
+        self.notes = root / "notes.txt"
+        self.state_path = root / "state.json"
+        self.calls = []
+        self.raw.write_text("b\na\n")
+
+    def stages(self, **params) -> list:
+        return [
+            # In reverse order, so the order comes from the DAG
+            Stage("report", self._report, inputs=[self.clean], outputs=[self.report.parent]),
+            Stage("clean", self._clean, inputs=[self.raw], outputs=[self.clean], params=params),
+            Stage("notes", self._notes, outputs=[self.notes]),
+        ]
+
+    def pipeline(self, stages: list = None, **params) -> Pipeline:
+        return Pipeline(stages or self.stages(**params), state_path=self.state_path)
+
+    def _clean(self):
+        self.calls.append("clean")
+        self.clean.write_text("".join(sorted(self.raw.read_text().splitlines(True))))
+
+    def _report(self):
+        self.calls.append("report")
+        self.report.parent.mkdir(exist_ok=True)
+        self.report.write_text(f"{len(self.clean.read_text().splitlines())} lines\n")
+
+    def _notes(self):
+        self.calls.append("notes")
+        self.notes.write_text("notes\n")
+
+
+@pytest.fixture
+def files(tmp_path, sink):
+    return Files(tmp_path)
+
+
+def _statuses(timings) -> dict:
+    return dict(timings.select("stage", "status").rows())
+
+
+def test_runs_in_dependency_order_then_is_fresh(files):
+    timings = files.pipeline().run()
+    assert _statuses(timings) == {"clean": "ran", "report": "ran", "notes": "ran"}
+    assert files.calls.index("clean") < files.calls.index("report")
+    assert files.report.read_text() == "2 lines\n"
+
+    files.calls.clear()
+    timings = files.pipeline().run()
+    assert set(_statuses(timings).values()) == {"fresh"}
+    assert files.calls == []
+
+
+def test_changed_input_reruns_downstream_only(files):
+    files.pipeline().run()
+    files.calls.clear()
+
+    files.raw.write_text("c\nb\na\n")
+    assert files.pipeline().stale() == ["clean"]
+    timings = files.pipeline().run()
+    assert _statuses(timings) == {"clean": "ran", "report": "ran", "notes": "fresh"}
+    assert files.report.read_text() == "3 lines\n"
+
+
+def test_touched_input_with_same_content_is_fresh(files):
+    files.pipeline().run()
+    files.calls.clear()
+
+    stat = files.raw.stat()
+    os.utime(files.raw, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    files.pipeline().run()
+    assert files.calls == []
+
+
+def test_changed_params_rerun_stage(files):
+    files.pipeline(version=1).run()
+    files.calls.clear()
+
+    files.pipeline(version=2).run()
+    # The clean output is unchanged, so the report is still fresh
+    assert files.calls == ["clean"]
+
+
+def test_modified_or_missing_output_reruns_stage(files):
+    files.pipeline().run()
+    files.calls.clear()
+
+    files.report.write_text("edited\n")
+    files.notes.unlink()
+    files.pipeline().run()
+    assert sorted(files.calls) == ["notes", "report"]
+    assert files.report.read_text() == "2 lines\n"
+
+
+def test_always_and_force_run_fresh_stages(files):
+    stages = files.stages()
+    stages[2].always = True
+    files.pipeline(stages).run()
+    files.calls.clear()
+
+    files.pipeline(stages).run()
+    assert files.calls == ["notes"]
+
+    files.calls.clear()
+    files.pipeline(stages).run(targets=["report"], force=True)
+    assert files.calls == ["clean", "report"]
+
+
+def test_failure_blocks_dependents_only(files, sink):
+    stages = files.stages()
+    stages[1].func = lambda: 1 / 0
+
+    with pytest.raises(RuntimeError, match="clean") as info:
+        files.pipeline(stages).run()
+    assert isinstance(info.value.__cause__, ZeroDivisionError)
+    assert files.calls == ["notes"]
+    assert not files.report.exists()
+
+    events = {event["stage"]: event for event in sink.stages}
+    assert events["clean"]["status"] == "failed"
+    assert events["clean"]["error"] == "ZeroDivisionError('division by zero')"
+    assert events["report"]["status"] == "blocked"
+    assert events["notes"]["status"] == "ran"
+
+    # The failed stage is not recorded, so it reruns once fixed
+    files.calls.clear()
+    timings = files.pipeline().run()
+    assert _statuses(timings) == {"clean": "ran", "report": "ran", "notes": "fresh"}
+
+
+def test_skip_uses_outputs_as_they_are(files):
+    files.pipeline().run()
+    files.calls.clear()
+
+    files.raw.write_text("c\nb\na\n")
+    timings = files.pipeline().run(skip=["clean"])
+    assert _statuses(timings) == {"clean": "skipped", "report": "fresh", "notes": "fresh"}
+    assert files.calls == []
+    assert files.pipeline().stale() == ["clean"]
+
+
+def test_state_file_records_hashes(files):
+    files.pipeline().run()
+    state = json.loads(files.state_path.read_text())
+
+    assert set(state["stages"]) == {"clean", "report", "notes"}
+    assert list(state["stages"]["report"]["outputs"]) == [str(files.report.parent)]
+    assert str(files.raw) in state["files"]
+    assert str(files.report) in state["files"]
+    assert state["stages"]["clean"]["seconds"] >= 0
+
+
+def test_stage_events_carry_pipeline_status(files, sink):
+    with instrument.Run("test", summary=False) as run:
+        files.pipeline().run()
+        files.pipeline().run()
+
+    table = run.table()
+    assert sorted(table.rows())[0][:2] == ("clean", "fresh")
+    assert sorted(table["status"].to_list()) == ["fresh"] * 3 + ["ran"] * 3
+    assert {event["run_id"] for event in sink.events} == {run.run_id}
+    messages = [event["message"] for event in sink.events if event["event"] == "message"]
+    assert "Running stage clean" in messages
+
+
+def test_dependency_errors(tmp_path):
+    cycle = [
+        Stage("a", print, deps=["b"]),
+        Stage("b", print, deps=["a"]),
+    ]
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline(cycle, state_path=tmp_path / "state.json").upstream()
+    with pytest.raises(ValueError, match="unknown"):
+        Pipeline([Stage("a", print, deps=["c"])], state_path=tmp_path / "state.json")
+    with pytest.raises(ValueError, match="unique"):
+        Pipeline([Stage("a", print), Stage("a", print)], state_path=tmp_path / "state.json")
@@ -0,0 +1,60 @@
+"""Round trips of the compact price table."""
+
+import datetime
+from decimal import Decimal
+
+import polars as pl
+import pytest
+
+from src.data.mtgjson_wrangler import MtgPricesJsonWrangler
+
+# Prices whose float values are just below their decimal values
+PRICES = [0.58, 1.15, 0.29, 2.01, 4.35, 1234.56, 0.01, 99.99]
+
+
+@pytest.fixture
+def wrangler(tmp_path):
+    n_prices = len(PRICES)
+    df = pl.DataFrame(
+        {
+            "uuid": [f"uuid-{i % 3}" for i in range(n_prices)],
+            "medium": "paper",
+            "providers": "tcgplayer",
+            "currency": "USD",
+            "list": "retail",
+            "finish": ["normal", "foil"] * (n_prices // 2),
+            "date": [datetime.date(2024, 8, 1 + i) for i in range(n_prices)],
+            "price": PRICES,
+        }
+    ).sort("uuid", "finish", "date")
+    paths = {
+        "raw_file": tmp_path / "AllPrices.json",
+        "interim": tmp_path / "interim",
+        "processed": tmp_path / "processed",
+    }
+    wrangler = MtgPricesJsonWrangler(paths, filename="flat_prices.parquet")
+    df.write_parquet(wrangler.final_filename)
+    return wrangler
+
+
+def test_decimal_prices_round_trip_exactly(wrangler):
+    expected = pl.read_parquet(wrangler.final_filename)
+    wrangler.compact_data(price_dtype=pl.Decimal(10, 2))
+    loaded = wrangler.load_data(compact=True)
+
+    assert loaded["price"].dtype == pl.Decimal(10, 2)
+    assert loaded["price"].to_list() == [Decimal(f"{price:.2f}") for price in expected["price"]]
+    assert loaded["uuid"].to_list() == expected["uuid"].to_list()
+    assert loaded["finish"].cast(pl.String).to_list() == expected["finish"].to_list()
+
+
+def test_float32_prices_round_trip(wrangler):
+    expected = pl.read_parquet(wrangler.final_filename)
+    wrangler.compact_data()
+    loaded = wrangler.load_data(compact=True)
+
+    assert loaded["price"].dtype == pl.Float32
+    assert loaded["price"].to_list() == pytest.approx(expected["price"].to_list(), abs=1e-4)
+    assert loaded.drop("price").with_columns(pl.col(pl.Enum).cast(pl.String)).equals(
+        expected.drop("price")
+    )
@@ -0,0 +1,53 @@
+"""Writes and scans the partitioned price dataset."""
+
+import datetime
+
+import polars as pl
+
+from src.data.price_dataset import CLUSTER_BY, scan_price_dataset, write_price_dataset
+
+
+def _prices(n_uuids: int = 6, n_days: int = 50) -> pl.DataFrame:
+    dates = pl.date_range(datetime.date(2024, 6, 20), datetime.date(2024, 8, 8), eager=True)
+    return (
+        pl.DataFrame({"uuid": [f"uuid-{i}" for i in range(n_uuids)]})
+        .join(pl.DataFrame({"providers": ["tcgplayer", "cardmarket"]}), how="cross")
+        .join(pl.DataFrame({"date": dates[:n_days]}), how="cross")
+        .with_columns(
+            medium=pl.lit("paper"),
+            currency=pl.lit("USD"),
+            list=pl.lit("retail"),
+            finish=pl.lit("normal"),
+            price=pl.int_range(pl.len()).cast(pl.Float64) / 100,
+        )
+        .sample(fraction=1.0, shuffle=True, seed=0)
+    )
+
+
+def test_dataset_round_trips_and_prunes(tmp_path):
+    prices = _prices()
+    cards = pl.DataFrame(
+        {"uuid": [f"uuid-{i}" for i in range(6)], "setCode": ["OTJ", "BLB", "MH3"] * 2}
+    )
+    root = tmp_path / "prices"
+    write_price_dataset(prices.lazy(), cards.lazy(), root, row_group_size=64)
+    # A rewrite replaces the partitions instead of appending to them
+    write_price_dataset(prices.lazy(), cards.lazy(), root, row_group_size=64)
+
+    columns = prices.columns
+    expected = prices.join(cards, on="uuid").sort(columns)
+    assert scan_price_dataset(root).collect().select(expected.columns).sort(columns).equals(
+        expected
+    )
+
+    otj = scan_price_dataset(root, set_codes=["OTJ"], start="2024-07-01", end="2024-07-31")
+    otj = otj.collect()
+    assert set(otj["setCode"]) == {"OTJ"}
+    assert otj["date"].min() >= datetime.date(2024, 7, 1)
+    assert otj["date"].max() <= datetime.date(2024, 7, 31)
+    assert otj.height == 2 * 2 * 31
+
+    for path in root.glob("*/*/*.parquet"):
+        df = pl.read_parquet(path, hive_partitioning=False)
+        assert df.equals(df.sort([col for col in CLUSTER_BY if col in df.columns]))
+    assert not list(tmp_path.glob("*.staging"))
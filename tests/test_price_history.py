@@ -0,0 +1,79 @@
+"""Incremental, idempotent ingest of the date-partitioned price history."""
+
+import json
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from benchmarks import synthetic
+from src.data.mtgjson_wrangler import SORT_KEYS, MtgPricesJsonWrangler
+
+
+@pytest.fixture
+def wrangler(tmp_path):
+    raw_file = tmp_path / "AllPrices.json"
+    synthetic.write_all_prices(raw_file, n_uuids=20, n_days=10)
+    paths = {"raw_file": raw_file, "interim": tmp_path / "interim", "processed": tmp_path}
+    return MtgPricesJsonWrangler(paths, filename="flat_prices.parquet")
+
+
+@pytest.fixture
+def flat_prices(wrangler) -> pl.DataFrame:
+    wrangler.flatten_json_to_parquet()
+    return pl.read_parquet(wrangler.final_filename)
+
+
+def _history(history_dir) -> pl.DataFrame:
+    return MtgPricesJsonWrangler.scan_history(history_dir).collect().sort(SORT_KEYS)
+
+
+def test_first_run_writes_every_date(wrangler, flat_prices, tmp_path):
+    history_dir = tmp_path / "history"
+    dates = wrangler.update_history(history_dir, batch_size=500)
+
+    assert dates == flat_prices["date"].unique().sort().to_list()
+    assert MtgPricesJsonWrangler.history_dates(history_dir) == dates
+    assert_frame_equal(_history(history_dir), flat_prices.sort(SORT_KEYS))
+    assert list(history_dir.glob("*.tmp")) == []
+
+
+def test_rerun_writes_nothing(wrangler, tmp_path):
+    history_dir = tmp_path / "history"
+    wrangler.update_history(history_dir)
+    partitions = sorted(history_dir.glob("date=*/prices.parquet"))
+    mtimes = [path.stat().st_mtime_ns for path in partitions]
+
+    assert wrangler.update_history(history_dir) == []
+    assert [path.stat().st_mtime_ns for path in partitions] == mtimes
+
+
+def test_only_new_dates_are_ingested(wrangler, flat_prices, tmp_path):
+    history_dir = tmp_path / "history"
+    dates = wrangler.update_history(history_dir)
+    for date in dates[-3:]:
+        (history_dir / f"date={date}" / "prices.parquet").unlink()
+
+    assert wrangler.update_history(history_dir) == dates[-3:]
+    assert_frame_equal(_history(history_dir), flat_prices.sort(SORT_KEYS))
+
+
+def test_upsert_replaces_restated_prices(wrangler, flat_prices, tmp_path):
+    history_dir = tmp_path / "history"
+    dates = wrangler.update_history(history_dir)
+
+    # Restate one price in the raw file
+    raw_file = wrangler.paths["raw_file"]
+    raw = json.loads(raw_file.read_text())
+    row = flat_prices.row(0, named=True)
+    finishes = raw["data"][row["uuid"]][row["medium"]][row["providers"]][row["list"]]
+    finishes[row["finish"]][row["date"].isoformat()] = 12345.0
+    raw_file.write_text(json.dumps(raw))
+
+    assert wrangler.update_history(history_dir) == []
+    assert wrangler.update_history(history_dir, only_new=False) == dates
+
+    expected = flat_prices.with_columns(
+        price=pl.when(pl.int_range(pl.len()) == 0).then(12345.0).otherwise(pl.col("price"))
+    )
+    assert_frame_equal(_history(history_dir), expected.sort(SORT_KEYS))
@@ -0,0 +1,34 @@
+"""The schema-aligned union of the per-set tables."""
+
+import polars as pl
+
+from src.data.set_union import SetUnion
+
+
+def test_union_aligns_sets_with_different_cards(blb_games, otj_games, tmp_path):
+    root = tmp_path / "processed"
+    root.mkdir()
+    frames = {"BLB": blb_games.scan().collect(), "OTJ": otj_games.scan().collect()}
+    frames["OTJ"] = frames["OTJ"].drop("splash_colors")
+    for set_code, df in frames.items():
+        df.write_parquet(root / f"{set_code}_Game_PD_Cards.parquet")
+
+    union = SetUnion(root, "_Game_PD_Cards")
+    union.append(["BLB"])
+    union.append(["BLB", "OTJ"])
+    assert union.set_codes == ["BLB", "OTJ"]
+
+    df = union.scan().collect()
+    assert df.height == sum(frame.height for frame in frames.values())
+    assert df.columns[: len(frames["BLB"].columns)] == frames["BLB"].columns
+
+    otj = df.filter(pl.col("expansion") == "OTJ")
+    # Card columns missing from a set are zero counts, other columns are null
+    assert (otj["deck_BLB Card 15"] == 0).all()
+    assert otj["splash_colors"].is_null().all()
+    assert otj["deck_OTJ Card 3"].to_list() == frames["OTJ"]["deck_OTJ Card 3"].to_list()
+    assert union.scan(["OTJ"]).collect().height == frames["OTJ"].height
+
+    out_file = tmp_path / "union.parquet"
+    union.write(out_file)
+    assert pl.read_parquet(out_file).equals(df)
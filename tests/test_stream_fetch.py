@@ -0,0 +1,130 @@
+"""Fetches from a local HTTP server with Range and ETag support."""
+
+import gzip
+import hashlib
+import http.server
+import io
+import random
+import re
+import tarfile
+import threading
+
+import pytest
+
+from src.data import stream_fetch
+from src.data.mtgjson_fetcher import MtgJsonFetcher
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the server's files, with byte ranges and If-None-Match."""
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+    def _respond(self, body: bool):
+        self.server.requests.append((self.command, self.path, self.headers.get("Range")))
+        data = self.server.files.get(self.path.lstrip("/"))
+        if data is None:
+            self.send_error(404)
+            return
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match:
+            first, last = int(match[1]), min(int(match[2]), len(data) - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(data)}")
+            data = data[first : last + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.files = {}
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _random_json(n_bytes: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    return bytes(rng.choice(b'{}[]":,0123456789abcdef ') for _ in range(n_bytes))
+
+
+def test_fetch_reassembles_ranges_and_skips_unchanged(server, tmp_path):
+    content = _random_json(300_000)
+    server.files["AllPrices.json.gz"] = gzip.compress(content)
+    fetcher = MtgJsonFetcher(
+        "AllPrices.json", save_root=tmp_path, base_url=server.url, chunk_size=16 * 1024
+    )
+
+    fetcher.fetch()
+    assert (tmp_path / "AllPrices" / "AllPrices.json").read_bytes() == content
+    n_ranges = sum(range_ is not None for _, _, range_ in server.requests)
+    assert n_ranges == -(-len(server.files["AllPrices.json.gz"]) // (16 * 1024))
+    assert not fetcher.state_path.exists()
+
+    server.requests.clear()
+    fetcher = MtgJsonFetcher("AllPrices.json", save_root=tmp_path, base_url=server.url)
+    fetcher.fetch()
+    assert fetcher.cache.stats["hits"] == 1
+    assert fetcher.cache.stats["misses"] == 1
+    assert not any(method == "GET" and range_ for method, _, range_ in server.requests)
+
+
+def test_fetch_untars_archive(server, tmp_path):
+    buffer = io.BytesIO()
+    files = {f"AllPrintingsParquetFiles/table{i}.parquet": _random_json(5_000, i) for i in range(3)}
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    server.files["AllPrintingsParquetFiles.tar.gz"] = buffer.getvalue()
+
+    fetcher = MtgJsonFetcher("AllPrintingsParquetFiles", save_root=tmp_path, base_url=server.url)
+    fetcher.fetch()
+    for name, data in files.items():
+        assert (tmp_path / name).read_bytes() == data
+
+
+def test_gunzip_stream_skips_written_output(tmp_path):
+    content = _random_json(100_000)
+    archive = gzip.compress(content)
+    out_path = tmp_path / "out.json"
+    part_path = tmp_path / "out.json.part"
+    # A marker prefix, to show the written bytes are kept rather than rewritten
+    part_path.write_bytes(b"x" * 40_000)
+    saved = []
+
+    chunks = (archive[i : i + 4096] for i in range(0, len(archive), 4096))
+    n_bytes = stream_fetch.gunzip_stream(chunks, out_path, {"written": 40_000}, saved.append)
+
+    assert n_bytes == len(content)
+    assert out_path.read_bytes() == b"x" * 40_000 + content[40_000:]
+    assert not part_path.exists()
+    # The state is saved by the throttle, not after every block
+    assert len(saved) <= 1